@@ -0,0 +1,180 @@
+######################################################################
+# benchmarks/deployer_benchmark.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Synthetic benchmark for rpm_deployer, deb_deployer and
+# multi_deployer. Runs each deployer against a generated graph (see
+# `fake_graph.py`) with the stub packaging tools in `stubs/` first on
+# PATH, and reports where the time went per stage from the deployer's
+# own trace (see `system_packaging/trace.py`):
+#
+#   scan        - the single payload manifest pass per dependency
+#   dedupe      - hashing same-size files to link duplicates, see `dedupe`
+#   conflicts   - the cross-package file conflict check
+#   elf         - the ELF header scan per dependency
+#   libraries   - reading the system libraries, see `shlib_deps`
+#   copy        - conan.tools.files.copy() of the package folders
+#   relocate    - license/conflict relocation in the copied trees
+#   stage       - reflink/hardlink/copy staging out of the cache
+#   template    - copying the Debian packaging template
+#   tar         - intermediate tarballs, GNU tar or streamed
+#   deb         - native .deb writing
+#   cleanup     - removing intermediates, see `cleanup`/`disk_budget`
+#   budget      - waiting for room within `disk_budget`
+#   <tool>      - every packaging tool run (rpmbuild, dch, debuild, ...)
+#   other       - wall time no stage covers, i.e. the deployer's own
+#                 orchestration
+#
+# Everything runs offline, only `conan` needs to be importable:
+#
+#   python benchmarks/deployer_benchmark.py --chains 8 --depth 4 \
+#       --files 500 --file-size 16384 --repeat 3 \
+#       --conf jobs=4 --conf staging=stream
+#
+# With `jobs` > 1, and with multi_deployer building each dependency's
+# formats concurrently, stage times overlap and add up to more than the
+# deploy wall time. `other` only counts time outside every stage.
+#
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEPLOYERS_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'extensions', 'deployers')
+STUBS_DIR = os.path.join(BENCHMARK_DIR, 'stubs')
+
+sys.path.insert(0, DEPLOYERS_DIR)
+
+import fake_graph
+from system_packaging import config
+
+DEPLOYERS = ['rpm_deployer', 'deb_deployer', 'multi_deployer']
+
+# Spans enclosing other spans rather than a stage of their own
+CONTAINER_SPANS = ['deploy', 'package']
+
+
+def load_deployer(deployer_name):
+    spec = importlib.util.spec_from_file_location(deployer_name,
+                                                  os.path.join(DEPLOYERS_DIR, f'{ deployer_name }.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Deploy once and total up the deployer's JSON lines trace per stage.
+# Returns `(wall, {stage: (calls, seconds)}, seconds any stage covers)`.
+def run_deploy(deployer_name, graph, output_folder):
+    deployer = load_deployer(deployer_name)
+
+    shutil.rmtree(output_folder, ignore_errors=True)
+    os.makedirs(output_folder)
+
+    start = time.perf_counter()
+    deployer.deploy(graph=graph, output_folder=output_folder)
+    wall = time.perf_counter() - start
+
+    stages = {}
+    intervals = []
+    with open(os.path.join(output_folder, f'{ deployer_name }-trace.jsonl')) as trace_file:
+        for line in trace_file:
+            record = json.loads(line)
+            if record['name'] in CONTAINER_SPANS:
+                continue
+            calls, total = stages.get(record['name'], (0, 0.0))
+            stages[record['name']] = (calls + 1, total + record['wall'])
+            intervals.append((record['start'], record['start'] + record['wall']))
+
+    # Union of the stage spans, concurrent ones count once
+    covered = 0.0
+    covered_end = None
+    for start, end in sorted(intervals):
+        if covered_end is None or start >= covered_end:
+            covered += end - start
+            covered_end = end
+        elif end > covered_end:
+            covered += end - covered_end
+            covered_end = end
+
+    return wall, stages, covered
+
+
+def report(deployer_name, runs):
+    walls = [wall for wall, stages, covered in runs]
+    print(f'\n{ deployer_name }: { len(runs) } run(s), median wall { statistics.median(walls):.3f}s'
+          f' (min { min(walls):.3f}s, max { max(walls):.3f}s)')
+
+    stage_names = sorted({stage for wall, stages, covered in runs for stage in stages})
+    summary = {}
+    print(f"  {'stage':<20} {'calls':>7} {'median s':>10} {'share':>7}")
+    for stage in stage_names:
+        seconds = statistics.median(stages.get(stage, (0, 0.0))[1] for wall, stages, covered in runs)
+        calls = runs[0][1].get(stage, (0, 0.0))[0]
+        summary[stage] = {'calls': calls, 'seconds': seconds}
+        print(f"  {stage:<20} {calls:>7} {seconds:>10.3f} {seconds / statistics.median(walls):>7.1%}")
+
+    other = statistics.median(wall - covered for wall, stages, covered in runs)
+    summary['other'] = {'calls': 0, 'seconds': other}
+    print(f"  {'other':<20} {'':>7} {other:>10.3f} {other / statistics.median(walls):>7.1%}")
+
+    return {'wall': walls, 'stages': summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the system packaging deployers offline')
+    parser.add_argument('--deployer', choices=DEPLOYERS + ['all'], default='all')
+    parser.add_argument('--chains', type=int, default=4, help='independent dependency chains in the graph')
+    parser.add_argument('--depth', type=int, default=3, help='packages per dependency chain')
+    parser.add_argument('--files', type=int, default=100, help='payload files per package')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='bytes per payload file')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--conf', action='append', default=[], metavar='NAME=VALUE',
+                        help=f'{ config.CONF_NAMESPACE }:NAME setting, may be repeated')
+    parser.add_argument('--work-dir', help='keep generated packages and output here instead of a temporary directory')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help='show deployer output')
+    args = parser.parse_args()
+
+    conf = fake_graph.FakeConf({f'{ config.CONF_NAMESPACE }:{ name }': value
+                                for name, value in (setting.split('=', 1) for setting in args.conf)})
+    conf.define(f'{ config.CONF_NAMESPACE }:trace', 'jsonl')
+
+    os.environ['PATH'] = os.pathsep.join([STUBS_DIR, os.environ.get('PATH', os.defpath)])
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='deployer_benchmark-')
+    try:
+        graph = fake_graph.make_graph(os.path.join(work_dir, 'cache'), conf,
+                                      chains=args.chains,
+                                      depth=args.depth,
+                                      files=args.files,
+                                      file_size=args.file_size,
+                                      quiet=not args.verbose,
+                                     )
+
+        print(f'{ args.chains * args.depth } packages x { args.files } files x { args.file_size } bytes,'
+              f' conf { args.conf or "defaults" }')
+
+        results = {}
+        for deployer_name in (DEPLOYERS if args.deployer == 'all' else [args.deployer]):
+            runs = [run_deploy(deployer_name, graph, os.path.join(work_dir, deployer_name))
+                    for repeat in range(args.repeat)]
+            results[deployer_name] = report(deployer_name, runs)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({'parameters': vars(args), 'results': results}, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+######################################################################
+# benchmarks/fake_graph.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Synthetic stand-ins for the parts of a Conan dependency graph the
+# deployers use, over generated package folders, so deploys can be
+# benchmarked without a Conan cache or network access:
+#
+# graph.root.conanfile
+#     ├── options.install_prefix, author, conf, output
+#     └── dependencies
+#             └── <dependency>
+#                     ├── ref, pref, options, package_folder
+#                     ├── description, license, dependencies
+#                     └── _conanfile.author, _conanfile.system_requires
+#
+# The generated packages form `chains` chains of `depth` packages each,
+# every package requiring the previous one in its chain.
+#
+
+from conan.api.model import PkgReference, RecipeReference
+from conan.errors import ConanException
+import ast
+import os
+import random
+
+
+class FakeOutput:
+
+    def __init__(self, quiet=True):
+        self.quiet = quiet
+
+    def _print(self, msg):
+        if not self.quiet:
+            print(msg)
+
+    info = debug = verbose = highlight = title = success = _print
+
+    def warning(self, msg):
+        print(f'WARN: { msg }')
+
+    def error(self, msg):
+        print(f'ERROR: { msg }')
+
+
+######################################################################
+# `conanfile.conf` for the `user.system_packaging:*` settings, values
+# given as strings are parsed like Python literals, e.g. `jobs=4`,
+# `incremental=True` or `compression=zstd`.
+#
+class FakeConf:
+
+    def __init__(self, values=None):
+        self._values = {}
+        for name, value in (values or {}).items():
+            self.define(name, value)
+
+    def define(self, name, value):
+        if isinstance(value, str):
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                pass
+        self._values[name] = value
+
+    def get(self, name, default=None, check_type=None):
+        value = self._values.get(name, default)
+        if check_type is not None and value is not None and not isinstance(value, check_type):
+            raise ConanException(f'[conf] { name } must be a { check_type.__name__ }, got "{ value }"')
+        return value
+
+
+class FakeOptions(dict):
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeRecipe:
+
+    def __init__(self, author=None, system_requires=None):
+        self.author = author
+        self.system_requires = system_requires or {}
+
+
+class FakeDependency:
+
+    def __init__(self, name, version, package_folder, requires=(), system_requires=None):
+        self.ref = RecipeReference.loads(f'{ name }/{ version }#{ name }rrev')
+        self.pref = PkgReference(self.ref, f'{ name }pid', f'{ name }prev')
+        self.package_folder = package_folder
+        self.options = FakeOptions()
+        self.description = f'Synthetic { name } package'
+        self.license = 'Apache-2.0'
+        self.dependencies = {dependency.ref.name: dependency for dependency in requires}
+        self.conf_info = FakeConf()
+        self._conanfile = FakeRecipe(system_requires=system_requires)
+
+    def __str__(self):
+        return str(self.ref)
+
+
+class FakeConanfile:
+
+    def __init__(self, dependencies, conf, install_prefix='/opt/toolchain', quiet=True):
+        self.name = None
+        self.version = None
+        self.author = 'Benchmark <benchmark@example.com>'
+        self.options = FakeOptions(install_prefix=install_prefix)
+        self.conf = conf
+        self.output = FakeOutput(quiet)
+        self.dependencies = {dependency.ref.name: dependency for dependency in dependencies}
+
+
+class FakeNode:
+
+    def __init__(self, conanfile):
+        self.conanfile = conanfile
+
+
+class FakeGraph:
+
+    def __init__(self, conanfile):
+        self.root = FakeNode(conanfile)
+
+
+######################################################################
+# Fill `package_folder` like a typical Conan package: executables,
+# shared libraries with their soname symlinks, headers, licenses and
+# the Conan bookkeeping files the deployers exclude. File contents are
+# seeded random bytes so every run packages (and compresses) the same
+# data.
+#
+def generate_package(package_folder, name, files=100, file_size=64 * 1024, seed=0):
+
+    rng = random.Random(f'{ seed }-{ name }')
+    layout = ['bin', 'lib', 'include', 'share/doc']
+
+    for subdir in layout + ['licenses', 'share/info']:
+        os.makedirs(os.path.join(package_folder, subdir), exist_ok=True)
+
+    for index in range(files):
+        subdir = layout[index % len(layout)]
+        if subdir == 'lib':
+            file_name = f'lib{ name }{ index }.so.1'
+        else:
+            file_name = f'{ name }{ index }'
+
+        with open(os.path.join(package_folder, subdir, file_name), 'wb') as payload_file:
+            payload_file.write(rng.randbytes(file_size))
+
+        if subdir == 'lib':
+            os.symlink(file_name, os.path.join(package_folder, 'lib', f'lib{ name }{ index }.so'))
+        elif subdir == 'bin':
+            os.chmod(os.path.join(package_folder, subdir, file_name), 0o755)
+
+    for file_name, content in [('licenses/LICENSE', f'{ name } license\n'),
+                               ('licenses/COPYING', f'{ name } copying\n'),
+                               ('share/info/dir', 'info dir\n'),
+                               ('conaninfo.txt', '[settings]\n'),
+                               ('conanmanifest.txt', '0\n'),
+                              ]:
+        with open(os.path.join(package_folder, file_name), 'w') as text_file:
+            text_file.write(content)
+
+
+######################################################################
+# Generate `chains * depth` packages under `cache_folder` and return
+# the graph over them. Package folders are only generated once, reuse
+# them across runs with the same parameters.
+#
+def make_graph(cache_folder, conf, chains=4, depth=3, files=100, file_size=64 * 1024,
+               install_prefix='/opt/toolchain', quiet=True):
+
+    dependencies = []
+    for chain in range(chains):
+        previous = None
+        for level in range(depth):
+            name = f'chain{ chain }-pkg{ level }'
+            package_folder = os.path.join(cache_folder, f'{ name }-{ files }x{ file_size }')
+
+            if not os.path.isdir(package_folder):
+                generate_package(f'{ package_folder }.tmp', name, files=files, file_size=file_size)
+                os.rename(f'{ package_folder }.tmp', package_folder)
+
+            system_requires = {'yum': {'install': ['bash']},
+                               'apt': {'install': ['bash']},
+                              } if level == 0 else None
+
+            dependency = FakeDependency(name, f'1.{ level }', package_folder,
+                                        requires=[previous] if previous else [],
+                                        system_requires=system_requires,
+                                       )
+            dependencies.append(dependency)
+            previous = dependency
+
+    return FakeGraph(FakeConanfile(dependencies, conf, install_prefix=install_prefix, quiet=quiet))
@@ -8,10 +8,11 @@
 # dependencies are included.
 #
 
-from conan.tools.files import copy, mkdir, rename, rm
-#from conan.errors import ConanException
+from conan.tools.files import copy
+from conan.errors import ConanException
+from system_packaging import compression, config, conflicts, debwriter, elf, manifest, payload, plan, repository, reproducible, scheduler, shlibs, split, state, trace
+import glob
 import os
-import subprocess
 import shutil
 import email.utils
 
@@ -19,20 +20,155 @@ def deploy(graph, output_folder, **kwargs):
 
     conanfile = graph.root.conanfile
 
-    for name, dependency_item in conanfile.dependencies.items():
-        if dependency_item.package_folder is None:
-            continue
-        process_dependency(conanfile, output_folder, dependency_item)
-
+    # Package independent dependencies concurrently, see
+    # `user.system_packaging:jobs`. Each debuild runs in its own
+    # package tree with its own environment.
+    #
+    # Previously built packages are reused when `user.system_packaging:incremental`
+    # is enabled, the state is always recorded.
+    deploy_state = state.DeployState(output_folder, 'deb_deployer',
+                                     incremental=config.get_conf(conanfile, 'incremental',
+                                                                 default=False, check_type=bool),
+                                    )
+
+    # Every stage is timed, see `user.system_packaging:trace`
+    tracer = trace.Tracer(output_folder, 'deb_deployer', trace_format=config.get_trace_format(conanfile))
+
+    dependency_items = [dependency_item for name, dependency_item in conanfile.dependencies.items()
+                        if dependency_item.package_folder is not None]
+
+    try:
+        with tracer.span('deploy'):
+            # Pre-build phase - list every payload once and settle files
+            # shipped by more than one package before anything expensive
+            # runs, see `user.system_packaging:conflicts`
+            payload_manifests = manifest.scan_dependencies(conanfile.options.install_prefix,
+                                                           dependency_items,
+                                                           tracer,
+                                                           max_workers=config.get_jobs(conanfile),
+                                                          )
+            payload_manifests = [payload_manifest.resolved(exclude=payload.UNOWNED_PATHS)
+                                 for payload_manifest in payload_manifests]
+            with tracer.span('conflicts'):
+                payload_manifests = conflicts.resolve_conflicts(conanfile,
+                                                                dependency_items,
+                                                                payload_manifests,
+                                                                policy=config.get_conflict_policy(conanfile),
+                                                               )
+
+            # Machine code and shared libraries of every payload, see
+            # `user.system_packaging:shlib_deps`
+            libraries = library_index(conanfile, dependency_items, payload_manifests, tracer)
+
+            # Describe the .debs without building any, see
+            # `user.system_packaging:plan`
+            if config.get_plan(conanfile):
+                with tracer.span('plan'):
+                    write_plan(conanfile, output_folder, dependency_items, payload_manifests, libraries, tracer)
+                return
+
+            # Only as many packages in flight as `user.system_packaging:disk_budget`
+            # allows
+            disk_budget = scheduler.DiskBudget(config.get_disk_budget(conanfile))
+            jobs = []
+            for dependency_item, payload_manifest in zip(dependency_items, payload_manifests):
+                jobs.append((str(dependency_item),
+                             tracer.wrap('package',
+                                         lambda dependency_item=dependency_item, payload_manifest=payload_manifest:
+                                             process_within_budget(conanfile, output_folder, dependency_item,
+                                                                   payload_manifest, libraries, deploy_state, tracer,
+                                                                   disk_budget),
+                                         package=str(dependency_item),
+                                        ),
+                            ))
+
+            deb_files = [deb_file for dependency_deb_files in scheduler.run_jobs(jobs, max_workers=config.get_jobs(conanfile))
+                         for deb_file in dependency_deb_files]
+
+            # Serve the output folder as a flat apt repository, see
+            # `user.system_packaging:repository`
+            if config.get_repository(conanfile):
+                write_repository(conanfile, output_folder, deb_files, tracer)
+    finally:
+        tracer.finish(conanfile)
+
+
+# Rough disk footprint of one dependency's build in multiples of its
+# payload size, hardlinked and reflinked copies included. `debuild`:
+# staging tree, orig tarball, debian/ install tree and .deb. `native`:
+# just the .deb.
+BUILD_FOOTPRINT = {'debuild': 4, 'native': 1}
+
+
+# Package a dependency holding its estimated footprint of
+# `user.system_packaging:disk_budget` until its intermediates are gone
+def process_within_budget(conanfile, output_folder, dependency_item, payload_manifest,
+                          libraries, deploy_state, tracer, disk_budget):
+
+    footprint = payload_manifest.stored_size() * BUILD_FOOTPRINT[config.get_deb_builder(conanfile)]
+    if disk_budget.budget is None:
+        disk_budget.acquire(footprint)
+    else:
+        with tracer.span('budget', package=str(dependency_item)):
+            disk_budget.acquire(footprint)
+
+    try:
+        return process_dependency(conanfile, output_folder, dependency_item,
+                                  payload_manifest=payload_manifest,
+                                  libraries=libraries,
+                                  deploy_state=deploy_state,
+                                  tracer=tracer,
+                                  cleanup=config.get_cleanup(conanfile),
+                                 )
+    finally:
+        disk_budget.release(footprint)
+
+
+# The .debs this deploy would build as `deb_deployer-plan.json`
+def write_plan(conanfile, output_folder, dependency_items, payload_manifests, libraries, tracer):
+    entries = []
+    for dependency_item, payload_manifest in zip(dependency_items, payload_manifests):
+        metadata = package_metadata(conanfile, dependency_item, tracer)
+        components = package_components(conanfile, dependency_item, metadata, payload_manifest)
+        link_components(conanfile, dependency_item, components, libraries)
+        for component_metadata, component_manifest in components:
+            entries.append(plan.package_entry(dependency_item, component_metadata, component_manifest,
+                                              architecture=component_metadata['architecture'],
+                                              depends=component_metadata['depends'],
+                                             ))
+
+    plan_path = plan.write_plan(output_folder, 'deb_deployer', str(conanfile.options.install_prefix), entries)
+    plan.log_plan(conanfile, entries, 'depends')
+    conanfile.output.info(f'Wrote the plan for { len(entries) } .deb(s) to { plan_path }, nothing was built')
+
+
+# Index the .debs of this deploy in `Packages`/`Release` files next to them
+def write_repository(conanfile, output_folder, deb_files, tracer):
+    with tracer.span('repository') as span:
+        span.files = repository.write_apt_index(output_folder,
+                                                [os.path.relpath(deb_file, output_folder) for deb_file in deb_files],
+                                                repository.MetadataCache(output_folder, 'deb_deployer'),
+                                                str(conanfile.options.install_prefix).lstrip('/').replace('/', '+'),
+                                                max_workers=config.get_jobs(conanfile),
+                                               )
+    conanfile.output.info(f'Wrote apt repository index for { len(deb_files) } .deb(s) to { output_folder }, '
+                          f'{ span.files } read')
+
+
+# Each packaging tool gets its own environment rather than modifying
+# the global `os.environ`, inheriting PATH and friends so tools are
+# found wherever they are installed.
+def deb_environment(**overrides):
+    deb_env = dict(os.environ)
+    deb_env.update(overrides)
+    return deb_env
 
-def process_dependency(conanfile, output_folder, dependency_item):
 
-    info_msg = 'Deployer Processing ' \
-             + str(dependency_item) \
-             + ': package_folder: ' \
-             + str(dependency_item.package_folder)
-
-    conanfile.output.info(info_msg)
+######################################################################
+# Everything about a dependency's .deb that comes from the graph rather
+# than from its payload
+#
+def package_metadata(conanfile, dependency_item, tracer):
 
     # Gather up toplevel metadata for all dependencies if not provided.
     toolchain_metadata = {'install_prefix': conanfile.options.install_prefix,
@@ -51,17 +187,11 @@ def process_dependency(conanfile, output_folder, dependency_item):
     # start with an alphanumeric character.
     package_prefix = str(toolchain_metadata['install_prefix']).lstrip('/').replace('/', '+')
 
-    # Locate the template from the ~/.conan2/extensions/deployers directory
-    deployer_rootname = str(os.path.basename(__file__)).rstrip('.py')
-    deployer_support_dir = os.path.dirname(__file__)
-    deb_template_path = os.path.join(deployer_support_dir, deployer_rootname)
-
     # We'll name each of our toolchain packages after ourselves.
     # We are "/opt/toolchain", so "make" gets "opt+toolchain-make" to avoid conflict with OS packages.
     dashed_pkg_toolname = f'{ package_prefix }-{ dependency_item.ref.name }'
     dashed_pkg_toolnamever = f'{ dashed_pkg_toolname }-{ dependency_item.ref.version }'
     dachshund_pkg_toolnamever = f'{ dashed_pkg_toolname }_{ dependency_item.ref.version }'
-    pkg_root_dst = os.path.join(output_folder, dashed_pkg_toolnamever)
 
     # If dependency has a install_prefix, we'll copy the files out of that area
     # Otherwise we'll assume it's relocatable and use our toplevel prefix as an
@@ -72,12 +202,12 @@ def process_dependency(conanfile, output_folder, dependency_item):
         # strip leading '/' off install_prefix
         neutered_prefix = str(tool_prefix).lstrip("/")
         copy_pattern = f'{ neutered_prefix }/*'
-        pkg_dst = pkg_root_dst
+        payload_subdir = neutered_prefix
     else:
         # strip leading '/' off install_prefix
         neutered_prefix = str(toolchain_metadata['install_prefix']).lstrip("/")
         copy_pattern = '*'
-        pkg_dst = os.path.join(pkg_root_dst, neutered_prefix)
+        payload_subdir = ''
 
     package_maintainer = "conan"
     if dependency_item._conanfile.author:
@@ -85,67 +215,14 @@ def process_dependency(conanfile, output_folder, dependency_item):
     elif toolchain_metadata['author']:
         package_maintainer = toolchain_metadata['author']
 
-    # Copy the package content out of the Conan cache
-    copy(conanfile=conanfile,
-         src=dependency_item.package_folder,
-         excludes=['conaninfo.txt',
-                   'conanmanifest.txt',
-                   'conan*.sh',
-                   'deactivate_conan*.sh',
-                  ],
-         dst=pkg_dst,
-         pattern=copy_pattern,
-        )
-
-    # CONFLICT Avoid - Move typically reused license file paths to package-specific paths
-    for license_file in ['COPYING', 'LICENSE', 'LICENSES', 'COPYING.LESSER', 'COPYING.LESSERv3', 'COPYINGv2',]:
-        if os.path.exists(os.path.join(pkg_dst, 'licenses', license_file)):
-            mkdir(conanfile=conanfile,
-                  path=os.path.join(pkg_dst, 'licenses', dependency_item.ref.name),
-            )
-            rm(conanfile=conanfile,
-               folder=os.path.join(pkg_dst, 'licenses', dependency_item.ref.name),
-               pattern=os.path.join(license_file),
-            )
-            rename(conanfile=conanfile,
-                   src=os.path.join(pkg_dst, 'licenses', license_file),
-                   dst=os.path.join(pkg_dst, 'licenses', dependency_item.ref.name, license_file),
-            )
-            rm(conanfile=conanfile,
-               folder=os.path.join(pkg_dst, 'licenses'),
-               pattern=os.path.join(license_file),
-            )
-
-    # Copy the template content from the deployer installation
-    copy(conanfile=conanfile,
-         src=deb_template_path,
-         dst=pkg_root_dst,
-         pattern="*",
-        )
-
-    # NOTE: Mind the `_` in the tarball filename separating pkg name from version!
-    # tar czv --exclude debian --file opt+toolchain-make_4.4.1.orig.tar.gz opt+toolchain-make-4.4.1/
-
-    # tar up the deployment copy to use as dch/debuild sources
-    subprocess.run(['tar',
-                    '--create',
-                    '--gzip',
-                    '--exclude', 'debian',
-                    '--file', os.path.join(output_folder, f'{ dachshund_pkg_toolnamever }.orig.tar.gz'),
-                    '--directory', output_folder,
-                    os.path.join(dashed_pkg_toolnamever, neutered_prefix)
-                   ])
-
-    # pkg_name.dirs file
-    dirs_filename = os.path.join(pkg_root_dst, "debian", f'{ dashed_pkg_toolname }.dirs')
-    with open(dirs_filename, "w") as dirs_file:
-        dirs_file.write(f'{ neutered_prefix }\n')
+    package_email = "nobody@example.com"
+    if toolchain_metadata['email']:
+        package_email = toolchain_metadata['email']
 
-#TODO
-    # - build #/package revision or bootstrap versioning needs to be provided or detected somehow
-    # - EMAIL
-    # - %changelog ???
-#TODO  ./opt+toolchain-make-4.4.1/debian/copyright
+    # Every timestamp in the package, see `user.system_packaging:reproducible`
+    source_date_epoch = None
+    if config.get_reproducible(conanfile):
+        source_date_epoch = reproducible.source_date_epoch([dependency_item])
 
     ######################################################################
     # Gather dependency list from conanfile.py for use in control file
@@ -173,6 +250,187 @@ def process_dependency(conanfile, output_folder, dependency_item):
         for require_line in pkg_dep_list:
             conanfile.output.info(f'\t{ require_line }')
 
+    # Package Architecture, from the build host's own ELF header unless
+    # that's a machine we don't know. Packages without any ELF files
+    # become `all`, see `link_components()`.
+    dpkg_arch = elf.host_architecture('deb')
+    if dpkg_arch is None:
+        dpkg_arch_cmd = [ 'dpkg-architecture',
+                          '--query', 'DEB_BUILD_ARCH',
+                        ]
+        dpkg_arch_proc = tracer.run('dpkg-architecture', dpkg_arch_cmd, package=str(dependency_item),
+                                    capture_output=True, env=deb_environment(LANG=""), encoding='utf-8',)
+        dpkg_arch = dpkg_arch_proc.stdout.split('\n')[0]
+
+    return {'name': dashed_pkg_toolname,
+            'namever': dashed_pkg_toolnamever,
+            'dachshund_namever': dachshund_pkg_toolnamever,
+            'version': str(dependency_item.ref.version),
+            'install_prefix': str(toolchain_metadata['install_prefix']),
+            'package_prefix': package_prefix,
+            'neutered_prefix': neutered_prefix,
+            'copy_pattern': copy_pattern,
+            'payload_subdir': payload_subdir,
+            'maintainer': package_maintainer,
+            'email': package_email,
+            'summary': str(dependency_item.description),
+            'architecture': dpkg_arch,
+            'depends': pkg_dep_list,
+            'source_date_epoch': source_date_epoch,
+           }
+
+
+######################################################################
+# The .debs a dependency becomes, `(metadata, payload manifest)` pairs
+# with the runtime package first. Just the one unless
+# `user.system_packaging:split` is enabled. `depends` are the binary
+# package relationships besides `${misc:Depends}`.
+#
+def package_components(conanfile, dependency_item, metadata, payload_manifest):
+
+    if not config.get_split(conanfile):
+        return [(metadata, payload_manifest)]
+
+    components = []
+    for component, component_manifest in split.split_manifest(payload_manifest,
+                                                               split.make_rules(config.get_split_rules(dependency_item))):
+        component_metadata = split.component_metadata(metadata, component, 'deb')
+        if component in ['devel', 'debuginfo']:
+            component_metadata['depends'] = [f"{ metadata['name'] } (= { metadata['version'] }-1)"]
+        elif component == 'doc':
+            component_metadata['depends'] = []
+        components.append((component_metadata, component_manifest))
+
+    return components
+
+
+# ELF files of every payload, and what the system's shared libraries
+# offer when `user.system_packaging:shlib_deps` is enabled
+def library_index(conanfile, dependency_items, payload_manifests, tracer, elf_scans=None):
+    if elf_scans is None:
+        elf_scans = shlibs.scan_dependencies(dependency_items, payload_manifests, tracer,
+                                             max_workers=config.get_jobs(conanfile))
+
+    system_libraries = None
+    if config.get_shlib_deps(conanfile):
+        with tracer.span('libraries'):
+            system_libraries = shlibs.SystemLibraries('deb')
+
+    split_rules = None
+    if config.get_split(conanfile):
+        split_rules = [split.make_rules(config.get_split_rules(dependency_item)) for dependency_item in dependency_items]
+
+    return shlibs.LibraryIndex(dependency_items, payload_manifests, elf_scans,
+                               split_rules=split_rules,
+                               system_libraries=system_libraries,
+                              )
+
+
+######################################################################
+# Architecture and shared library relationships of a dependency's .debs,
+# from the ELF files in them. A .deb without any is `Architecture: all`.
+# With `user.system_packaging:shlib_deps` each .deb also `Depends:` on
+#
+# - the .debs of this deploy providing the sonames it links against, at
+#   their exact version
+# - the system packages the dpkg `shlibs`/`symbols` files name for the
+#   rest
+#
+# what `dh_shlibdeps` would find, in-process. -dbg packages get none.
+#
+def link_components(conanfile, dependency_item, components, libraries):
+
+    for component_metadata, component_manifest in components:
+        paths = component_manifest.paths()
+        if not libraries.has_elf_files(dependency_item, paths):
+            component_metadata['architecture'] = 'all'
+
+        if libraries.system_libraries is None or component_metadata.get('component') == 'debuginfo':
+            continue
+
+        provides, graph, system, unresolved = libraries.relationships(dependency_item, paths)
+
+        depends = list(component_metadata['depends'])
+        for provider_item, provider_component in graph:
+            depend = f"{ component_metadata['package_prefix'] }-{ provider_item.ref.name }" \
+                   + f"{ split.PACKAGE_SUFFIXES['deb'][provider_component] } (= { provider_item.ref.version }-1)"
+            if depend not in depends:
+                depends.append(depend)
+        depends.extend(depend for depend in system if depend not in depends)
+        component_metadata['depends'] = depends
+
+        for soname in unresolved:
+            conanfile.output.warning(f"{ component_metadata['name'] } links against { soname }, "
+                                     f'which no package provides')
+
+
+# dh_install(1) reads whitespace separated globs, match every payload
+# path literally
+def install_entry(path):
+    return ''.join(f'\\{ char }' if char in '*?[]{}~\\' else '?' if char.isspace() else char
+                   for char in path)
+
+
+# What debuild produced for `components`, whatever the architecture.
+# It leaves the binary packages next to the package tree.
+def built_debs(output_folder, components, pkg_ver_revision):
+    deb_files = []
+    for component_metadata, component_manifest in components:
+        deb_files.extend(glob.glob(os.path.join(output_folder,
+                                                f"{ component_metadata['name'] }_{ pkg_ver_revision }_*.deb")))
+    return deb_files
+
+
+# `shared_payload` returns the path of a payload tarball with a single
+# top directory, written for other package formats as well, see
+# `multi_deployer.py`. The package tree then only gets the template,
+# like with `staging=stream`.
+def process_dependency(conanfile, output_folder, dependency_item,
+                       payload_manifest=None, libraries=None, deploy_state=None, tracer=None, cleanup=False,
+                       shared_payload=None):
+
+    if tracer is None:
+        tracer = trace.Tracer(output_folder, 'deb_deployer', trace_format=None)
+    if payload_manifest is None:
+        payload_manifest = manifest.scan_dependencies(conanfile.options.install_prefix, [dependency_item], tracer)[0]
+        payload_manifest = payload_manifest.resolved(exclude=payload.UNOWNED_PATHS)
+    if libraries is None:
+        libraries = library_index(conanfile, [dependency_item], [payload_manifest], tracer)
+    package_label = str(dependency_item)
+
+    info_msg = 'Deployer Processing ' \
+             + str(dependency_item) \
+             + ': package_folder: ' \
+             + str(dependency_item.package_folder)
+
+    conanfile.output.info(info_msg)
+
+    metadata = package_metadata(conanfile, dependency_item, tracer)
+    components = package_components(conanfile, dependency_item, metadata, payload_manifest)
+    link_components(conanfile, dependency_item, components, libraries)
+    dashed_pkg_toolname = metadata['name']
+    dashed_pkg_toolnamever = metadata['namever']
+    dachshund_pkg_toolnamever = metadata['dachshund_namever']
+    neutered_prefix = metadata['neutered_prefix']
+    copy_pattern = metadata['copy_pattern']
+    package_maintainer = metadata['maintainer']
+    package_email = metadata['email']
+    pkg_dep_list = components[0][0]['depends']
+    dpkg_arch = components[0][0]['architecture']
+    source_date_epoch = metadata['source_date_epoch']
+
+    # Locate the template from the ~/.conan2/extensions/deployers directory
+    deployer_rootname = str(os.path.basename(__file__)).rstrip('.py')
+    deployer_support_dir = os.path.dirname(__file__)
+    deb_template_path = os.path.join(deployer_support_dir, deployer_rootname)
+
+    # A package with its own install_prefix carries that path inside its
+    # package folder already
+    pkg_root_dst = os.path.join(output_folder, dashed_pkg_toolnamever)
+    if metadata['payload_subdir']:
+        pkg_dst = pkg_root_dst
+    else:
+        pkg_dst = os.path.join(pkg_root_dst, neutered_prefix)
 
 #Depends: libc6 (>= 2.2.1), default-mta | mail-transport-agent
 # ./opt+toolchain-make-4.4.1/debian/control
@@ -180,13 +438,212 @@ def process_dependency(conanfile, output_folder, dependency_item):
     if pkg_dep_list:
         pkg_dependencies = ", " + ", ".join(pkg_dep_list)
 
-    # Detect the value for package Architecture
-    # TODO - support noarch pkgs
-    dpkg_arch_cmd = [ 'dpkg-architecture',
-                      '--query', 'DEB_BUILD_ARCH',
-                    ]
-    dpkg_arch_proc = subprocess.run( dpkg_arch_cmd, capture_output=True, env={'LANG': ""}, encoding='utf-8',)
-    dpkg_arch = dpkg_arch_proc.stdout.split('\n')[0]
+    ######################################################################
+    # Incremental deploys - reuse the previously built .deb if nothing
+    # that goes into it has changed, see `user.system_packaging:incremental`
+    #
+    fingerprint = {'package': state.package_reference(dependency_item),
+                   'install_prefix': metadata['install_prefix'],
+                   'tool_prefix': neutered_prefix,
+                   'maintainer': package_maintainer,
+                   'email': package_email,
+                   'description': str(dependency_item.description),
+                   'architecture': dpkg_arch,
+                   'depends': pkg_dep_list,
+                   'payload': payload_manifest.resolution(),
+                   'dedupe': config.get_dedupe(conanfile),
+                   'template': state.hash_files(deb_template_path, __file__, *state.module_files()),
+                   'builder': config.get_deb_builder(conanfile),
+                   'compression': config.get_compression(conanfile),
+                   'split': [component_metadata['name'] for component_metadata, component_manifest in components],
+                   'split_rules': config.get_split_rules(dependency_item) if config.get_split(conanfile) else None,
+                   'source_date_epoch': source_date_epoch,
+                   'links': [[component_metadata['architecture'], component_metadata['depends']]
+                             for component_metadata, component_manifest in components],
+                  }
+
+    if deploy_state is not None:
+        deb_files = deploy_state.reusable_artifacts(str(dependency_item.ref), fingerprint)
+        if deb_files is not None:
+            conanfile.output.info(f'Reusing unchanged { dashed_pkg_toolnamever } .deb: { deb_files }')
+            return deb_files
+
+    # Link byte-identical files together, only now that the .deb is
+    # actually being built, see `user.system_packaging:dedupe`
+    if config.get_dedupe(conanfile):
+        payload_manifest, components = manifest.deduplicate_components(payload_manifest, components, tracer,
+                                                                       package_label)
+
+    ######################################################################
+    # Native builder - write the binary .deb straight from the Conan
+    # cache, see `user.system_packaging:deb_builder`
+    #
+    if config.get_deb_builder(conanfile) == 'native':
+        pkg_ver_revision = str(dependency_item.ref.version) + "-1"
+
+        deb_files = []
+        for component_metadata, component_manifest in components:
+            binary_control = {'Package': component_metadata['name'],
+                              'Version': pkg_ver_revision,
+                              'Architecture': component_metadata['architecture'],
+                              'Maintainer': package_maintainer,
+                              'Vendor': package_maintainer,
+                              'Packager': 'conan-system-packaging',
+                              'Section': 'misc',
+                              'Priority': 'optional',
+                             }
+            if component_metadata['depends']:
+                binary_control['Depends'] = ", ".join(component_metadata['depends'])
+            binary_control['Description'] = component_metadata['summary']
+
+            deb_path = os.path.join(output_folder,
+                                    f"{ component_metadata['name'] }_{ pkg_ver_revision }_{ component_metadata['architecture'] }.deb")
+            conanfile.output.info(f'Writing { deb_path }')
+            with tracer.span('deb', package=package_label) as span:
+                debwriter.write_deb(deb_path,
+                                    binary_control,
+                                    trace.counted(component_manifest, span),
+                                    neutered_prefix,
+                                    data_compression=config.get_compression(conanfile),
+                                    source_date_epoch=source_date_epoch,
+                                   )
+                span.output_bytes = os.path.getsize(deb_path)
+            deb_files.append(deb_path)
+
+        if deploy_state is not None:
+            deploy_state.record(str(dependency_item.ref), fingerprint, deb_files)
+
+        return deb_files
+
+    # NOTE: Mind the `_` in the tarball filename separating pkg name from version!
+    # tar czv --exclude debian --file opt+toolchain-make_4.4.1.orig.tar.gz opt+toolchain-make-4.4.1/
+    payload_tarball = shared_payload() if shared_payload is not None else None
+    orig_compression = config.get_compression(conanfile, intermediate=True)
+    orig_tarball = os.path.join(output_folder,
+                                f'{ dachshund_pkg_toolnamever }.orig.{ compression.tar_extension(orig_compression) }')
+
+    if payload_tarball is not None:
+        conanfile.output.info(f'Using { payload_tarball } as the payload of { dashed_pkg_toolnamever }')
+    elif config.get_staging(conanfile) == 'stream':
+        # Build the orig tarball straight out of the Conan cache, no
+        # staging copy. The package tree only gets the template, and
+        # the template Makefile installs the payload from the tarball.
+        conanfile.output.info(f'Streaming { dependency_item.package_folder } to { orig_tarball }')
+        with tracer.span('tar', package=package_label) as span:
+            payload.write_tarball(trace.counted(payload_manifest, span),
+                                  orig_tarball,
+                                  os.path.join(dashed_pkg_toolnamever, neutered_prefix),
+                                  orig_compression,
+                                  source_date_epoch=source_date_epoch,
+                                 )
+            span.output_bytes = os.path.getsize(orig_tarball)
+
+    if payload_tarball is not None or config.get_staging(conanfile) == 'stream':
+        # Copy the template content from the deployer installation into
+        # an otherwise empty package tree
+        with tracer.span('template', package=package_label) as span:
+            shutil.rmtree(pkg_root_dst, ignore_errors=True)
+            trace.count_files(span, copy(conanfile=conanfile,
+                                         src=deb_template_path,
+                                         dst=pkg_root_dst,
+                                         pattern="*",
+                                        ))
+
+        with open(os.path.join(pkg_root_dst, 'payload.mk'), 'w') as payload_mk:
+            payload_mk.write(f'PAYLOAD_TARBALL := { payload_tarball or orig_tarball }\n')
+    else:
+        # Always stage into a fresh tree: files left over from a previous
+        # `staging=link` deploy may be hardlinks into the Conan cache, and
+        # `copy()` would overwrite them in place. This also drops any
+        # `payload.mk` from a previous streaming deploy.
+        shutil.rmtree(pkg_root_dst, ignore_errors=True)
+
+        if config.get_staging(conanfile) == 'link':
+            # debuild only ever reads the staged payload (the template
+            # Makefile copies it into DESTDIR), so hardlinks are safe.
+            # License relocation happens as paths are mapped, nothing in
+            # the staged tree gets renamed or removed afterwards.
+            with tracer.span('stage', package=package_label) as span:
+                payload.stage_payload(trace.counted(payload_manifest, span),
+                                      os.path.join(pkg_root_dst, neutered_prefix),
+                                      linking='link',
+                                     )
+        else:
+            # Copy the package content out of the Conan cache
+            with tracer.span('copy', package=package_label) as span:
+                trace.count_files(span, copy(conanfile=conanfile,
+                                             src=dependency_item.package_folder,
+                                             excludes=payload.PACKAGE_EXCLUDES,
+                                             dst=pkg_dst,
+                                             pattern=copy_pattern,
+                                            ))
+
+            with tracer.span('relocate', package=package_label) as span:
+                payload.apply_manifest(os.path.join(pkg_root_dst, neutered_prefix),
+                                       payload_manifest,
+                                      )
+                span.files = len(payload_manifest.relocated()) + len(payload_manifest.excluded)
+
+        # Copy the template content from the deployer installation
+        with tracer.span('template', package=package_label) as span:
+            trace.count_files(span, copy(conanfile=conanfile,
+                                         src=deb_template_path,
+                                         dst=pkg_root_dst,
+                                         pattern="*",
+                                        ))
+
+        # tar up the deployment copy to use as dch/debuild sources
+        tracer.run('tar',
+                   ['tar',
+                    '--create',
+                    *compression.tar_arguments(orig_compression),
+                    *reproducible.tar_arguments(source_date_epoch),
+                    '--exclude', 'debian',
+                    '--file', orig_tarball,
+                    '--directory', output_folder,
+                    os.path.join(dashed_pkg_toolnamever, neutered_prefix)
+                   ],
+                   package=package_label,
+                   output_path=orig_tarball,
+                  )
+
+    # Payload compression for dh_builddeb, dpkg-deb's own default unless configured
+    payload_compression = config.get_compression(conanfile)
+    builddeb_filename = os.path.join(pkg_root_dst, "debian", "builddeb.mk")
+    if payload_compression is not None:
+        with open(builddeb_filename, "w") as builddeb_file:
+            builddeb_file.write(f'DEB_BUILDDEB_OPTIONS := { " ".join(compression.dpkg_deb_arguments(payload_compression)) }\n')
+    elif os.path.exists(builddeb_filename):
+        os.remove(builddeb_filename)
+
+    # The template Makefile gives every installed file the same mtime,
+    # dpkg-deb would only clamp the newer ones
+    reproducible_filename = os.path.join(pkg_root_dst, "debian", "reproducible.mk")
+    if source_date_epoch is not None:
+        with open(reproducible_filename, "w") as reproducible_file:
+            reproducible_file.write(f'NORMALIZED_MTIME := { source_date_epoch }\n')
+    elif os.path.exists(reproducible_filename):
+        os.remove(reproducible_filename)
+
+    # pkg_name.dirs file
+    dirs_filename = os.path.join(pkg_root_dst, "debian", f'{ dashed_pkg_toolname }.dirs')
+    with open(dirs_filename, "w") as dirs_file:
+        dirs_file.write(f'{ neutered_prefix }\n')
+
+    # With more than one binary package the payload is installed to
+    # debian/tmp and dh_install picks every package's files from there
+    if len(components) > 1:
+        for component_metadata, component_manifest in components:
+            install_filename = os.path.join(pkg_root_dst, "debian", f"{ component_metadata['name'] }.install")
+            with open(install_filename, "w") as install_file:
+                install_file.writelines(f'{ install_entry(os.path.join(neutered_prefix, path)) }\n'
+                                        for path in component_manifest.paths())
+
+#TODO
+    # - build #/package revision or bootstrap versioning needs to be provided or detected somehow
+    # - EMAIL
+    # - %changelog ???
+#TODO  ./opt+toolchain-make-4.4.1/debian/copyright
 
     # Generate control file
     control_content = f'Source: { dashed_pkg_toolname }\n' \
@@ -203,45 +660,82 @@ def process_dependency(conanfile, output_folder, dependency_item):
                     + f'Depends: ${{misc:Depends}}{ pkg_dependencies }\n' \
                     + f'Description: { dependency_item.description }\n'
 
-#TODO Binary-only package?
-#    control_content = f'Package: { dashed_pkg_toolname }\n' \
-#                    + f'Version: { dependency_item.ref.version }' \
-#                    + f'Architecture: { dpkg_arch }\n' \
-#                    + f'Essential: no\n' \
-#                    + f'Priority: optional\n' \
-#                    + f'Depends: ${{shlibs:Depends}}, ${{misc:Depends}}{ pkg_dependencies }\n' \
-#                    + f'Maintainer: Not it\n' \
-#                    + f'Description: { dependency_item.description }\n'
+    for component_metadata, component_manifest in components[1:]:
+        control_content += f'\n' \
+                         + f"Package: { component_metadata['name'] }\n" \
+                         + f"Architecture: { component_metadata['architecture'] }\n" \
+                         + f"Depends: ${{misc:Depends}}{ ''.join(', ' + depend for depend in component_metadata['depends']) }\n" \
+                         + f"Description: { component_metadata['summary'] }\n"
 
     control_filename = os.path.join(pkg_root_dst, "debian", "control")
     with open(control_filename, 'w') as control_file:
         control_file.write(control_content)
 
     pkg_ver_revision = str(dependency_item.ref.version) + "-1"
-    dch_cmd = [ 'dch',
-                '--create',
-                '--newversion', pkg_ver_revision,
-                '--package', dashed_pkg_toolname,
-                'Generated by deb_deployer'
-              ]
-
-    package_email = "nobody@example.com"
-    if toolchain_metadata['email']:
-        package_email = toolchain_metadata['email']
-
-    conanfile.output.info('Executing dch: ' + str(dch_cmd))
-
-    # export EMAIL=somebody@example.com; dch --create -v 1.0-1 --package hello-world
-    subprocess.run( dch_cmd,
-                    env={'EMAIL': package_email},
-                    cwd=pkg_root_dst,
-                   )
+    if source_date_epoch is not None:
+        # `dch` dates the entry now and signs it with whoever runs it.
+        # dpkg-buildpackage derives SOURCE_DATE_EPOCH from this date.
+        with open(os.path.join(pkg_root_dst, "debian", "changelog"), 'w') as changelog_file:
+            changelog_file.write(reproducible.debian_changelog(dashed_pkg_toolname,
+                                                               pkg_ver_revision,
+                                                               package_maintainer,
+                                                               package_email,
+                                                               source_date_epoch,
+                                                               'Generated by deb_deployer',
+                                                              ))
+    else:
+        dch_cmd = [ 'dch',
+                    '--create',
+                    '--newversion', pkg_ver_revision,
+                    '--package', dashed_pkg_toolname,
+                    'Generated by deb_deployer'
+                  ]
+
+        conanfile.output.info('Executing dch: ' + str(dch_cmd))
+
+        # export EMAIL=somebody@example.com; dch --create -v 1.0-1 --package hello-world
+        tracer.run('dch',
+                   dch_cmd,
+                   package=package_label,
+                   env=deb_environment(EMAIL=package_email),
+                   cwd=pkg_root_dst,
+                  )
+
+    # .debs of an earlier deploy, e.g. for another architecture, would
+    # be taken for this build's
+    for deb_file in built_debs(output_folder, components, pkg_ver_revision):
+        os.remove(deb_file)
 
 #TODO `dpkg-buildpackage -b`? `dpkg-deb --build my-program_version_architecture`?`
     # Build the package
     debuild_cmd = ['debuild', '-us', '-uc']
     conanfile.output.info('Executing debuild: ' + str(debuild_cmd))
-    subprocess.run( debuild_cmd,
-                    env={'LANG': ""},
-                    cwd=pkg_root_dst,
-                   )
+    tracer.run('debuild',
+               debuild_cmd,
+               package=package_label,
+               env=deb_environment(LANG=""),
+               cwd=pkg_root_dst,
+              )
+
+    deb_files = built_debs(output_folder, components, pkg_ver_revision)
+
+    # Every component or nothing, so whatever the .debs were built from
+    # stays around for another try
+    if len(deb_files) != len(components):
+        raise ConanException(f'debuild produced { len(deb_files) } of { len(components) } .deb(s) '
+                             f'packaging { package_label }')
+    if deploy_state is not None:
+        deploy_state.record(str(dependency_item.ref), fingerprint, deb_files)
+
+    # Package tree, orig tarball and debuild's source package tarballs,
+    # see `user.system_packaging:cleanup`. The .dsc, .changes and build
+    # logs are small and stay.
+    if cleanup:
+        with tracer.span('cleanup', package=package_label) as span:
+            span.files, freed = payload.remove_intermediates([pkg_root_dst, orig_tarball]
+                                                             + glob.glob(os.path.join(output_folder,
+                                                                                      f'{ dachshund_pkg_toolnamever }-1.*tar.*')))
+        conanfile.output.info(f'Removed { span.files } intermediate file(s) of { package_label }, '
+                              f'{ freed / 1024 ** 2:.1f} MiB freed')
+
+    return deb_files
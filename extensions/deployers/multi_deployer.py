@@ -0,0 +1,261 @@
+######################################################################
+# multi_deployer.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Conan Custom Deployer script that builds the RPMs and the .debs of
+# every dependency in a single deploy, rather than running
+# `rpm_deployer` and `deb_deployer` back to back:
+#
+#   conan install --deployer=multi_deployer \
+#                 -c user.system_packaging:formats=rpm,deb \
+#                 .
+#
+# The graph walk, the payload scan, the conflict check and the ELF scan
+# happen once for both formats. With the `sources` RPM builder and the
+# `debuild` .deb builder (both defaults), each dependency's payload is
+# also copied out of the Conan cache only once: a tarball that is both
+# the `rpmbuild` sources and the payload the Debian template installs.
+# Then a dependency's RPM and .deb builds run concurrently.
+#
+# `rpm_deployer.py`, `deb_deployer.py` and their templates must be
+# installed next to this script, `conan config install <path|URL>`
+# does that.
+#
+# See project `README.md` for more installation and usage details.
+#
+
+from system_packaging import config, conflicts, manifest, payload, scheduler, shlibs, state, trace
+import deb_deployer
+import os
+import rpm_deployer
+import threading
+
+def deploy(graph, output_folder, **kwargs):
+
+    conanfile = graph.root.conanfile
+    formats = config.get_formats(conanfile)
+
+    # Every stage of both formats is timed, see `user.system_packaging:trace`
+    tracer = trace.Tracer(output_folder, 'multi_deployer', trace_format=config.get_trace_format(conanfile))
+
+    # Each format keeps the state of the single-format deployer, so
+    # incremental deploys can switch between them
+    deploy_states = {package_format: state.DeployState(output_folder, f'{ package_format }_deployer',
+                                                       incremental=config.get_conf(conanfile, 'incremental',
+                                                                                   default=False, check_type=bool),
+                                                      )
+                     for package_format in formats}
+
+    dependency_items = [dependency_item for name, dependency_item in conanfile.dependencies.items()
+                        if dependency_item.package_folder is not None]
+
+    try:
+        with tracer.span('deploy'):
+            # Pre-build phase, once for every format. Files no package
+            # may own are left out of the RPMs as well as the .debs.
+            payload_manifests = manifest.scan_dependencies(conanfile.options.install_prefix,
+                                                           dependency_items,
+                                                           tracer,
+                                                           max_workers=config.get_jobs(conanfile),
+                                                          )
+            payload_manifests = [payload_manifest.resolved(exclude=payload.UNOWNED_PATHS)
+                                 for payload_manifest in payload_manifests]
+            with tracer.span('conflicts'):
+                payload_manifests = conflicts.resolve_conflicts(conanfile,
+                                                                dependency_items,
+                                                                payload_manifests,
+                                                                policy=config.get_conflict_policy(conanfile),
+                                                               )
+
+            # One ELF scan, resolved against each format's system
+            # libraries, see `user.system_packaging:shlib_deps`
+            elf_scans = shlibs.scan_dependencies(dependency_items, payload_manifests, tracer,
+                                                 max_workers=config.get_jobs(conanfile))
+            libraries = {package_format: BACKENDS[package_format].library_index(conanfile, dependency_items,
+                                                                                payload_manifests, tracer,
+                                                                                elf_scans=elf_scans)
+                         for package_format in formats}
+
+            # Describe the packages without building any, see
+            # `user.system_packaging:plan`
+            if config.get_plan(conanfile):
+                with tracer.span('plan'):
+                    if 'rpm' in formats:
+                        rpm_deployer.write_plan(conanfile, output_folder, dependency_items, payload_manifests,
+                                                libraries['rpm'])
+                    if 'deb' in formats:
+                        deb_deployer.write_plan(conanfile, output_folder, dependency_items, payload_manifests,
+                                                libraries['deb'], tracer)
+                return
+
+            rpm_HOME = None
+            if 'rpm' in formats:
+                rpm_HOME = rpm_deployer.setup_rpm_home(conanfile, output_folder, tracer)
+
+            package_files = package_dependencies(conanfile, output_folder, rpm_HOME, formats, dependency_items,
+                                                 payload_manifests, libraries, deploy_states, tracer)
+
+            # Serve the packages as yum/dnf and apt repositories, see
+            # `user.system_packaging:repository`
+            if config.get_repository(conanfile):
+                if 'rpm' in formats:
+                    rpm_deployer.write_repository(conanfile, output_folder, rpm_HOME, package_files['rpm'], tracer)
+                if 'deb' in formats:
+                    deb_deployer.write_repository(conanfile, output_folder, package_files['deb'], tracer)
+    finally:
+        tracer.finish(conanfile)
+
+
+BACKENDS = {'rpm': rpm_deployer,
+            'deb': deb_deployer,
+           }
+
+
+######################################################################
+# Build every dependency in every format. Dependencies are packaged
+# concurrently as `user.system_packaging:jobs` and `disk_budget` allow,
+# the formats of each dependency concurrently on top of that. A
+# `rpm_builder=toolchain` build is one more job of its own. Returns
+# `{format: package files}`.
+#
+def package_dependencies(conanfile, output_folder, rpm_HOME, formats, dependency_items, payload_manifests,
+                         libraries, deploy_states, tracer):
+
+    toolchain = 'rpm' in formats and config.get_rpm_builder(conanfile) == 'toolchain'
+    dependency_formats = [package_format for package_format in formats if not (toolchain and package_format == 'rpm')]
+
+    disk_budget = scheduler.DiskBudget(config.get_disk_budget(conanfile))
+    jobs = []
+    if dependency_formats:
+        for dependency_item, payload_manifest in zip(dependency_items, payload_manifests):
+            jobs.append((str(dependency_item),
+                         tracer.wrap('package',
+                                     lambda dependency_item=dependency_item, payload_manifest=payload_manifest:
+                                         process_dependency(conanfile, output_folder, rpm_HOME, dependency_item,
+                                                            payload_manifest, dependency_formats, libraries,
+                                                            deploy_states, tracer, disk_budget),
+                                     package=str(dependency_item),
+                                    ),
+                        ))
+
+    if toolchain:
+        jobs.append(('toolchain',
+                     lambda: {'rpm': rpm_deployer.process_toolchain(conanfile, output_folder, rpm_HOME, dependency_items,
+                                                                    payload_manifests=payload_manifests,
+                                                                    libraries=libraries['rpm'],
+                                                                    deploy_state=deploy_states['rpm'],
+                                                                    tracer=tracer,
+                                                                    cleanup=config.get_cleanup(conanfile),
+                                                                   )},
+                    ))
+
+    results = scheduler.run_jobs(jobs, max_workers=config.get_jobs(conanfile))
+    return {package_format: [package_file for result in results for package_file in result.get(package_format, [])]
+            for package_format in formats}
+
+
+# Rough disk footprint of one dependency's builds in multiples of its
+# payload size, see the deployers' own `BUILD_FOOTPRINT`
+def build_footprint(conanfile, package_formats):
+    footprint = 0
+    if 'rpm' in package_formats:
+        footprint += rpm_deployer.BUILD_FOOTPRINT[config.get_rpm_builder(conanfile)]
+    if 'deb' in package_formats:
+        footprint += deb_deployer.BUILD_FOOTPRINT[config.get_deb_builder(conanfile)]
+    return footprint
+
+
+######################################################################
+# The payload tarball both formats of a dependency are built from,
+# written straight out of the Conan cache by the first build that
+# needs it. Incremental deploys reusing both packages never write it.
+# Its top directory is the RPM's `<name>-<version>`, which `%setup`
+# expects and the Debian template strips.
+#
+class SharedPayload:
+
+    def __init__(self, conanfile, output_folder, dependency_item, payload_manifest, tracer):
+        self.conanfile = conanfile
+        self.payloads_dir = os.path.join(output_folder, 'payloads')
+        self.dependency_item = dependency_item
+        self.payload_manifest = payload_manifest
+        self.tracer = tracer
+        self.path = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if self.path is None:
+                metadata = rpm_deployer.package_metadata(self.conanfile, self.dependency_item)
+                path = rpm_deployer.source_tarball_path(self.conanfile, self.payloads_dir, metadata)
+                os.makedirs(self.payloads_dir, exist_ok=True)
+                payload_manifest = self.payload_manifest
+                if config.get_dedupe(self.conanfile):
+                    payload_manifest = manifest.deduplicate(payload_manifest, self.tracer, str(self.dependency_item))
+                rpm_deployer.write_source_tarball(self.conanfile, self.dependency_item, metadata,
+                                                  payload_manifest, path, self.tracer)
+                self.path = path
+        return self.path
+
+
+######################################################################
+# Package one dependency in each of `package_formats`, concurrently,
+# holding its estimated footprint of `user.system_packaging:disk_budget`.
+# Returns `{format: package files}`.
+#
+def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item, payload_manifest, package_formats,
+                       libraries, deploy_states, tracer, disk_budget):
+
+    footprint = payload_manifest.stored_size() * build_footprint(conanfile, package_formats)
+    if disk_budget.budget is None:
+        disk_budget.acquire(footprint)
+    else:
+        with tracer.span('budget', package=str(dependency_item)):
+            disk_budget.acquire(footprint)
+
+    try:
+        cleanup = config.get_cleanup(conanfile)
+
+        # Only the `sources` RPM and the `debuild` .deb builds go through
+        # a payload tarball, the other builders read the Conan cache
+        shared_payload = None
+        if package_formats == config.PACKAGE_FORMATS and config.get_rpm_builder(conanfile) == 'sources' \
+           and config.get_deb_builder(conanfile) == 'debuild':
+            shared_payload = SharedPayload(conanfile, output_folder, dependency_item, payload_manifest, tracer)
+
+        builds = {'rpm': lambda: rpm_deployer.process_dependency(conanfile, output_folder, rpm_HOME, dependency_item,
+                                                                 payload_manifest=payload_manifest,
+                                                                 libraries=libraries['rpm'],
+                                                                 deploy_state=deploy_states['rpm'],
+                                                                 tracer=tracer,
+                                                                 cleanup=cleanup,
+                                                                 shared_payload=shared_payload,
+                                                                ),
+                  'deb': lambda: deb_deployer.process_dependency(conanfile, output_folder, dependency_item,
+                                                                 payload_manifest=payload_manifest,
+                                                                 libraries=libraries['deb'],
+                                                                 deploy_state=deploy_states['deb'],
+                                                                 tracer=tracer,
+                                                                 cleanup=cleanup,
+                                                                 shared_payload=shared_payload,
+                                                                ),
+                 }
+
+        # A format that fails to build any of its packages raises, after
+        # the other format's build has finished
+        package_files = dict(zip(package_formats,
+                                 scheduler.run_jobs([(package_format, builds[package_format])
+                                                     for package_format in package_formats],
+                                                    max_workers=len(package_formats),
+                                                   )))
+
+        # The shared payload goes once every format has all of its
+        # packages, see `user.system_packaging:cleanup`. After a failure
+        # it stays for the next deploy to build from.
+        if cleanup and shared_payload is not None and shared_payload.path is not None:
+            rpm_deployer.remove_intermediates(conanfile, [shared_payload.path], str(dependency_item), tracer)
+
+        return package_files
+    finally:
+        disk_budget.release(footprint)
@@ -20,9 +20,13 @@
 # See project `README.md` for more installation and usage details.
 #
 
-from conan.tools.files import copy, mkdir, rename, rm
-#from conan.errors import ConanException
+from conan.tools.files import copy, mkdir
+from conan.errors import ConanException
+from system_packaging import compression, config, conflicts, elf, manifest, payload, plan, repository, reproducible, rpmspec, scheduler, shlibs, split, state, trace
+import glob
 import os
+import platform
+import shutil
 import subprocess
 import email.utils
 
@@ -30,36 +34,198 @@ def deploy(graph, output_folder, **kwargs):
 
     conanfile = graph.root.conanfile
 
-    # Set up RPM dev tree in a temporary HOME directory
-    orig_HOME = os.environ['HOME']
+    # Every stage is timed, see `user.system_packaging:trace`
+    tracer = trace.Tracer(output_folder, 'rpm_deployer', trace_format=config.get_trace_format(conanfile))
+
+    rpm_HOME = setup_rpm_home(conanfile, output_folder, tracer)
+
+    # Previously built RPMs are reused when `user.system_packaging:incremental`
+    # is enabled, the state is always recorded.
+    deploy_state = state.DeployState(output_folder, 'rpm_deployer',
+                                     incremental=config.get_conf(conanfile, 'incremental',
+                                                                 default=False, check_type=bool),
+                                    )
+
+    dependency_items = [dependency_item for name, dependency_item in conanfile.dependencies.items()
+                        if dependency_item.package_folder is not None]
+
+    try:
+        with tracer.span('deploy'):
+            # Pre-build phase - list every payload once and settle files
+            # shipped by more than one package before anything expensive
+            # runs, see `user.system_packaging:conflicts`
+            payload_manifests = manifest.scan_dependencies(conanfile.options.install_prefix,
+                                                           dependency_items,
+                                                           tracer,
+                                                           max_workers=config.get_jobs(conanfile),
+                                                          )
+            with tracer.span('conflicts'):
+                payload_manifests = conflicts.resolve_conflicts(conanfile,
+                                                                dependency_items,
+                                                                payload_manifests,
+                                                                policy=config.get_conflict_policy(conanfile),
+                                                                ignored_paths=rpmspec.FILES_EXCLUDES,
+                                                               )
+
+            # Machine code and shared libraries of every payload, see
+            # `user.system_packaging:shlib_deps`
+            libraries = library_index(conanfile, dependency_items, payload_manifests, tracer)
+
+            # Describe the RPMs without building any, see
+            # `user.system_packaging:plan`
+            if config.get_plan(conanfile):
+                with tracer.span('plan'):
+                    write_plan(conanfile, output_folder, dependency_items, payload_manifests, libraries)
+                return
+
+            # All RPMs out of a single spec and a single rpmbuild run, see
+            # `user.system_packaging:rpm_builder`
+            if config.get_rpm_builder(conanfile) == 'toolchain':
+                rpm_files = process_toolchain(conanfile, output_folder, rpm_HOME, dependency_items,
+                                              payload_manifests=payload_manifests,
+                                              libraries=libraries,
+                                              deploy_state=deploy_state,
+                                              tracer=tracer,
+                                              cleanup=config.get_cleanup(conanfile),
+                                             )
+            else:
+                # Package independent dependencies concurrently, see
+                # `user.system_packaging:jobs`, as far as
+                # `user.system_packaging:disk_budget` allows
+                disk_budget = scheduler.DiskBudget(config.get_disk_budget(conanfile))
+                jobs = []
+                for dependency_item, payload_manifest in zip(dependency_items, payload_manifests):
+                    jobs.append((str(dependency_item),
+                                 tracer.wrap('package',
+                                             lambda dependency_item=dependency_item, payload_manifest=payload_manifest:
+                                                 process_within_budget(conanfile, output_folder, rpm_HOME, dependency_item,
+                                                                       payload_manifest, libraries, deploy_state, tracer,
+                                                                       disk_budget),
+                                             package=str(dependency_item),
+                                            ),
+                                ))
+
+                rpm_files = [rpm_file for dependency_rpm_files in scheduler.run_jobs(jobs, max_workers=config.get_jobs(conanfile))
+                             for rpm_file in dependency_rpm_files]
+
+            # Serve `RPMS/` as a yum/dnf repository, see
+            # `user.system_packaging:repository`
+            if config.get_repository(conanfile):
+                write_repository(conanfile, output_folder, rpm_HOME, rpm_files, tracer)
+    finally:
+        tracer.finish(conanfile)
+
+
+# Set up RPM dev tree in a temporary HOME directory.
+# We'll share a single RPM dev tree for all toolchain packages, every
+# package gets its own BUILD/BUILDROOT/SOURCES entries within it.
+def setup_rpm_home(conanfile, output_folder, tracer):
     rpm_HOME = os.path.join(output_folder, 'RPM_HOME')
-    os.environ['HOME'] = rpm_HOME
+    if not config.get_plan(conanfile):
+        mkdir(conanfile=conanfile,
+              path=rpm_HOME,
+             )
+        tracer.run('rpmdev-setuptree', ['rpmdev-setuptree'], env=rpm_environment(rpm_HOME))
+    return rpm_HOME
 
-    # We'll share a single RPM dev tree for all toolchain packages
-    mkdir(conanfile=conanfile,
-          path=os.path.join(output_folder, 'RPM_HOME'),
-         )
 
-    subprocess.run(['rpmdev-setuptree'])
-
-    for name, dependency_item in conanfile.dependencies.items():
-        if dependency_item.package_folder is None:
-            continue
-        process_dependency(conanfile, output_folder, rpm_HOME, dependency_item)
-
-    # restore original $HOME setting
-    os.environ['HOME'] = orig_HOME
-
-
-# Function to ensure we capture any transitive dependencies
-def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item):
+# Each rpmbuild job gets its own environment rather than modifying the
+# global `os.environ`, so concurrent jobs can't trample each other.
+#
+# - set HOME - `rpmdev-setuptree` and `rpmbuild` locate `~/rpmbuild`
+#   and `~/.rpmmacros` through it
+# - set QA_RPATHS - Turn off any failing RPATH checks
+def rpm_environment(rpm_HOME, source_date_epoch=None):
+    rpm_env = dict(os.environ)
+    rpm_env['HOME'] = rpm_HOME
+    rpm_env['QA_RPATHS'] = "0x0020"
+    if source_date_epoch is not None:
+        rpm_env['SOURCE_DATE_EPOCH'] = str(source_date_epoch)
+    return rpm_env
+
+
+# Rough disk footprint of one dependency's build in multiples of its
+# payload size, hardlinked and reflinked copies included. `sources`:
+# staging tree, source tarball, BUILD extraction, BUILDROOT and RPM.
+# `buildroot`: prepared buildroot, BUILDROOT and RPM.
+BUILD_FOOTPRINT = {'sources': 5, 'buildroot': 3}
+
+
+# Package a dependency holding its estimated footprint of
+# `user.system_packaging:disk_budget` until its intermediates are gone
+def process_within_budget(conanfile, output_folder, rpm_HOME, dependency_item, payload_manifest,
+                          libraries, deploy_state, tracer, disk_budget):
+
+    footprint = payload_manifest.stored_size() * BUILD_FOOTPRINT[config.get_rpm_builder(conanfile)]
+    if disk_budget.budget is None:
+        disk_budget.acquire(footprint)
+    else:
+        with tracer.span('budget', package=str(dependency_item)):
+            disk_budget.acquire(footprint)
+
+    try:
+        return process_dependency(conanfile, output_folder, rpm_HOME, dependency_item,
+                                  payload_manifest=payload_manifest,
+                                  libraries=libraries,
+                                  deploy_state=deploy_state,
+                                  tracer=tracer,
+                                  cleanup=config.get_cleanup(conanfile),
+                                 )
+    finally:
+        disk_budget.release(footprint)
+
+
+# Delete what went into a package once it's built, see
+# `user.system_packaging:cleanup`
+def remove_intermediates(conanfile, intermediates, package_label, tracer):
+    with tracer.span('cleanup', package=package_label) as span:
+        span.files, freed = payload.remove_intermediates(intermediates)
+    conanfile.output.info(f'Removed { span.files } intermediate file(s) of { package_label }, '
+                          f'{ freed / 1024 ** 2:.1f} MiB freed')
+
+
+# The RPMs this deploy would build as `rpm_deployer-plan.json`. rpmbuild
+# builds for the host's architecture.
+def write_plan(conanfile, output_folder, dependency_items, payload_manifests, libraries):
+    entries = []
+    for dependency_item, payload_manifest in zip(dependency_items, payload_manifests):
+        metadata = package_metadata(conanfile, dependency_item)
+        components = package_components(conanfile, dependency_item, metadata, payload_manifest)
+        link_components(conanfile, dependency_item, components, libraries)
+        for component_metadata, component_manifest in components:
+            entries.append(plan.package_entry(dependency_item, component_metadata, component_manifest,
+                                              architecture='noarch' if component_metadata.get('noarch')
+                                                           else elf.host_architecture('rpm') or platform.machine(),
+                                              requires=[require_line.split(':', 1)[1].strip()
+                                                        for require_line in component_metadata['requires']],
+                                              provides=[provide_line.split(':', 1)[1].strip()
+                                                        for provide_line in component_metadata.get('provides', [])],
+                                             ))
+
+    plan_path = plan.write_plan(output_folder, 'rpm_deployer', str(conanfile.options.install_prefix), entries)
+    plan.log_plan(conanfile, entries, 'requires')
+    conanfile.output.info(f'Wrote the plan for { len(entries) } RPM(s) to { plan_path }, nothing was built')
+
+
+# Index the RPMs of this deploy in `RPM_HOME/rpmbuild/RPMS/repodata`
+def write_repository(conanfile, output_folder, rpm_HOME, rpm_files, tracer):
+    repo_root = os.path.join(rpm_HOME, 'rpmbuild', 'RPMS')
+    with tracer.span('repository') as span:
+        span.files = repository.write_yum_repodata(repo_root,
+                                                   [os.path.relpath(rpm_file, repo_root) for rpm_file in rpm_files],
+                                                   repository.MetadataCache(output_folder, 'rpm_deployer'),
+                                                   max_workers=config.get_jobs(conanfile),
+                                                  )
+    conanfile.output.info(f'Wrote yum repository metadata for { len(rpm_files) } RPM(s) to { repo_root }, '
+                          f'{ span.files } read')
 
-    info_msg = 'Deployer Processing ' \
-             + str(dependency_item) \
-             + ': package_folder: ' \
-             + str(dependency_item.package_folder)
 
-    conanfile.output.info(info_msg)
+######################################################################
+# Everything about the RPM a dependency becomes, derived from the
+# Conan graph alone. Shared by the per-dependency and the single-spec
+# builds.
+#
+def package_metadata(conanfile, dependency_item):
 
     # Gather up toplevel metadata for all dependencies if not provided.
     toolchain_metadata = {'install_prefix': conanfile.options.install_prefix,
@@ -86,12 +252,12 @@ def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item):
         # strip leading '/' off install_prefix
         neutered_prefix = str(tool_prefix).lstrip("/")
         copy_pattern = f'{ neutered_prefix }/*'
-        pkg_dst = os.path.join(output_folder, dashed_pkg_toolnamever)
+        payload_subdir = neutered_prefix
     else:
         # strip leading '/' off install_prefix
         neutered_prefix = str(toolchain_metadata['install_prefix']).lstrip("/")
         copy_pattern = '*'
-        pkg_dst = os.path.join(output_folder, dashed_pkg_toolnamever, neutered_prefix)
+        payload_subdir = ''
 
     package_maintainer = "conan"
     if dependency_item._conanfile.author:
@@ -99,52 +265,6 @@ def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item):
     elif toolchain_metadata['author']:
         package_maintainer = toolchain_metadata['author']
 
-    copy(conanfile=conanfile,
-         src=dependency_item.package_folder,
-         excludes=['conaninfo.txt',
-                   'conanmanifest.txt',
-                   'conan*.sh',
-                   'deactivate_conan*.sh',
-                  ],
-         dst=pkg_dst,
-         pattern=copy_pattern,
-        )
-
-    # CONFLICT Avoid - Move typically reused license file paths to package-specific paths
-    for license_file in ['COPYING', 'LICENSE', 'LICENSES', 'COPYING.LESSER', 'COPYING.LESSERv3', 'COPYINGv2',]:
-        if os.path.exists(os.path.join(pkg_dst, 'licenses', license_file)):
-            mkdir(conanfile=conanfile,
-                  path=os.path.join(pkg_dst, 'licenses', dependency_item.ref.name),
-            )
-            rm(conanfile=conanfile,
-               folder=os.path.join(pkg_dst, 'licenses', dependency_item.ref.name),
-               pattern=os.path.join(license_file),
-            )
-            rename(conanfile=conanfile,
-                   src=os.path.join(pkg_dst, 'licenses', license_file),
-                   dst=os.path.join(pkg_dst, 'licenses', dependency_item.ref.name, license_file),
-            )
-            rm(conanfile=conanfile,
-               folder=os.path.join(pkg_dst, 'licenses'),
-               pattern=os.path.join(license_file),
-            )
-
-    # tar up the deployment copy to use as rpmbuild sources
-    subprocess.run(['tar',
-                    '--create',
-                    '--gzip',
-                    '--file', os.path.join(rpm_HOME, 'rpmbuild', 'SOURCES', f'{ dashed_pkg_toolnamever }.tar.gz'),
-                    '--directory', output_folder,
-                    os.path.join(dashed_pkg_toolnamever, neutered_prefix)
-                   ])
-
-    # rpm spec template populated with information from conanfile
-    #TODO
-    # - build # or bootstrap versioning needs to be provided or detected somehow
-    # - Summary, arch(x86_64, aarch64, noarch, etc)
-    # - author, dependencies
-    # - %changelog ???
-
     ###################################################################### 
     # Gather dependency list from conanfile.py for use in RPM spec
     # `Requires:` list with prefixed package names...
@@ -175,15 +295,363 @@ def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item):
         for require_line in tool_dependencies:
             conanfile.output.info(f'\t{ require_line }')
 
+    return {'name': dashed_pkg_toolname,
+            'namever': dashed_pkg_toolnamever,
+            'version': str(dependency_item.ref.version),
+            'install_prefix': str(toolchain_metadata['install_prefix']),
+            'package_prefix': package_prefix,
+            'neutered_prefix': neutered_prefix,
+            'copy_pattern': copy_pattern,
+            'payload_subdir': payload_subdir,
+            'maintainer': package_maintainer,
+            'summary': str(dependency_item.description),
+            'license': str(dependency_item.license),
+            'requires': tool_dependencies,
+            'source_date_epoch': reproducible.source_date_epoch([dependency_item])
+                                 if config.get_reproducible(conanfile) else None,
+           }
+
+
+######################################################################
+# The RPMs a dependency becomes, `(metadata, payload manifest)` pairs
+# with the runtime package first. Just the one unless
+# `user.system_packaging:split` is enabled.
+#
+def package_components(conanfile, dependency_item, metadata, payload_manifest):
+
+    if not config.get_split(conanfile):
+        return [(metadata, payload_manifest)]
+
+    components = []
+    for component, component_manifest in split.split_manifest(payload_manifest,
+                                                               split.make_rules(config.get_split_rules(dependency_item))):
+        component_metadata = split.component_metadata(metadata, component, 'rpm')
+        if component in ['devel', 'debuginfo']:
+            component_metadata['requires'] = [f"Requires: { metadata['name'] } = { metadata['version'] }"]
+        elif component == 'doc':
+            component_metadata['requires'] = []
+        components.append((component_metadata, component_manifest))
+
+    return components
+
+
+# ELF files of every payload, and what the system's shared libraries
+# offer when `user.system_packaging:shlib_deps` is enabled
+def library_index(conanfile, dependency_items, payload_manifests, tracer, elf_scans=None):
+    if elf_scans is None:
+        elf_scans = shlibs.scan_dependencies(dependency_items, payload_manifests, tracer,
+                                             max_workers=config.get_jobs(conanfile))
+
+    system_libraries = None
+    if config.get_shlib_deps(conanfile):
+        with tracer.span('libraries'):
+            system_libraries = shlibs.SystemLibraries('rpm')
+
+    split_rules = None
+    if config.get_split(conanfile):
+        split_rules = [split.make_rules(config.get_split_rules(dependency_item)) for dependency_item in dependency_items]
+
+    return shlibs.LibraryIndex(dependency_items, payload_manifests, elf_scans,
+                               split_rules=split_rules,
+                               system_libraries=system_libraries,
+                              )
+
+
+######################################################################
+# Architecture and shared library relationships of a dependency's RPMs,
+# from the ELF files in them. An RPM without any is `noarch`. With
+# `user.system_packaging:shlib_deps` each RPM also gets
+#
+# - `Requires:` on the RPMs of this deploy providing the sonames it
+#   links against, at their exact version
+# - `Requires:` on the system's soname capabilities for the rest
+# - `Provides:` for the sonames of its own libraries
+#
+# just what rpm's own dependency generator would find, which stays off
+# with `AutoReqProv: no`. -debuginfo RPMs get none of them.
+#
+def link_components(conanfile, dependency_item, components, libraries):
+
+    for component_metadata, component_manifest in components:
+        paths = component_manifest.paths()
+        component_metadata['noarch'] = not libraries.has_elf_files(dependency_item, paths)
+
+        if libraries.system_libraries is None or component_metadata.get('component') == 'debuginfo':
+            continue
+
+        provides, graph, system, unresolved = libraries.relationships(dependency_item, paths)
+
+        requires = list(component_metadata['requires'])
+        for provider_item, provider_component in graph:
+            require_line = f"Requires: { component_metadata['package_prefix'] }-{ provider_item.ref.name }" \
+                         + f"{ split.PACKAGE_SUFFIXES['rpm'][provider_component] } = { provider_item.ref.version }"
+            if require_line not in requires:
+                requires.append(require_line)
+        requires.extend(f'Requires: { capability }' for capability in system
+                        if f'Requires: { capability }' not in requires)
+
+        component_metadata['requires'] = requires
+        component_metadata['provides'] = [f'Provides: { shlibs.rpm_capability(soname, elf_class) }'
+                                          for soname, elf_class in provides]
+
+        for soname in unresolved:
+            conanfile.output.warning(f"{ component_metadata['name'] } links against { soname }, "
+                                     f'which no package provides')
+
+
+# Explicit `%files -f` list for the dependency's RPM
+def write_files_manifest(output_folder, metadata, payload_manifest):
+    files_manifest_path = os.path.join(output_folder, f"{ metadata['namever'] }.files")
+    with open(files_manifest_path, 'w') as files_manifest:
+        files_manifest.write(rpmspec.files_manifest(metadata['neutered_prefix'], payload_manifest.paths(),
+                                                    root_owned=metadata['source_date_epoch'] is not None))
+    return files_manifest_path
+
+
+# rpmbuild's `Source0` for a dependency, in `sources_dir`
+def source_tarball_path(conanfile, sources_dir, metadata):
+    source_ext = compression.tar_extension(config.get_compression(conanfile, intermediate=True))
+    return os.path.join(sources_dir, f"{ metadata['namever'] }.{ source_ext }")
+
+
+# Build the rpmbuild sources tarball straight out of the Conan cache,
+# no staging copy in the output folder
+def write_source_tarball(conanfile, dependency_item, metadata, payload_manifest, source_tarball, tracer):
+    conanfile.output.info(f'Streaming { dependency_item.package_folder } to { source_tarball }')
+    with tracer.span('tar', package=str(dependency_item)) as span:
+        payload.write_tarball(trace.counted(payload_manifest, span),
+                              source_tarball,
+                              os.path.join(metadata['namever'], metadata['neutered_prefix']),
+                              config.get_compression(conanfile, intermediate=True),
+                              source_date_epoch=metadata['source_date_epoch'],
+                             )
+        span.output_bytes = os.path.getsize(source_tarball)
+
+
+######################################################################
+# Stage a dependency's payload once, straight into the tree rpmbuild's
+# `%install` will hardlink into its buildroot. Returns the tree's path.
+#
+def stage_buildroot(conanfile, output_folder, dependency_item, metadata, payload_manifest, tracer):
+
+    prepared_buildroot = os.path.join(output_folder, metadata['namever'])
+
+    # Start from scratch so nothing unpackaged is left over from a
+    # previous deploy.
+    conanfile.output.info(f'Staging { dependency_item.package_folder } to { prepared_buildroot }')
+    with tracer.span('stage', package=str(dependency_item)) as span:
+        shutil.rmtree(prepared_buildroot, ignore_errors=True)
+        #
+        # rpmbuild's brp scripts (strip, debugedit) rewrite buildroot
+        # files in place, so `staging=link` may only use reflinks here:
+        # a hardlink would let them modify the Conan cache. Without
+        # them, only reproducible mtimes would.
+        linking = None
+        if config.get_staging(conanfile) == 'link':
+            linking = 'reflink'
+            if config.get_rpm_postprocess(conanfile) == 'skip' and not config.get_reproducible(conanfile):
+                linking = 'link'
+        payload.stage_payload(trace.counted(payload_manifest, span),
+                              os.path.join(prepared_buildroot, metadata['neutered_prefix']),
+                              linking=linking,
+                             )
+
+    return prepared_buildroot
+
+
+# rpmbuild's post-install chain for `components`, see
+# `user.system_packaging:rpm_postprocess`
+def postprocess_arguments(conanfile, components):
+    return rpmspec.postprocess_arguments(config.get_rpm_postprocess(conanfile),
+                                         own_debuginfo=any(component_metadata.get('component') == 'debuginfo'
+                                                           for component_metadata, component_manifest in components),
+                                         debuginfo_jobs=config.get_debuginfo_jobs(conanfile),
+                                         dwz=config.get_debuginfo_dwz(conanfile),
+                                        )
+
+
+# What rpmbuild produced for `components`, whatever the arch and dist
+# tag: `(component RPMs, rpm's own -debuginfo RPMs)`. Our own
+# -debuginfo component has the name rpm's would get, so it only counts
+# as a component RPM.
+def built_rpms(rpm_HOME, components):
+    rpms_dir = os.path.join(rpm_HOME, 'rpmbuild', 'RPMS', '*')
+    rpm_files = []
+    for component_metadata, component_manifest in components:
+        rpm_files.extend(glob.glob(os.path.join(rpms_dir, f"{ component_metadata['namever'] }-*.rpm")))
+    debuginfo_files = []
+    for component_metadata, component_manifest in components:
+        debuginfo_files.extend(debuginfo_file
+                               for debuginfo_file in glob.glob(os.path.join(rpms_dir,
+                                                                            f"{ component_metadata['name'] }-debuginfo-"
+                                                                            f"{ component_metadata['version'] }-*.rpm"))
+                               if debuginfo_file not in rpm_files)
+    return rpm_files, debuginfo_files
+
+
+# Remove whatever an earlier deploy built for `components`, e.g. for
+# another architecture, so `built_rpms()` only finds this build's RPMs
+def remove_built_rpms(rpm_HOME, components):
+    rpm_files, debuginfo_files = built_rpms(rpm_HOME, components)
+    for rpm_file in rpm_files + debuginfo_files:
+        os.remove(rpm_file)
+
+
+# Function to ensure we capture any transitive dependencies.
+# `shared_payload` returns the path of a sources tarball written by
+# `write_source_tarball()` for other package formats as well, see
+# `multi_deployer.py`.
+def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item,
+                       payload_manifest=None, libraries=None, deploy_state=None, tracer=None, cleanup=False,
+                       shared_payload=None):
+
+    if tracer is None:
+        tracer = trace.Tracer(output_folder, 'rpm_deployer', trace_format=None)
+    if payload_manifest is None:
+        payload_manifest = manifest.scan_dependencies(conanfile.options.install_prefix, [dependency_item], tracer)[0]
+    if libraries is None:
+        libraries = library_index(conanfile, [dependency_item], [payload_manifest], tracer)
+    package_label = str(dependency_item)
+
+    info_msg = 'Deployer Processing ' \
+             + str(dependency_item) \
+             + ': package_folder: ' \
+             + str(dependency_item.package_folder)
+
+    conanfile.output.info(info_msg)
+
+    metadata = package_metadata(conanfile, dependency_item)
+    components = package_components(conanfile, dependency_item, metadata, payload_manifest)
+    link_components(conanfile, dependency_item, components, libraries)
+    dashed_pkg_toolname = metadata['name']
+    dashed_pkg_toolnamever = metadata['namever']
+    neutered_prefix = metadata['neutered_prefix']
+    copy_pattern = metadata['copy_pattern']
+    payload_subdir = metadata['payload_subdir']
+    package_maintainer = metadata['maintainer']
+    tool_dependencies = components[0][0]['requires'] + components[0][0].get('provides', [])
+
+    # A package with its own install_prefix carries that path inside its
+    # package folder already
+    if payload_subdir:
+        pkg_dst = os.path.join(output_folder, dashed_pkg_toolnamever)
+    else:
+        pkg_dst = os.path.join(output_folder, dashed_pkg_toolnamever, neutered_prefix)
+
+    # Use the RPM spec template provided with the extension
+    deployer_rootname = str(os.path.basename(__file__)).rstrip('.py')
+    deployer_support_dir = os.path.dirname(__file__)
+    spec_template_path = os.path.join(deployer_support_dir, deployer_rootname, 'template-v1.0.0.spec')
+
+    ######################################################################
+    # Incremental deploys - reuse the previously built RPM if nothing
+    # that goes into it has changed, see `user.system_packaging:incremental`
+    #
+    fingerprint = {'package': state.package_reference(dependency_item),
+                   'install_prefix': metadata['install_prefix'],
+                   'tool_prefix': neutered_prefix,
+                   'maintainer': package_maintainer,
+                   'summary': metadata['summary'],
+                   'license': metadata['license'],
+                   'requires': tool_dependencies,
+                   'payload': payload_manifest.resolution(),
+                   'dedupe': config.get_dedupe(conanfile),
+                   'template': state.hash_files(spec_template_path, __file__, *state.module_files()),
+                   'builder': config.get_rpm_builder(conanfile),
+                   'compression': config.get_compression(conanfile),
+                   'postprocess': [config.get_rpm_postprocess(conanfile), config.get_debuginfo_dwz(conanfile)],
+                   'split': [component_metadata['name'] for component_metadata, component_manifest in components],
+                   'split_rules': config.get_split_rules(dependency_item) if config.get_split(conanfile) else None,
+                   'source_date_epoch': metadata['source_date_epoch'],
+                   'links': [[component_metadata['noarch'], component_metadata['requires'],
+                              component_metadata.get('provides', [])]
+                             for component_metadata, component_manifest in components],
+                  }
+
+    if deploy_state is not None:
+        rpm_files = deploy_state.reusable_artifacts(str(dependency_item.ref), fingerprint)
+        if rpm_files is not None:
+            conanfile.output.info(f'Reusing unchanged { dashed_pkg_toolnamever } RPM: { rpm_files }')
+            return rpm_files
+
+    # Link byte-identical files together, only now that the RPM is
+    # actually being built, see `user.system_packaging:dedupe`
+    if config.get_dedupe(conanfile):
+        payload_manifest, components = manifest.deduplicate_components(payload_manifest, components, tracer,
+                                                                       package_label)
+
+    payload_tarball = shared_payload() if shared_payload is not None else None
+    source_compression = config.get_compression(conanfile, intermediate=True)
+    source_ext = compression.tar_extension(source_compression)
+    source_tarball = payload_tarball or source_tarball_path(conanfile, os.path.join(rpm_HOME, 'rpmbuild', 'SOURCES'),
+                                                            metadata)
+
+    files_manifest_path = write_files_manifest(output_folder, metadata, components[0][1])
+
+    if config.get_rpm_builder(conanfile) == 'buildroot':
+        prepared_buildroot = stage_buildroot(conanfile, output_folder, dependency_item, metadata,
+                                             payload_manifest, tracer)
+    elif payload_tarball is not None:
+        conanfile.output.info(f'Using { payload_tarball } as the sources of { dashed_pkg_toolnamever }')
+    elif config.get_staging(conanfile) == 'stream':
+        write_source_tarball(conanfile, dependency_item, metadata, payload_manifest, source_tarball, tracer)
+    else:
+        # Always stage into a fresh tree: files left over from a previous
+        # `staging=link` deploy may be hardlinks into the Conan cache, and
+        # `copy()` would overwrite them in place.
+        shutil.rmtree(os.path.join(output_folder, dashed_pkg_toolnamever), ignore_errors=True)
+
+        if config.get_staging(conanfile) == 'link':
+            # License relocation happens as paths are mapped, nothing in
+            # the staged tree gets renamed or removed afterwards.
+            with tracer.span('stage', package=package_label) as span:
+                payload.stage_payload(trace.counted(payload_manifest, span),
+                                      os.path.join(output_folder, dashed_pkg_toolnamever, neutered_prefix),
+                                      linking='link',
+                                     )
+        else:
+            with tracer.span('copy', package=package_label) as span:
+                trace.count_files(span, copy(conanfile=conanfile,
+                                             src=dependency_item.package_folder,
+                                             excludes=payload.PACKAGE_EXCLUDES,
+                                             dst=pkg_dst,
+                                             pattern=copy_pattern,
+                                            ))
+
+            with tracer.span('relocate', package=package_label) as span:
+                payload.apply_manifest(os.path.join(output_folder, dashed_pkg_toolnamever, neutered_prefix),
+                                       payload_manifest,
+                                      )
+                span.files = len(payload_manifest.relocated()) + len(payload_manifest.excluded)
+
+        # tar up the deployment copy to use as rpmbuild sources
+        tracer.run('tar',
+                   ['tar',
+                    '--create',
+                    *compression.tar_arguments(source_compression),
+                    *reproducible.tar_arguments(metadata['source_date_epoch']),
+                    '--file', source_tarball,
+                    '--directory', output_folder,
+                    os.path.join(dashed_pkg_toolnamever, neutered_prefix)
+                   ],
+                   package=package_label,
+                   output_path=source_tarball,
+                  )
+
+    # rpm spec template populated with information from conanfile
+    #TODO
+    # - build # or bootstrap versioning needs to be provided or detected somehow
+    # - Summary
+    # - author, dependencies
+    # - %changelog ???
+
     ######################################################################
     # Call `rpmbuild` against our parameterized template RPM spec file,
     # passing any of the metadata from `conanfile.py` as necesary.
     #
-    # - set QA_RPATHS - Turn off any failing RPATH checks 
     # - disable __brp_mangle_shebangs, it doesn't work for packages like
     #   cmake and causes more harm than good.
     #
-    os.environ['QA_RPATHS'] = "0x0020"
     rpmbuild_cmd = [
         'rpmbuild',
         '-bb',
@@ -195,10 +663,21 @@ def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item):
         '--define', f"tool_license { dependency_item.license }",
         '--define', f"tool_vendor { package_maintainer }",
         '--define', f"tool_packager conan-system-packaging",
-        '--define', f"toolchain_prefix { toolchain_metadata['install_prefix'] }",
+        '--define', f"toolchain_prefix { metadata['install_prefix'] }",
         '--define', f"build_num 1",
+        '--define', f"tool_source_ext { source_ext }",
+        *reproducible.rpmbuild_arguments(metadata['source_date_epoch']),
     ]
 
+    # Nothing to run on any architecture, see `link_components()`
+    if all(component_metadata['noarch'] for component_metadata, component_manifest in components):
+        rpmbuild_cmd.extend(['--define', 'tool_noarch 1'])
+
+    # Payload compression, rpmbuild's own default unless configured
+    payload_compression = config.get_compression(conanfile)
+    if payload_compression is not None:
+        rpmbuild_cmd.extend(['--define', f'_binary_payload { compression.rpm_binary_payload(payload_compression) }'])
+
     if tool_dependencies:
         rpm_tool_dependencies_arg = 'tool_dependencies '
 
@@ -207,14 +686,241 @@ def process_dependency(conanfile, output_folder, rpm_HOME, dependency_item):
 
         rpmbuild_cmd.extend(['--define', rpm_tool_dependencies_arg])
 
-    # Use the RPM spec template provided with the extension
+    rpmbuild_cmd.extend(['--define', f'tool_files_manifest { files_manifest_path }'])
+
+    # The shared sources tarball stays where it is
+    if payload_tarball is not None:
+        rpmbuild_cmd.extend(['--define', f'_sourcedir { os.path.dirname(payload_tarball) }'])
+
+    # -devel, -doc and -debuginfo subpackages of the same spec
+    if len(components) > 1:
+        subpackages_path = os.path.join(output_folder, f'{ dashed_pkg_toolnamever }.subpackages')
+        with open(subpackages_path, 'w') as subpackages:
+            subpackages.write(rpmspec.subpackages([dict(component_metadata,
+                                                        files_manifest=write_files_manifest(output_folder,
+                                                                                            component_metadata,
+                                                                                            component_manifest))
+                                                   for component_metadata, component_manifest in components[1:]]))
+        rpmbuild_cmd.extend(['--define', f'tool_subpackages { subpackages_path }'])
+
+    # Stripping and debuginfo, see `user.system_packaging:rpm_postprocess`.
+    # Our own -debuginfo package takes the name rpm's would get.
+    rpmbuild_cmd.extend(postprocess_arguments(conanfile, components))
+
+    if config.get_rpm_builder(conanfile) == 'buildroot':
+        rpmbuild_cmd.extend(['--define', f'tool_prepared_buildroot { prepared_buildroot }'])
+
+    rpmbuild_cmd.append(spec_template_path)
+
+    remove_built_rpms(rpm_HOME, components)
+
+    conanfile.output.info('Executing rpmbuild: ' + str(rpmbuild_cmd))
+    with tracer.span('rpmbuild', package=package_label) as span:
+        span.returncode = subprocess.run(rpmbuild_cmd,
+                                         env=rpm_environment(rpm_HOME, metadata['source_date_epoch']),
+                                        ).returncode
+        trace.check_returncode('rpmbuild', span.returncode, package_label)
+
+        # Locate what rpmbuild produced for us
+        rpm_files, debuginfo_files = built_rpms(rpm_HOME, components)
+        span.output_bytes = sum(os.path.getsize(rpm_file) for rpm_file in rpm_files + debuginfo_files)
+
+    # Every component or nothing, so whatever the RPMs were built from
+    # stays around for another try
+    if len(rpm_files) != len(components):
+        raise ConanException(f'rpmbuild produced { len(rpm_files) } of { len(components) } RPM(s) '
+                             f'packaging { package_label }')
+    rpm_files += debuginfo_files
+    if deploy_state is not None:
+        deploy_state.record(str(dependency_item.ref), fingerprint, rpm_files)
+
+    # Staging tree or prepared buildroot, source tarball, %files
+    # manifests, and rpmbuild's BUILD and BUILDROOT trees. A shared
+    # payload tarball is left to whoever wrote it.
+    if cleanup:
+        rpmbuild_dir = os.path.join(rpm_HOME, 'rpmbuild')
+        remove_intermediates(conanfile,
+                             [os.path.join(output_folder, dashed_pkg_toolnamever),
+                              os.path.join(output_folder, f'{ dashed_pkg_toolnamever }.subpackages'),
+                              os.path.join(rpmbuild_dir, 'BUILD', dashed_pkg_toolnamever),
+                              os.path.join(rpmbuild_dir, 'BUILD', f'{ dashed_pkg_toolnamever }-build'),
+                             ]
+                             + [os.path.join(output_folder, f"{ component_metadata['namever'] }.files")
+                                for component_metadata, component_manifest in components]
+                             + ([source_tarball] if payload_tarball is None else [])
+                             + glob.glob(os.path.join(rpmbuild_dir, 'BUILDROOT', f'{ dashed_pkg_toolnamever }-1.*')),
+                             package_label,
+                             tracer,
+                            )
+
+    return rpm_files
+
+
+######################################################################
+# Build every dependency as a subpackage of one generated spec, so a
+# single rpmbuild run produces the RPMs for the whole toolchain.
+# Package names, versions and `Requires:` are the same as for the
+# one-spec-per-dependency builds.
+#
+def process_toolchain(conanfile, output_folder, rpm_HOME, dependency_items,
+                      payload_manifests=None, libraries=None, deploy_state=None, tracer=None, cleanup=False):
+
+    if tracer is None:
+        tracer = trace.Tracer(output_folder, 'rpm_deployer', trace_format=None)
+    if payload_manifests is None:
+        payload_manifests = manifest.scan_dependencies(conanfile.options.install_prefix, dependency_items, tracer)
+    if libraries is None:
+        libraries = library_index(conanfile, dependency_items, payload_manifests, tracer)
+
     deployer_rootname = str(os.path.basename(__file__)).rstrip('.py')
     deployer_support_dir = os.path.dirname(__file__)
-    spec_template_path = os.path.join(deployer_support_dir, deployer_rootname, 'template-v1.0.0.spec')
+    spec_template_path = os.path.join(deployer_support_dir, deployer_rootname, 'toolchain-v1.0.0.spec')
+
+    packages = [(dependency_item, package_metadata(conanfile, dependency_item), payload_manifest)
+                for dependency_item, payload_manifest in zip(dependency_items, payload_manifests)]
+    if not packages:
+        return []
+
+    toolchain_name = packages[0][1]['package_prefix']
+    toolchain_maintainer = conanfile.author or 'conan'
+
+    # Every RPM of the toolchain, see `user.system_packaging:split`
+    components = [package_components(conanfile, dependency_item, metadata, payload_manifest)
+                  for dependency_item, metadata, payload_manifest in packages]
+    for (dependency_item, metadata, payload_manifest), dependency_components in zip(packages, components):
+        link_components(conanfile, dependency_item, dependency_components, libraries)
+
+    ######################################################################
+    # Incremental deploys - one record for the whole toolchain, any
+    # change rebuilds all of its RPMs
+    #
+    fingerprint = {'packages': [dict(metadata,
+                                     package=state.package_reference(dependency_item),
+                                     payload=payload_manifest.resolution(),
+                                    ) for dependency_item, metadata, payload_manifest in packages],
+                   'maintainer': toolchain_maintainer,
+                   'dedupe': config.get_dedupe(conanfile),
+                   'template': state.hash_files(spec_template_path, __file__, *state.module_files()),
+                   'builder': config.get_rpm_builder(conanfile),
+                   'compression': config.get_compression(conanfile),
+                   'postprocess': [config.get_rpm_postprocess(conanfile), config.get_debuginfo_dwz(conanfile)],
+                   'split': [[component_metadata['name'] for component_metadata, component_manifest in dependency_components]
+                             for dependency_components in components],
+                   'split_rules': [config.get_split_rules(dependency_item) if config.get_split(conanfile) else None
+                                   for dependency_item, metadata, payload_manifest in packages],
+                   'links': [[[component_metadata['noarch'], component_metadata['requires'],
+                               component_metadata.get('provides', [])]
+                              for component_metadata, component_manifest in dependency_components]
+                             for dependency_components in components],
+                  }
+
+    if deploy_state is not None:
+        rpm_files = deploy_state.reusable_artifacts('toolchain', fingerprint)
+        if rpm_files is not None:
+            conanfile.output.info(f'Reusing unchanged { toolchain_name } RPMs: { rpm_files }')
+            return rpm_files
+
+    # Stage every dependency into its own prepared buildroot, concurrently
+    def stage_subpackage(dependency_item, metadata, payload_manifest, dependency_components):
+        if config.get_dedupe(conanfile):
+            payload_manifest, dependency_components = manifest.deduplicate_components(payload_manifest,
+                                                                                       dependency_components,
+                                                                                       tracer,
+                                                                                       str(dependency_item))
+        return (stage_buildroot(conanfile, output_folder, dependency_item, metadata, payload_manifest, tracer),
+                [dict(component_metadata,
+                      files_manifest=write_files_manifest(output_folder, component_metadata, component_manifest))
+                 for component_metadata, component_manifest in dependency_components],
+               )
+
+    jobs = [(str(dependency_item),
+             lambda dependency_item=dependency_item, metadata=metadata, payload_manifest=payload_manifest,
+                    dependency_components=dependency_components:
+                 stage_subpackage(dependency_item, metadata, payload_manifest, dependency_components),
+            ) for (dependency_item, metadata, payload_manifest), dependency_components in zip(packages, components)]
+
+    staged = scheduler.run_jobs(jobs, max_workers=config.get_jobs(conanfile))
+
+    subpackages_path = os.path.join(output_folder, f'{ toolchain_name }.subpackages')
+    with open(subpackages_path, 'w') as subpackages:
+        subpackages.write(rpmspec.subpackages([subpackage for prepared_buildroot, dependency_subpackages in staged
+                                               for subpackage in dependency_subpackages]))
+
+    # One prepared buildroot per line, `%install` reads them as is
+    buildroots_path = os.path.join(output_folder, f'{ toolchain_name }.buildroots')
+    with open(buildroots_path, 'w') as buildroots:
+        buildroots.write(''.join(f'{ prepared_buildroot }\n' for prepared_buildroot, dependency_subpackages in staged))
+
+    toolchain_licenses = sorted({metadata['license'] for dependency_item, metadata, payload_manifest in packages})
+
+    # One rpmbuild run, one SOURCE_DATE_EPOCH for every subpackage
+    source_date_epoch = None
+    if config.get_reproducible(conanfile):
+        source_date_epoch = reproducible.source_date_epoch([dependency_item
+                                                            for dependency_item, metadata, payload_manifest in packages])
+
+    rpmbuild_cmd = [
+        'rpmbuild',
+        '-bb',
+        '--define', f"__brp_mangle_shebangs /bin/true",
+        '--define', f"toolchain_name { toolchain_name }",
+        '--define', f"toolchain_license { ' and '.join(toolchain_licenses) }",
+        '--define', f"tool_vendor { toolchain_maintainer }",
+        '--define', f"tool_packager conan-system-packaging",
+        '--define', f"toolchain_prefix { packages[0][1]['install_prefix'] }",
+        '--define', f"build_num 1",
+        '--define', f"tool_prepared_buildroots { buildroots_path }",
+        '--define', f"toolchain_subpackages { subpackages_path }",
+        *reproducible.rpmbuild_arguments(source_date_epoch),
+    ]
+
+    # Stripping and debuginfo, see `user.system_packaging:rpm_postprocess`.
+    # Our own -debuginfo packages take the names rpm's would get.
+    rpmbuild_cmd.extend(postprocess_arguments(conanfile, [component for dependency_components in components
+                                                          for component in dependency_components]))
+
+    payload_compression = config.get_compression(conanfile)
+    if payload_compression is not None:
+        rpmbuild_cmd.extend(['--define', f'_binary_payload { compression.rpm_binary_payload(payload_compression) }'])
 
     rpmbuild_cmd.append(spec_template_path)
 
-    conanfile.output.info('Executing rpmbuild: ' + str(rpmbuild_cmd))
-    subprocess.run(rpmbuild_cmd)
+    remove_built_rpms(rpm_HOME, [component for dependency_components in components
+                                 for component in dependency_components])
 
-#TODO throw exception on rpmbuild failure
+    conanfile.output.info('Executing rpmbuild: ' + str(rpmbuild_cmd))
+    with tracer.span('rpmbuild', package=toolchain_name) as span:
+        span.returncode = subprocess.run(rpmbuild_cmd, env=rpm_environment(rpm_HOME, source_date_epoch)).returncode
+        trace.check_returncode('rpmbuild', span.returncode, toolchain_name)
+
+        rpm_files, debuginfo_files = built_rpms(rpm_HOME, [component for dependency_components in components
+                                                           for component in dependency_components])
+        span.output_bytes = sum(os.path.getsize(rpm_file) for rpm_file in rpm_files + debuginfo_files)
+
+    expected = sum(len(dependency_components) for dependency_components in components)
+    if len(rpm_files) != expected:
+        raise ConanException(f'rpmbuild produced { len(rpm_files) } of { expected } RPM(s) '
+                             f'packaging { toolchain_name }')
+    rpm_files += debuginfo_files
+    if deploy_state is not None:
+        deploy_state.record('toolchain', fingerprint, rpm_files)
+
+    # Every subpackage's prepared buildroot has to exist for the one
+    # rpmbuild run, so they can only go all at once afterwards
+    if cleanup:
+        rpmbuild_dir = os.path.join(rpm_HOME, 'rpmbuild')
+        remove_intermediates(conanfile,
+                             [prepared_buildroot for prepared_buildroot, dependency_subpackages in staged]
+                             + [subpackage['files_manifest'] for prepared_buildroot, dependency_subpackages in staged
+                                for subpackage in dependency_subpackages]
+                             + [subpackages_path,
+                                buildroots_path,
+                                os.path.join(rpmbuild_dir, 'BUILD', f'{ toolchain_name }-1'),
+                                os.path.join(rpmbuild_dir, 'BUILD', f'{ toolchain_name }-1-build'),
+                               ]
+                             + glob.glob(os.path.join(rpmbuild_dir, 'BUILDROOT', f'{ toolchain_name }-1-1.*')),
+                             toolchain_name,
+                             tracer,
+                            )
+
+    return rpm_files
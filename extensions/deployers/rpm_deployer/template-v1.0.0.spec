@@ -4,14 +4,22 @@ Release:        %{build_num}%{?dist}
 Summary:        %{tool_summary}
 
 License:        %{tool_license}
-Source0:        %{tool_name}-%{tool_version}.tar.gz
+%if ! 0%{?tool_prepared_buildroot:1}
+Source0:        %{tool_name}-%{tool_version}.%{?tool_source_ext}%{!?tool_source_ext:tar.gz}
+%endif
 
 Vendor: %{tool_vendor}
 Packager: %{tool_packager}
 
-# We do NOT want automatic dependency detection
+# We do NOT want automatic dependency detection, rpm_deployer generates
+# shared library Requires/Provides itself, see `user.system_packaging:shlib_deps`
 AutoReqProv:    no
 
+# No ELF files in any of the packages
+%if 0%{?tool_noarch:1}
+BuildArch:      noarch
+%endif
+
 #Requires:       bash
 %if 0%{?tool_dependencies:1}
 %{tool_dependencies}
@@ -20,15 +28,51 @@ AutoReqProv:    no
 %description
 %{tool_description}
 
+# rpm's own -debuginfo packages, which `%setup` adds when there is one,
+# see `user.system_packaging:rpm_postprocess`
+%if 0%{?tool_debuginfo:1} && 0%{?tool_prepared_buildroot:1}
+%debug_package
+%endif
+
 %prep
+# With a prepared buildroot there is nothing to unpack
+%if ! 0%{?tool_prepared_buildroot:1}
 %setup -q
+%endif
 
 %install
-cp -pR * $RPM_BUILD_ROOT
+# Hardlinks in the payload stay hardlinks, see `user.system_packaging:dedupe`
+%if 0%{?tool_prepared_buildroot:1}
+# Copy into a fresh buildroot where hardlinking fails, copying over a
+# partial hardlink copy would write through the links.
+mkdir -p "$RPM_BUILD_ROOT"
+if ! cp -al "%{tool_prepared_buildroot}/." "$RPM_BUILD_ROOT/"; then
+    rm -rf "$RPM_BUILD_ROOT"
+    mkdir -p "$RPM_BUILD_ROOT"
+    cp -pR --preserve=links "%{tool_prepared_buildroot}/." "$RPM_BUILD_ROOT/"
+fi
+%else
+cp -pR --preserve=links * $RPM_BUILD_ROOT
+%endif
+
+# Every file gets the SOURCE_DATE_EPOCH mtime, not just the newer ones,
+# see `user.system_packaging:reproducible`
+%if 0%{?tool_reproducible:1}
+find $RPM_BUILD_ROOT -exec touch --no-dereference --date=@$SOURCE_DATE_EPOCH {} +
+%endif
 
 #%clean
 #rm -rf $RPM_BUILD_ROOT
 
+%if 0%{?tool_files_manifest:1}
+%files -f %{tool_files_manifest}
+%else
 %files
 %{toolchain_prefix}
 %exclude %{toolchain_prefix}/share/info/dir
+%endif
+
+# Split -devel, -doc and -debuginfo packages, see `user.system_packaging:split`
+%if 0%{?tool_subpackages:1}
+%include %{tool_subpackages}
+%endif
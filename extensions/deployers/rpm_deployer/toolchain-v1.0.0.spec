@@ -0,0 +1,50 @@
+# Single spec for a whole toolchain, every dependency is a subpackage
+# declared in the generated %{toolchain_subpackages} file. The main
+# package has no %files, so only the subpackages are built.
+Name:           %{toolchain_name}
+Version:        1
+Release:        %{build_num}%{?dist}
+Summary:        %{toolchain_name} toolchain
+
+License:        %{toolchain_license}
+
+Vendor: %{tool_vendor}
+Packager: %{tool_packager}
+
+# We do NOT want automatic dependency detection
+AutoReqProv:    no
+
+%description
+Toolchain installed under %{toolchain_prefix}
+
+# rpm's own -debuginfo packages, one per subpackage, see
+# `user.system_packaging:rpm_postprocess`
+%if 0%{?tool_debuginfo:1}
+%debug_package
+%endif
+
+%prep
+# Every subpackage comes from a prepared buildroot, nothing to unpack
+
+%install
+# Hardlink every prepared buildroot listed in %{tool_prepared_buildroots},
+# one per line. Where that fails, copy them all into a fresh buildroot:
+# copying over a partial hardlink copy would write through the links.
+mkdir -p "$RPM_BUILD_ROOT"
+if ! (while IFS= read -r prepared_buildroot; do
+          cp -al "$prepared_buildroot/." "$RPM_BUILD_ROOT/" || exit 1
+      done < "%{tool_prepared_buildroots}"); then
+    rm -rf "$RPM_BUILD_ROOT"
+    mkdir -p "$RPM_BUILD_ROOT"
+    while IFS= read -r prepared_buildroot; do
+        cp -pR --preserve=links "$prepared_buildroot/." "$RPM_BUILD_ROOT/"
+    done < "%{tool_prepared_buildroots}"
+fi
+
+# Every file gets the SOURCE_DATE_EPOCH mtime, not just the newer ones,
+# see `user.system_packaging:reproducible`
+%if 0%{?tool_reproducible:1}
+find $RPM_BUILD_ROOT -exec touch --no-dereference --date=@$SOURCE_DATE_EPOCH {} +
+%endif
+
+%include %{toolchain_subpackages}
@@ -0,0 +1,12 @@
+######################################################################
+# system_packaging/__init__.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Support modules shared by the `rpm_deployer` and `deb_deployer`
+# Conan Custom Deployers.
+#
+# Conan loads deployers with the deployers directory temporarily on
+# `sys.path`, so everything here must be imported at module load time
+# by the deployer scripts themselves.
+#
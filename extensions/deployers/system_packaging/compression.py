@@ -0,0 +1,135 @@
+######################################################################
+# system_packaging/compression.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Compression settings for the intermediate source tarballs and for
+# the final RPM/.deb payloads.
+#
+# Tarballs are compressed by piping the tar stream through an external,
+# multi-threaded compressor (`pigz` when available, `zstd -T`,
+# `xz -T`), so compression no longer runs on a single core.
+#
+
+from collections import namedtuple
+from conan.errors import ConanException
+import contextlib
+import shlex
+import shutil
+import subprocess
+
+METHODS = ['gzip', 'zstd', 'xz', 'none']
+
+# Each compressor's own default level
+DEFAULT_LEVELS = {'gzip': 6,
+                  'zstd': 3,
+                  'xz': 6,
+                  'none': 0,
+                 }
+
+TAR_EXTENSIONS = {'gzip': 'tar.gz',
+                  'zstd': 'tar.zst',
+                  'xz': 'tar.xz',
+                  'none': 'tar',
+                 }
+
+# `threads=0` lets the compressor use every available CPU
+Compression = namedtuple('Compression', ['method', 'level', 'threads'])
+
+
+def make_compression(method, level=None, threads=0):
+    if method not in METHODS:
+        raise ConanException(f'Unsupported compression "{ method }", must be one of { METHODS }')
+    if level is None:
+        level = DEFAULT_LEVELS[method]
+    return Compression(method, level, threads)
+
+
+def tar_extension(compression):
+    return TAR_EXTENSIONS[compression.method]
+
+
+# Command line compressing stdin to stdout, `None` for no compression.
+# gzip output leaves out the name and timestamp header fields, so the
+# same input always compresses the same.
+def compressor_command(compression):
+    method, level, threads = compression
+
+    if method == 'gzip':
+        if shutil.which('pigz'):
+            return ['pigz', f'-{ level }', '-n'] + (['-p', str(threads)] if threads else []) + ['-c']
+        return ['gzip', f'-{ level }', '-n', '-c']
+    if method == 'zstd':
+        return ['zstd', '-q', f'-{ level }', f'-T{ threads }', '-c']
+    if method == 'xz':
+        return ['xz', f'-{ level }', f'-T{ threads }', '-c']
+    return None
+
+
+# Arguments making GNU tar compress its output accordingly. tar runs
+# the program without `-c`, adding `-d` itself when decompressing.
+def tar_arguments(compression):
+    command = compressor_command(compression)
+    if command is None:
+        return []
+    return ['--use-compress-program', shlex.join(command[:-1])]
+
+
+######################################################################
+# Open `path` for writing an uncompressed stream that ends up
+# compressed on disk, e.g.
+#
+#   with open_compressed(path, compression) as stream:
+#       with tarfile.open(fileobj=stream, mode='w|') as tarball:
+#           ...
+#
+# `path` may also be an already open binary file object.
+#
+@contextlib.contextmanager
+def open_compressed(path, compression):
+
+    with contextlib.ExitStack() as stack:
+        if isinstance(path, str):
+            out_file = stack.enter_context(open(path, 'wb'))
+        else:
+            out_file = path
+
+        command = compressor_command(compression)
+        if command is None:
+            yield out_file
+            return
+
+        compressor = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=out_file)
+        try:
+            yield compressor.stdin
+        finally:
+            compressor.stdin.close()
+            returncode = compressor.wait()
+
+        if returncode != 0:
+            raise ConanException(f'Compression failed: { command } exited with { returncode }')
+
+
+# rpmbuild `_binary_payload` macro value, see `rpmbuild --showrc`
+def rpm_binary_payload(compression):
+    method, level, threads = compression
+
+    if method == 'none':
+        return 'w0.ufdio'
+    if method == 'gzip':
+        return f'w{ level }.gzdio'
+
+    io_type = {'zstd': 'zstdio', 'xz': 'xzdio'}[method]
+    return f'w{ level }T{ threads }.{ io_type }'
+
+
+# dpkg-deb command line arguments, see dpkg-deb(1)
+def dpkg_deb_arguments(compression):
+    method, level, threads = compression
+
+    dpkg_deb_args = [f'-Z{ method }']
+    if method != 'none':
+        dpkg_deb_args.append(f'-z{ level }')
+    if threads:
+        dpkg_deb_args.append(f'--threads-max={ threads }')
+    return dpkg_deb_args
@@ -0,0 +1,259 @@
+######################################################################
+# system_packaging/config.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Deployer tuning knobs are read from the consumer's Conan
+# configuration under the `user.system_packaging` namespace, so they
+# can be set in a profile `[conf]` section or on the command line:
+#
+#   conan install --deployer=rpm_deployer \
+#                 -c user.system_packaging:jobs=8 \
+#                 .
+#
+
+from . import compression
+from conan.errors import ConanException
+import os
+import re
+
+CONF_NAMESPACE = 'user.system_packaging'
+
+
+def get_conf(conanfile, name, default=None, check_type=None):
+    return conanfile.conf.get(f'{ CONF_NAMESPACE }:{ name }',
+                              default=default,
+                              check_type=check_type,
+                             )
+
+
+# Number of dependencies packaged concurrently.
+# `jobs=0` (or any value < 1) means one job per available CPU.
+def get_jobs(conanfile):
+    jobs = get_conf(conanfile, 'jobs', default=1, check_type=int)
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+# Package formats multi_deployer builds in one deploy, a list or a
+# comma-separated string, e.g. `rpm,deb` (default)
+PACKAGE_FORMATS = ['rpm', 'deb']
+
+def get_formats(conanfile):
+    formats = get_conf(conanfile, 'formats', default=PACKAGE_FORMATS)
+    if isinstance(formats, str):
+        formats = [package_format.strip() for package_format in formats.split(',') if package_format.strip()]
+    if not formats or not isinstance(formats, (list, tuple)) \
+       or any(package_format not in PACKAGE_FORMATS for package_format in formats):
+        raise ConanException(f'{ CONF_NAMESPACE }:formats must be a list of { PACKAGE_FORMATS }, got "{ formats }"')
+    return [package_format for package_format in PACKAGE_FORMATS if package_format in formats]
+
+
+# How each dependency's payload gets from the Conan cache into the
+# package build:
+#
+# - copy   - materialize a staging tree in the output folder with
+#            `conan.tools.files.copy()`, then tar it up (default)
+# - link   - materialize the staging tree with copy-on-write reflinks,
+#            hardlinks where the Conan cache shares a filesystem with
+#            the output folder, and byte copies only as a last resort
+# - stream - write the source tarball straight out of the Conan cache,
+#            rewriting paths to the install prefix on the fly
+STAGING_MODES = ['copy', 'link', 'stream']
+
+def get_staging(conanfile):
+    staging = get_conf(conanfile, 'staging', default='copy', check_type=str)
+    if staging not in STAGING_MODES:
+        raise ConanException(f'{ CONF_NAMESPACE }:staging must be one of { STAGING_MODES }, got "{ staging }"')
+    return staging
+
+
+# How deb_deployer produces each binary package:
+#
+# - debuild - generate a Debian source package and run `dch` and
+#             `debuild` on it (default)
+# - native  - write the binary .deb directly from the Conan cache
+DEB_BUILDERS = ['debuild', 'native']
+
+def get_deb_builder(conanfile):
+    deb_builder = get_conf(conanfile, 'deb_builder', default='debuild', check_type=str)
+    if deb_builder not in DEB_BUILDERS:
+        raise ConanException(f'{ CONF_NAMESPACE }:deb_builder must be one of { DEB_BUILDERS }, got "{ deb_builder }"')
+    return deb_builder
+
+
+# How rpm_deployer feeds each package to `rpmbuild`:
+#
+# - sources   - a source tarball that `%setup` extracts and `%install`
+#               copies into the buildroot (default)
+# - buildroot - a tree staged once out of the Conan cache that
+#               `%install` hardlinks into the buildroot, with a
+#               generated `%files` manifest
+# - toolchain - like `buildroot`, but one generated spec with a
+#               subpackage per dependency, all RPMs out of a single
+#               rpmbuild run
+RPM_BUILDERS = ['sources', 'buildroot', 'toolchain']
+
+def get_rpm_builder(conanfile):
+    rpm_builder = get_conf(conanfile, 'rpm_builder', default='sources', check_type=str)
+    if rpm_builder not in RPM_BUILDERS:
+        raise ConanException(f'{ CONF_NAMESPACE }:rpm_builder must be one of { RPM_BUILDERS }, got "{ rpm_builder }"')
+    return rpm_builder
+
+
+######################################################################
+# What rpmbuild's post-install chain (brp scripts, find-debuginfo) does
+# to the buildroot after `%install`:
+#
+# - skip      - nothing, files are packaged exactly as staged
+# - strip     - strip ELF files, no -debuginfo RPMs
+# - debuginfo - split the debug information into a `<package>-debuginfo`
+#               RPM per package with find-debuginfo
+#
+# Unset leaves rpmbuild's (the distribution's) defaults.
+#
+# For `debuginfo`:
+#
+# - debuginfo_jobs - find-debuginfo jobs per rpmbuild run, 0 for all
+#                    CPUs
+# - debuginfo_dwz  - whether dwz compresses the DWARF data (default)
+#
+RPM_POSTPROCESS_PROFILES = ['skip', 'strip', 'debuginfo']
+
+def get_rpm_postprocess(conanfile):
+    profile = get_conf(conanfile, 'rpm_postprocess', default=None, check_type=str)
+    if profile is not None and profile not in RPM_POSTPROCESS_PROFILES:
+        raise ConanException(f'{ CONF_NAMESPACE }:rpm_postprocess must be one of { RPM_POSTPROCESS_PROFILES }, '
+                             f'got "{ profile }"')
+    return profile
+
+
+def get_debuginfo_jobs(conanfile):
+    debuginfo_jobs = get_conf(conanfile, 'debuginfo_jobs', default=0, check_type=int)
+    if debuginfo_jobs < 1:
+        debuginfo_jobs = os.cpu_count() or 1
+    return debuginfo_jobs
+
+
+def get_debuginfo_dwz(conanfile):
+    return get_conf(conanfile, 'debuginfo_dwz', default=True, check_type=bool)
+
+
+######################################################################
+# Compression of package payloads and intermediate tarballs:
+#
+# - compression              - gzip, zstd, xz or none. Unset leaves the
+#                              package payloads to rpmbuild/dpkg-deb
+#                              defaults and intermediate tarballs gzipped
+# - intermediate_compression - override for intermediate tarballs only,
+#                              e.g. `none` for tarballs thrown away anyway
+# - compression_level        - compressor level, each compressor's
+#                              default when unset
+# - compression_threads      - compressor threads, 0 for all CPUs
+#
+def get_compression(conanfile, intermediate=False):
+    method = get_conf(conanfile, 'compression', default=None, check_type=str)
+    if intermediate:
+        method = get_conf(conanfile, 'intermediate_compression', default=method or 'gzip', check_type=str)
+    if method is None:
+        return None
+
+    return compression.make_compression(method,
+                                        level=get_conf(conanfile, 'compression_level', check_type=int),
+                                        threads=get_conf(conanfile, 'compression_threads', default=0, check_type=int),
+                                       )
+
+
+# Where deployer timing spans go, see `trace.py`:
+#
+# - jsonl  - one JSON object per span (default)
+# - chrome - Chrome trace-event format
+# - none   - no trace file, only the summary at the end of the deploy
+TRACE_FORMATS = ['jsonl', 'chrome', 'none']
+
+def get_trace_format(conanfile):
+    trace_format = get_conf(conanfile, 'trace', default='jsonl', check_type=str)
+    if trace_format not in TRACE_FORMATS:
+        raise ConanException(f'{ CONF_NAMESPACE }:trace must be one of { TRACE_FORMATS }, got "{ trace_format }"')
+    return None if trace_format == 'none' else trace_format
+
+
+# Only write the package plan, build nothing, see `plan.py`
+def get_plan(conanfile):
+    return get_conf(conanfile, 'plan', default=False, check_type=bool)
+
+
+# Byte-stable packages from identical inputs, see `reproducible.py`
+def get_reproducible(conanfile):
+    return get_conf(conanfile, 'reproducible', default=False, check_type=bool)
+
+
+# Whether each dependency is split into runtime, -devel, -doc and
+# -debuginfo packages, see `split.py`. Recipes can refine the rules
+# with `user.system_packaging:split_rules` in their `conf_info`.
+def get_split(conanfile):
+    return get_conf(conanfile, 'split', default=False, check_type=bool)
+
+
+def get_split_rules(dependency_item):
+    return dependency_item.conf_info.get(f'{ CONF_NAMESPACE }:split_rules', default=None, check_type=dict)
+
+
+######################################################################
+# Disk usage of a deploy:
+#
+# - cleanup     - delete each dependency's staging tree, tarballs and
+#                 build trees as soon as its packages exist
+# - disk_budget - estimated bytes the dependencies in flight may use
+#                 at once, e.g. `50G`, on top of the finished packages.
+#                 Implies `cleanup`.
+#
+DISK_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def get_disk_budget(conanfile):
+    disk_budget = get_conf(conanfile, 'disk_budget', default=None)
+    if disk_budget is None or isinstance(disk_budget, int):
+        return disk_budget
+
+    match = re.fullmatch(r'\s*([0-9]+(?:\.[0-9]*)?)\s*([KMGT]?)(?:I?B)?\s*', str(disk_budget), re.IGNORECASE)
+    if match is None:
+        raise ConanException(f'{ CONF_NAMESPACE }:disk_budget must be a size like 50G, got "{ disk_budget }"')
+    return int(float(match.group(1)) * DISK_UNITS[match.group(2).upper()])
+
+
+def get_cleanup(conanfile):
+    return get_conf(conanfile, 'cleanup', default=False, check_type=bool) or get_disk_budget(conanfile) is not None
+
+
+# Whether byte-identical payload files are packaged as hardlinks of one
+# another, see `manifest.deduplicate()`. Off by default, finding them
+# reads every candidate file. Files that are already hardlinked in the
+# Conan cache always stay hardlinked.
+def get_dedupe(conanfile):
+    return get_conf(conanfile, 'dedupe', default=False, check_type=bool)
+
+
+# Whether packages get `Requires:`/`Provides:` or `Depends:` on the
+# shared libraries their ELF files link against, see `shlibs.py`.
+# Architectures are always detected.
+def get_shlib_deps(conanfile):
+    return get_conf(conanfile, 'shlib_deps', default=False, check_type=bool)
+
+
+# Whether to index the built packages as a yum/dnf (`repodata/`) or
+# flat apt (`Packages`, `Release`) repository, see `repository.py`
+def get_repository(conanfile):
+    return get_conf(conanfile, 'repository', default=False, check_type=bool)
+
+
+# How files shipped by more than one package are handled, see
+# `conflicts.py`: error, warn (default), owner, exclude or relocate.
+# Only reporting them is what deploys did before conflicts were checked.
+CONFLICT_POLICIES = ['error', 'warn', 'owner', 'exclude', 'relocate']
+
+def get_conflict_policy(conanfile):
+    policy = get_conf(conanfile, 'conflicts', default='warn', check_type=str)
+    if policy not in CONFLICT_POLICIES:
+        raise ConanException(f'{ CONF_NAMESPACE }:conflicts must be one of { CONFLICT_POLICIES }, got "{ policy }"')
+    return policy
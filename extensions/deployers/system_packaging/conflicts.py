@@ -0,0 +1,145 @@
+######################################################################
+# system_packaging/conflicts.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Cross-package file conflict detection, run on the payload manifests
+# of all dependencies before any package gets built.
+#
+# Packages sharing an install prefix often ship the same path, e.g.
+# `share/info/dir`. rpm and dpkg only refuse such packages at install
+# time, so every installed path is indexed up front and collisions are
+# reported or resolved according to `user.system_packaging:conflicts`:
+#
+# - error    - fail the deploy, listing every conflict
+# - warn     - only report them (default)
+# - owner    - the first dependency in graph order keeps the path, it
+#              is excluded from all others
+# - exclude  - the path is excluded from every package
+# - relocate - every package gets its copy at `<dir>/<package name>/<file>`,
+#              the way license files are kept apart
+#
+
+from conan.errors import ConanException
+import hashlib
+import os
+
+# Conflicts listed in full in the report, the rest are counted
+REPORT_LIMIT = 50
+
+
+######################################################################
+# Index the installed paths of all `manifests` (`ignored_paths`,
+# relative to each install prefix, are never packaged). Returns
+# `{installed path: [(manifest index, entry), ...]}` for every path
+# shipped by more than one manifest, in installed path order.
+#
+def find_conflicts(manifests, ignored_paths=()):
+
+    ignored_paths = set(ignored_paths)
+    owners = {}
+    conflicting = set()
+
+    for index, payload_manifest in enumerate(manifests):
+        for entry in payload_manifest:
+            if entry.path in ignored_paths:
+                continue
+            installed_path = payload_manifest.installed_path(entry)
+            path_owners = owners.get(installed_path)
+            if path_owners is None:
+                owners[installed_path] = [(index, entry)]
+            else:
+                path_owners.append((index, entry))
+                conflicting.add(installed_path)
+
+    return {installed_path: owners[installed_path] for installed_path in sorted(conflicting)}
+
+
+# Whether every copy of a conflicting path is the same symlink or has
+# the same content. Only hashes files of equal size.
+def _identical(entries):
+    first = entries[0]
+    if any(entry.link_target != first.link_target or entry.size != first.size for entry in entries):
+        return False
+    if first.is_symlink():
+        return True
+    return len({_file_digest(entry.src_path) for entry in entries}) == 1
+
+
+# Paths a relocated file must not land on or under: the payload paths
+# and, separately, their parent directories
+def _occupied_paths(payload_manifest):
+    payload_paths = set(payload_manifest.paths())
+    payload_dirs = set()
+    for path in payload_paths:
+        path = os.path.dirname(path)
+        while path and path not in payload_dirs:
+            payload_dirs.add(path)
+            path = os.path.dirname(path)
+    return payload_paths, payload_dirs
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as content:
+        for chunk in iter(lambda: content.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+######################################################################
+# Detect conflicts between the payload `manifests` of
+# `dependency_items` and apply `policy`. Returns the manifests to
+# package, with conflicting entries excluded or relocated as needed.
+#
+def resolve_conflicts(conanfile, dependency_items, manifests, policy='warn', ignored_paths=()):
+
+    conflicts = find_conflicts(manifests, ignored_paths)
+    if not conflicts:
+        return manifests
+
+    report = []
+    for installed_path, owners in conflicts.items():
+        identical = ' (identical)' if _identical([entry for index, entry in owners]) else ''
+        report.append(f'{ installed_path }{ identical }: '
+                      + ', '.join(str(dependency_items[index]) for index, entry in owners))
+
+    summary = f'{ len(conflicts) } file(s) are shipped by more than one package'
+    listing = report[:REPORT_LIMIT]
+    if len(report) > REPORT_LIMIT:
+        listing.append(f'... and { len(report) - REPORT_LIMIT } more')
+
+    if policy == 'error':
+        raise ConanException(f'{ summary }, see user.system_packaging:conflicts:\n\t'
+                             + '\n\t'.join(listing))
+
+    conanfile.output.warning(f'{ summary }, resolving with user.system_packaging:conflicts={ policy }')
+    for line in listing:
+        conanfile.output.warning(f'\t{ line }')
+
+    if policy == 'warn':
+        return manifests
+
+    exclude = [set() for payload_manifest in manifests]
+    relocate = [{} for payload_manifest in manifests]
+    occupied = {}
+    for installed_path, owners in conflicts.items():
+        for position, (index, entry) in enumerate(owners):
+            if policy == 'owner' and position == 0:
+                continue
+            if policy == 'relocate':
+                dir_name, file_name = os.path.split(entry.path)
+                relocated_path = os.path.join(dir_name, dependency_items[index].ref.name, file_name)
+                if index not in occupied:
+                    occupied[index] = _occupied_paths(manifests[index])
+                payload_paths, payload_dirs = occupied[index]
+                if (relocated_path in payload_paths or relocated_path in payload_dirs
+                    or os.path.dirname(relocated_path) in payload_paths):
+                    raise ConanException(f'Cannot relocate { installed_path } of { dependency_items[index] }, '
+                                         f'{ relocated_path } is in its payload already')
+                relocate[index][entry.path] = relocated_path
+            else:
+                exclude[index].add(entry.path)
+
+    return [payload_manifest.resolved(exclude=exclude[index], relocate=relocate[index])
+            for index, payload_manifest in enumerate(manifests)]
@@ -0,0 +1,179 @@
+######################################################################
+# system_packaging/debwriter.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Pure Python writer for binary .deb packages, see deb(5):
+#
+#   ar archive
+#     ├── debian-binary    "2.0\n"
+#     ├── control.tar.gz   ./control, ./md5sums
+#     └── data.tar.*       ./<install prefix>/...
+#
+# The payload is read exactly once, straight from the Conan cache, and
+# the md5sums are computed in the same pass. No source package, `dch`,
+# `debuild` or debhelper sequence is involved.
+#
+# With a `source_date_epoch` the payload is written in path order and
+# every timestamp is that epoch, see `reproducible.py`.
+#
+
+from . import compression, payload, reproducible
+import gzip
+import hashlib
+import io
+import math
+import os
+import tarfile
+import tempfile
+import time
+
+
+# Render deb822 control fields, folding multi-line values the way
+# deb-control(5) wants them.
+def format_control(fields):
+    control_content = ''
+    for field, value in fields.items():
+        lines = str(value).strip().split('\n')
+        control_content += f'{ field }: { lines[0] }\n'
+        for line in lines[1:]:
+            control_content += f' { line.strip() or "." }\n'
+    return control_content
+
+
+# Feeds everything `tarfile` reads from a payload file through md5
+class _HashingReader:
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.md5.update(data)
+        return data
+
+
+# Everything in a system package belongs to root
+def _root_owned(tarinfo):
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = 'root'
+    return tarinfo
+
+
+######################################################################
+# Write `data.tar.gz` into `data_file` from payload members relative
+# to `prefix_path` (the install prefix without its leading '/').
+#
+# Returns the md5sums content and the Installed-Size in KiB.
+#
+def _write_data_tar(data_file, members, prefix_path, data_compression, source_date_epoch=None):
+
+    md5sums = {}
+    installed_size = 0
+    added_dirs = set()
+    hardlinks = {}
+    arc_root = '.'
+
+    tarinfo_filter = _root_owned
+    if source_date_epoch is not None:
+        members = sorted(members, key=lambda entry: entry.path)
+        normalize = reproducible.normalizer(source_date_epoch)
+        tarinfo_filter = lambda tarinfo: _root_owned(normalize(tarinfo))
+
+    with compression.open_compressed(data_file, data_compression) as data_stream, \
+         tarfile.open(fileobj=data_stream, mode='w|', format=tarfile.GNU_FORMAT) as data_tar:
+        for entry in members:
+            arcname = os.path.join(arc_root, prefix_path, entry.path)
+            payload.add_parent_dirs(data_tar, arc_root, os.path.dirname(arcname), added_dirs,
+                                    tarinfo_filter=tarinfo_filter)
+
+            tarinfo = tarinfo_filter(payload.entry_tarinfo(entry, arcname, hardlinks))
+
+            if tarinfo.isreg():
+                with open(entry.src_path, 'rb') as src_file:
+                    reader = _HashingReader(src_file)
+                    data_tar.addfile(tarinfo, reader)
+                md5sums[arcname] = reader.md5.hexdigest()
+                installed_size += math.ceil(tarinfo.size / 1024)
+            else:
+                # Hardlinks repeat their target's checksum
+                if tarinfo.islnk():
+                    md5sums[arcname] = md5sums[tarinfo.linkname]
+                data_tar.addfile(tarinfo)
+                installed_size += 1
+
+        installed_size += len(added_dirs)
+
+    md5sums_content = ''.join(f'{ md5 }  { os.path.relpath(arcname, arc_root) }\n'
+                              for arcname, md5 in md5sums.items())
+
+    return md5sums_content, installed_size
+
+
+# The gzip header carries `mtime` too
+def _write_control_tar(control_file, control_content, md5sums_content, mtime):
+    with gzip.GzipFile(filename='', mode='wb', fileobj=control_file, mtime=mtime) as control_stream, \
+         tarfile.open(fileobj=control_stream, mode='w|', format=tarfile.GNU_FORMAT) as control_tar:
+        for name, content in [('./control', control_content), ('./md5sums', md5sums_content)]:
+            data = content.encode('utf-8')
+            tarinfo = _root_owned(tarfile.TarInfo(name))
+            tarinfo.size = len(data)
+            tarinfo.mode = 0o644
+            tarinfo.mtime = mtime
+            control_tar.addfile(tarinfo, io.BytesIO(data))
+
+
+def _write_ar_member(deb_file, name, size, mtime, content_file):
+    header = f'{ name:<16}{ mtime:<12}{ 0:<6}{ 0:<6}{ 100644:<8}{ size:<10}`\n'
+    deb_file.write(header.encode('ascii'))
+
+    content_file.seek(0)
+    while True:
+        chunk = content_file.read(1024 * 1024)
+        if not chunk:
+            break
+        deb_file.write(chunk)
+
+    # ar members are 2-byte aligned
+    if size % 2:
+        deb_file.write(b'\n')
+
+
+######################################################################
+# Build `deb_path` from deb822 `control_fields` (Installed-Size is
+# filled in here) and payload members relative to `prefix_path`.
+#
+# `data_compression` defaults to gzip, like dpkg-deb's `-Zgzip`.
+#
+def write_deb(deb_path, control_fields, members, prefix_path, data_compression=None, source_date_epoch=None):
+
+    if data_compression is None:
+        data_compression = compression.make_compression('gzip')
+
+    deb_dir = os.path.dirname(deb_path)
+    mtime = int(time.time()) if source_date_epoch is None else source_date_epoch
+
+    with tempfile.TemporaryFile(dir=deb_dir) as data_file, \
+         tempfile.TemporaryFile(dir=deb_dir) as control_file:
+
+        md5sums_content, installed_size = _write_data_tar(data_file, members, prefix_path, data_compression,
+                                                          source_date_epoch)
+        data_file.seek(0, os.SEEK_END)
+        data_size = data_file.tell()
+
+        control_fields = dict(control_fields)
+        control_fields['Installed-Size'] = installed_size
+        _write_control_tar(control_file, format_control(control_fields), md5sums_content, mtime)
+        control_size = control_file.tell()
+
+        tmp_deb_path = f'{ deb_path }.tmp'
+        with open(tmp_deb_path, 'wb') as deb_file:
+            deb_file.write(b'!<arch>\n')
+            _write_ar_member(deb_file, 'debian-binary', 4, mtime, io.BytesIO(b'2.0\n'))
+            _write_ar_member(deb_file, 'control.tar.gz', control_size, mtime, control_file)
+            _write_ar_member(deb_file, f'data.{ compression.tar_extension(data_compression) }',
+                             data_size, mtime, data_file)
+        os.replace(tmp_deb_path, deb_path)
+
+    return deb_path
@@ -0,0 +1,263 @@
+######################################################################
+# system_packaging/elf.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Minimal in-process ELF reader: what machine a payload file is built
+# for, and the `DT_SONAME`/`DT_NEEDED` entries of its dynamic section.
+#
+# Only the ELF header, the program headers and the dynamic segment with
+# its string table are read, through `mmap` so nothing else of a large
+# binary is ever paged in. Static libraries (`ar` archives) report the
+# machine of their first ELF member. Every payload is scanned once per
+# deploy, replacing per-package `dpkg-architecture`, `objdump` and
+# `dh_shlibdeps` runs.
+#
+
+from collections import namedtuple
+import mmap
+import os
+import struct
+import sys
+
+ELF_MAGIC = b'\x7fELF'
+AR_MAGIC = b'!<arch>\n'
+
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+
+ET_REL = 1
+ET_EXEC = 2
+ET_DYN = 3
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+
+# An ELF header is at least this long, anything shorter isn't one
+MIN_ELF_SIZE = 52
+
+EF_ARM_ABI_FLOAT_HARD = 0x400
+
+# `type` is ET_REL, ET_EXEC or ET_DYN, `elf_class` 32 or 64
+ElfFile = namedtuple('ElfFile', ['machine', 'elf_class', 'little_endian', 'flags', 'type', 'soname', 'needed'])
+
+# e_machine values
+EM_386 = 3
+EM_PPC = 20
+EM_PPC64 = 21
+EM_S390 = 22
+EM_ARM = 40
+EM_X86_64 = 62
+EM_AARCH64 = 183
+EM_RISCV = 243
+EM_LOONGARCH = 258
+
+
+######################################################################
+# Architecture names of an ElfFile, `(rpm, deb)`, None for machines we
+# don't know
+#
+def architecture(elf_file):
+    machine, elf_class, little_endian, flags = elf_file[:4]
+
+    if machine == EM_X86_64 and elf_class == 64:
+        return 'x86_64', 'amd64'
+    if machine == EM_386:
+        return 'i686', 'i386'
+    if machine == EM_AARCH64:
+        return 'aarch64', 'arm64'
+    if machine == EM_ARM:
+        return ('armv7hl', 'armhf') if flags & EF_ARM_ABI_FLOAT_HARD else ('armv7l', 'armel')
+    if machine == EM_PPC64:
+        return ('ppc64le', 'ppc64el') if little_endian else ('ppc64', 'ppc64')
+    if machine == EM_PPC:
+        return 'ppc', 'powerpc'
+    if machine == EM_S390 and elf_class == 64:
+        return 's390x', 's390x'
+    if machine == EM_RISCV and elf_class == 64:
+        return 'riscv64', 'riscv64'
+    if machine == EM_LOONGARCH and elf_class == 64:
+        return 'loongarch64', 'loong64'
+    return None
+
+
+# The build host's architecture name for `package_format` ('rpm' or
+# 'deb'), read from the running interpreter's own ELF header. None when
+# that's not an ELF binary of a machine we know.
+_host_architectures = {}
+
+def host_architecture(package_format):
+    if package_format not in _host_architectures:
+        elf_file = read_file(os.path.realpath(sys.executable))
+        architectures = architecture(elf_file) if elf_file is not None else None
+        _host_architectures['rpm'], _host_architectures['deb'] = architectures or (None, None)
+    return _host_architectures[package_format]
+
+
+def _header_layout(elf_class, little_endian):
+    endian = '<' if little_endian else '>'
+    if elf_class == 64:
+        # e_type .. e_phnum, program header, dynamic entry
+        return endian + 'HHIQQQIHHH', endian + 'IIQQQQQQ', endian + 'qQ'
+    return endian + 'HHIIIIIHHH', endian + 'IIIIIIII', endian + 'iI'
+
+
+######################################################################
+# Read an ELF file or object out of `data` (bytes or mmap) at `offset`.
+# Returns an ElfFile, or None for anything that isn't a well-formed
+# ELF. Truncated or inconsistent dynamic sections just leave `soname`
+# and `needed` empty.
+#
+def read_elf(data, offset=0):
+
+    if data[offset:offset + 4] != ELF_MAGIC or len(data) - offset < MIN_ELF_SIZE:
+        return None
+
+    elf_class = 64 if data[offset + 4] == ELFCLASS64 else 32
+    little_endian = data[offset + 5] == ELFDATA2LSB
+    header_format, phdr_format, dyn_format = _header_layout(elf_class, little_endian)
+
+    header_size = struct.calcsize(header_format)
+    if len(data) - offset < 16 + header_size:
+        return None
+    (e_type, e_machine, e_version, e_entry, e_phoff, e_shoff, e_flags,
+     e_ehsize, e_phentsize, e_phnum) = struct.unpack_from(header_format, data, offset + 16)
+
+    soname = None
+    needed = []
+    if e_type in (ET_EXEC, ET_DYN) and e_phoff and e_phentsize >= struct.calcsize(phdr_format):
+        soname, needed = _read_dynamic(data, offset, e_phoff, e_phentsize, e_phnum, elf_class,
+                                       phdr_format, dyn_format)
+
+    return ElfFile(e_machine, elf_class, little_endian, e_flags, e_type, soname, needed)
+
+
+def _read_dynamic(data, offset, e_phoff, e_phentsize, e_phnum, elf_class, phdr_format, dyn_format):
+
+    loads = []
+    dynamic = None
+    for index in range(e_phnum):
+        phdr_offset = offset + e_phoff + index * e_phentsize
+        if phdr_offset + e_phentsize > len(data):
+            break
+        if elf_class == 64:
+            p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align = \
+                struct.unpack_from(phdr_format, data, phdr_offset)
+        else:
+            p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align = \
+                struct.unpack_from(phdr_format, data, phdr_offset)
+        if p_type == PT_LOAD:
+            loads.append((p_vaddr, p_offset, p_filesz))
+        elif p_type == PT_DYNAMIC:
+            dynamic = (p_offset, p_filesz)
+
+    if dynamic is None:
+        return None, []
+
+    entries = []
+    strtab = strsz = None
+    dyn_size = struct.calcsize(dyn_format)
+    dyn_offset, dyn_filesz = dynamic
+    for entry_offset in range(offset + dyn_offset,
+                              min(offset + dyn_offset + dyn_filesz, len(data)) - dyn_size + 1,
+                              dyn_size):
+        d_tag, d_val = struct.unpack_from(dyn_format, data, entry_offset)
+        if d_tag == DT_NULL:
+            break
+        if d_tag == DT_STRTAB:
+            strtab = d_val
+        elif d_tag == DT_STRSZ:
+            strsz = d_val
+        elif d_tag in (DT_NEEDED, DT_SONAME):
+            entries.append((d_tag, d_val))
+
+    # DT_STRTAB is an address, find where its segment is in the file
+    strtab_offset = None
+    if strtab is not None:
+        for p_vaddr, p_offset, p_filesz in loads:
+            if p_vaddr <= strtab < p_vaddr + p_filesz:
+                strtab_offset = offset + p_offset + strtab - p_vaddr
+                break
+    if strtab_offset is None:
+        return None, []
+    strtab_end = min(strtab_offset + strsz if strsz else len(data), len(data))
+
+    soname = None
+    needed = []
+    for d_tag, d_val in entries:
+        start = strtab_offset + d_val
+        end = data.find(b'\0', start, strtab_end)
+        if start >= strtab_end or end < 0:
+            continue
+        name = bytes(data[start:end]).decode('utf-8', errors='replace')
+        if d_tag == DT_SONAME:
+            soname = name
+        else:
+            needed.append(name)
+
+    return soname, needed
+
+
+# First ELF member of an `ar` archive, None if it has none
+def read_archive(data):
+    offset = len(AR_MAGIC)
+    while offset + 60 <= len(data):
+        try:
+            size = int(bytes(data[offset + 48:offset + 58]).decode('ascii').strip())
+        except ValueError:
+            return None
+        member = offset + 60
+        elf_file = read_elf(data, member)
+        if elf_file is not None:
+            return elf_file
+        offset = member + size + size % 2
+    return None
+
+
+######################################################################
+# ElfFile for the file at `path`, None if it's neither ELF nor a static
+# library with ELF members.
+#
+def read_file(path):
+    try:
+        with open(path, 'rb') as elf_fd:
+            magic = elf_fd.read(len(AR_MAGIC))
+            if magic[:4] != ELF_MAGIC and magic != AR_MAGIC:
+                return None
+            with mmap.mmap(elf_fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return read_elf(data) if magic[:4] == ELF_MAGIC else read_archive(data)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+######################################################################
+# Scan a payload manifest, `{path relative to the install prefix: ElfFile}`
+# for every ELF payload file. Symlinks are skipped, files with further
+# hardlinks in the payload are read once.
+#
+def scan_manifest(payload_manifest):
+
+    elf_files = {}
+    by_inode = {}
+    for entry in payload_manifest:
+        if entry.is_symlink() or entry.size < MIN_ELF_SIZE:
+            continue
+
+        inode = (entry.device, entry.inode)
+        if entry.is_hardlinked() and inode in by_inode:
+            elf_file = by_inode[inode]
+        else:
+            elf_file = read_file(entry.src_path)
+            if entry.is_hardlinked():
+                by_inode[inode] = elf_file
+
+        if elf_file is not None:
+            elf_files[entry.path] = elf_file
+
+    return elf_files
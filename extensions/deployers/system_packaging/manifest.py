@@ -0,0 +1,308 @@
+######################################################################
+# system_packaging/manifest.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# In-memory manifest of a dependency's payload, built in a single
+# `os.scandir()` pass over its Conan package folder.
+#
+# Every entry carries where the file lands relative to the install
+# prefix (license conflict avoidance applied) and what one `lstat()`
+# told us about it: size, mode, link target, inode and so on. Staging,
+# tarballs, .deb data members and md5sums, the RPM `%files` list and
+# license relocation in a `copy()` staged tree all work from the
+# manifest instead of walking and stat'ing the tree again.
+#
+# Byte-identical files of the packages actually being built are linked
+# together, see `deduplicate()`, and from then on travel as hardlinks.
+#
+
+from . import payload, scheduler
+from collections import namedtuple
+import hashlib
+import os
+import stat
+import threading
+
+
+class ManifestEntry(namedtuple('ManifestEntry', ['path',
+                                                 'src_path',
+                                                 'src_rel_path',
+                                                 'size',
+                                                 'mode',
+                                                 'link_target',
+                                                 'inode',
+                                                 'device',
+                                                 'nlink',
+                                                 'mtime',
+                                                 'uid',
+                                                 'gid',
+                                                ])):
+    __slots__ = ()
+
+    # `path` is relative to the install prefix, `src_rel_path` to the
+    # payload root in the package folder. They only differ for
+    # relocated license files.
+
+    def is_symlink(self):
+        return self.link_target is not None
+
+    def is_file(self):
+        return stat.S_ISREG(self.mode)
+
+    # Another name for the same inode may be in the payload
+    def is_hardlinked(self):
+        return self.is_file() and self.nlink > 1
+
+
+class Manifest:
+
+    # `install_prefix` is where the payload installs, without its
+    # leading '/'. `excluded` are entries taken out of the payload after
+    # the scan, e.g. to resolve conflicts with other packages. `linked`
+    # maps the `src_rel_path` of files `deduplicate()` turned into
+    # hardlinks to that of the file they share content with.
+    def __init__(self, src_root, entries, install_prefix='', excluded=(), linked=None):
+        self.src_root = src_root
+        self.entries = entries
+        self.install_prefix = install_prefix
+        self.excluded = list(excluded)
+        self.linked = dict(linked or {})
+        self._deduplicated = None
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def paths(self):
+        return [entry.path for entry in self.entries]
+
+    def total_size(self):
+        return sum(entry.size for entry in self.entries)
+
+    # Bytes of content staging trees, tarballs and packages actually
+    # hold: further names of an inode are stored as hardlinks
+    def stored_size(self):
+        inodes = set()
+        size = 0
+        for entry in self.entries:
+            if entry.is_hardlinked():
+                inode = (entry.device, entry.inode)
+                if inode in inodes:
+                    continue
+                inodes.add(inode)
+            size += entry.size
+        return size
+
+    # Entries the license conflict avoidance moves
+    def relocated(self):
+        return [entry for entry in self.entries if entry.path != entry.src_rel_path]
+
+    # What differs from a plain copy of the payload, for incremental
+    # deploy fingerprints
+    def resolution(self):
+        return {'excluded': sorted(entry.src_rel_path for entry in self.excluded),
+                'relocated': sorted([entry.src_rel_path, entry.path] for entry in self.relocated()),
+               }
+
+    # Absolute installed path of an entry
+    def installed_path(self, entry):
+        return os.path.join('/', self.install_prefix, entry.path)
+
+    # A copy without the entries at the `exclude` paths, and with the
+    # entries at `relocate` keys moved to their values
+    def resolved(self, exclude=(), relocate=None):
+        relocate = relocate or {}
+
+        entries = []
+        excluded = list(self.excluded)
+        for entry in self.entries:
+            if entry.path in exclude:
+                excluded.append(entry)
+            elif entry.path in relocate:
+                entries.append(entry._replace(path=relocate[entry.path]))
+            else:
+                entries.append(entry)
+
+        return Manifest(self.src_root, entries, install_prefix=self.install_prefix, excluded=excluded,
+                        linked=self.linked)
+
+    # A copy with the entries `linked_manifest`, the `deduplicate()`d
+    # manifest of a payload this one is part of, has for the same files
+    def relinked(self, linked_manifest):
+        linked_entries = {entry.src_rel_path: entry for entry in linked_manifest}
+        own_paths = {entry.src_rel_path for entry in self.entries}
+        return Manifest(self.src_root,
+                        [linked_entries.get(entry.src_rel_path, entry) for entry in self.entries],
+                        install_prefix=self.install_prefix,
+                        excluded=self.excluded,
+                        linked={src_rel_path: target for src_rel_path, target in linked_manifest.linked.items()
+                                if src_rel_path in own_paths},
+                       )
+
+
+######################################################################
+# Scan `<package_folder>/<payload_subdir>` with the same selection as
+# `conan.tools.files.copy()` in the deployers: Conan bookkeeping files
+# excluded (matched relative to the package folder), symlinks kept as
+# symlinks, symlinked folders included but not followed, and folders
+# that end up empty dropped. Entries come in sorted path order. A
+# missing folder is an empty payload, `copy()` copies nothing from it.
+#
+def scan_payload(package_folder, payload_subdir, package_name, install_prefix=''):
+
+    src_root = os.path.join(package_folder, payload_subdir) if payload_subdir else package_folder
+    package_prefix_len = len(package_folder.rstrip(os.sep)) + 1
+    src_root_len = len(src_root.rstrip(os.sep)) + 1
+
+    entries = []
+    pending = [src_root] if os.path.isdir(src_root) else []
+    while pending:
+        dir_path = pending.pop()
+
+        with os.scandir(dir_path) as dir_entries:
+            dir_entries = sorted(dir_entries, key=lambda dir_entry: dir_entry.name)
+
+        subdirs = []
+        for dir_entry in dir_entries:
+            if dir_entry.is_dir(follow_symlinks=False):
+                subdirs.append(dir_entry.path)
+                continue
+
+            if payload._is_excluded(dir_entry.path[package_prefix_len:]):
+                continue
+
+            stat_result = dir_entry.stat(follow_symlinks=False)
+            src_rel_path = dir_entry.path[src_root_len:]
+            link_target = os.readlink(dir_entry.path) if stat.S_ISLNK(stat_result.st_mode) else None
+
+            entries.append(ManifestEntry(path=payload.license_destination(src_rel_path, package_name),
+                                         src_path=dir_entry.path,
+                                         src_rel_path=src_rel_path,
+                                         size=stat_result.st_size,
+                                         mode=stat_result.st_mode,
+                                         link_target=link_target,
+                                         inode=stat_result.st_ino,
+                                         device=stat_result.st_dev,
+                                         nlink=stat_result.st_nlink,
+                                         mtime=int(stat_result.st_mtime),
+                                         uid=stat_result.st_uid,
+                                         gid=stat_result.st_gid,
+                                        ))
+
+        # Depth first, in name order
+        pending.extend(reversed(subdirs))
+
+    entries.sort(key=lambda entry: entry.src_rel_path.split(os.sep))
+    return Manifest(src_root, entries, install_prefix=install_prefix)
+
+
+######################################################################
+# Link the byte-identical regular files of a payload together, e.g. the
+# `gcc`, `<triplet>-gcc` and `<triplet>-gcc-<version>` copies of a
+# toolchain. Every further copy takes the inode of the first one in
+# path order, so staging, tarballs, .deb data members and the ELF scan
+# all treat it as one more hardlink of that file.
+#
+# Only files with the same size, mode and owner can share an inode, so
+# only those are hashed, each inode once. That reads file content, so
+# it's left out of plan-only deploys and done only for packages an
+# incremental deploy actually rebuilds.
+#
+# Returns the linked Manifest, computed once per manifest however many
+# package formats ask for it.
+#
+def deduplicate(payload_manifest, tracer, package=None):
+    with payload_manifest._lock:
+        if payload_manifest._deduplicated is None:
+            with tracer.span('dedupe', package=package) as span:
+                payload_manifest._deduplicated = _link_duplicates(payload_manifest)
+                span.files = len(payload_manifest._deduplicated.linked)
+        return payload_manifest._deduplicated
+
+
+# `deduplicate()` a package's payload manifest along with the manifests
+# of its `components`, `(metadata, manifest)` pairs split off of it, see
+# `split.py`
+def deduplicate_components(payload_manifest, components, tracer, package=None):
+    payload_manifest = deduplicate(payload_manifest, tracer, package)
+    return payload_manifest, [(component_metadata, component_manifest.relinked(payload_manifest))
+                              for component_metadata, component_manifest in components]
+
+
+def _link_duplicates(payload_manifest):
+
+    candidates = {}
+    for entry in payload_manifest:
+        if entry.is_file() and entry.size > 0:
+            candidates.setdefault((entry.size, entry.mode, entry.uid, entry.gid), []).append(entry)
+
+    targets = {}
+    for group in candidates.values():
+        if len({(entry.device, entry.inode) for entry in group}) < 2:
+            continue
+
+        digests = {}
+        firsts = {}
+        for entry in group:
+            inode = (entry.device, entry.inode)
+            if inode not in digests:
+                digests[inode] = _content_digest(entry.src_path)
+            first = firsts.setdefault(digests[inode], entry)
+            if (first.device, first.inode) != inode:
+                targets[entry.src_rel_path] = first
+                targets.setdefault(first.src_rel_path, first)
+
+    if not targets:
+        return payload_manifest
+
+    entries = []
+    for entry in payload_manifest:
+        first = targets.get(entry.src_rel_path)
+        if first is not None:
+            entry = entry._replace(device=first.device, inode=first.inode, nlink=max(entry.nlink, 2))
+        entries.append(entry)
+
+    return Manifest(payload_manifest.src_root, entries,
+                    install_prefix=payload_manifest.install_prefix,
+                    excluded=payload_manifest.excluded,
+                    linked={src_rel_path: first.src_rel_path for src_rel_path, first in targets.items()
+                            if src_rel_path != first.src_rel_path},
+                   )
+
+
+def _content_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as content:
+        for chunk in iter(lambda: content.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+######################################################################
+# Scan every dependency's payload concurrently, see
+# `user.system_packaging:jobs`. Returns the manifests in the order of
+# `dependency_items`.
+#
+def scan_dependencies(install_prefix, dependency_items, tracer, max_workers=1):
+
+    def scan(dependency_item):
+        payload_subdir, neutered_prefix = payload.payload_location(install_prefix, dependency_item)
+        with tracer.span('scan', package=str(dependency_item)) as span:
+            payload_manifest = scan_payload(dependency_item.package_folder,
+                                            payload_subdir,
+                                            dependency_item.ref.name,
+                                            install_prefix=neutered_prefix,
+                                           )
+            span.files = len(payload_manifest)
+            span.bytes = payload_manifest.total_size()
+        return payload_manifest
+
+    return scheduler.run_jobs([(str(dependency_item),
+                                lambda dependency_item=dependency_item: scan(dependency_item),
+                               ) for dependency_item in dependency_items],
+                              max_workers=max_workers,
+                             )
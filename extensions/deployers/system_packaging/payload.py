@@ -0,0 +1,365 @@
+######################################################################
+# system_packaging/payload.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Selects the files of a dependency's Conan package that go into its
+# system package, and knows where each one lands under the install
+# prefix.
+#
+# The same rules are applied whether the payload is materialized as a
+# staging tree with `conan.tools.files.copy()` or streamed straight out
+# of the Conan cache into a tarball. The payload itself is listed once
+# per dependency, see `manifest.py`.
+#
+
+from . import compression, reproducible
+import errno
+import fcntl
+import fnmatch
+import grp
+import os
+import pwd
+import shutil
+import stat
+import tarfile
+import time
+
+# Conan bookkeeping files that never belong in a system package
+PACKAGE_EXCLUDES = ['conaninfo.txt',
+                    'conanmanifest.txt',
+                    'conan*.sh',
+                    'deactivate_conan*.sh',
+                   ]
+
+# Index files maintained at install time (`install-info`), never owned
+# by one of our packages, relative to the install prefix
+UNOWNED_PATHS = ['share/info/dir',]
+
+
+# Where a dependency's payload comes from and where it installs: a
+# dependency with its own install_prefix carries that path inside its
+# package folder, otherwise the whole package folder is relocatable and
+# installs under the toolchain install prefix. Returns
+# `(payload subdir, install prefix without its leading '/')`.
+def payload_location(install_prefix, dependency_item):
+    if 'install_prefix' in dependency_item.options:
+        neutered_prefix = str(dependency_item.options.install_prefix).lstrip('/')
+        return neutered_prefix, neutered_prefix
+    return '', str(install_prefix).lstrip('/')
+
+
+# Where a file lands relative to the install prefix once the license
+# conflict avoidance has been applied: every Conan package keeps its
+# license files in `licenses/`, so anything there moves to
+# `licenses/<package name>/` to not conflict between packages sharing
+# the same install prefix.
+def license_destination(rel_path, package_name):
+    path_parts = rel_path.split(os.sep)
+    if len(path_parts) > 1 and path_parts[0] == 'licenses' and path_parts[1] != package_name:
+        return os.path.join('licenses', package_name, *path_parts[1:])
+    return rel_path
+
+
+# CONFLICT Avoid - Make an already staged tree match its payload
+# manifest: remove the excluded entries, move the relocated ones (license
+# files, resolved conflicts) to their package-specific paths, drop
+# folders that end up empty, and turn the copies `copy()` made of
+# hardlinked entries back into hardlinks. `prefix_root` exists
+# afterwards even for an empty payload, `copy()` creates nothing then.
+def apply_manifest(prefix_root, payload_manifest):
+    os.makedirs(prefix_root, exist_ok=True)
+    emptied_dirs = set()
+
+    for entry in payload_manifest.excluded:
+        os.remove(os.path.join(prefix_root, entry.src_rel_path))
+        emptied_dirs.add(os.path.dirname(entry.src_rel_path))
+
+    for entry in payload_manifest.relocated():
+        dst_path = os.path.join(prefix_root, entry.path)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        os.replace(os.path.join(prefix_root, entry.src_rel_path), dst_path)
+        emptied_dirs.add(os.path.dirname(entry.src_rel_path))
+
+    for dir_name in sorted(emptied_dirs, reverse=True):
+        while dir_name:
+            try:
+                os.rmdir(os.path.join(prefix_root, dir_name))
+            except OSError:
+                break
+            dir_name = os.path.dirname(dir_name)
+
+    first_names = {}
+    for entry in payload_manifest:
+        if entry.is_hardlinked():
+            dst_path = os.path.join(prefix_root, entry.path)
+            first_name = first_names.setdefault((entry.device, entry.inode), dst_path)
+            if first_name != dst_path:
+                os.remove(dst_path)
+                os.link(first_name, dst_path)
+
+
+# Delete a dependency's intermediate files and trees once its packages
+# exist, see `user.system_packaging:cleanup`. Paths that don't exist
+# are skipped. Returns how many files were removed and the bytes that
+# freed, files hardlinked elsewhere (e.g. into the Conan cache) free
+# nothing.
+def remove_intermediates(paths):
+    files = 0
+    freed = 0
+
+    def account(path):
+        nonlocal files, freed
+        path_stat = os.lstat(path)
+        files += 1
+        if path_stat.st_nlink == 1:
+            freed += path_stat.st_blocks * 512
+
+    for path in paths:
+        if os.path.isdir(path) and not os.path.islink(path):
+            for root, dirs, dir_files in os.walk(path):
+                for name in dir_files:
+                    account(os.path.join(root, name))
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            account(path)
+            os.remove(path)
+
+    return files, freed
+
+
+def _is_excluded(rel_path):
+    # Same case-insensitive matching as `conan.tools.files.copy()`
+    rel_path = rel_path.lower()
+    return any(fnmatch.fnmatch(rel_path, exclude) for exclude in PACKAGE_EXCLUDES)
+
+
+######################################################################
+# Stream payload manifest entries into a compressed tarball with every path
+# rewritten to `<arc_root>/<path relative to the install prefix>`.
+#
+# This is what `tar --create --directory <output_folder> <arc_root>`
+# would produce from a staged copy, without ever writing that copy.
+# With a `source_date_epoch`, members are sorted by path and get that
+# mtime and root ownership, see `reproducible.py`.
+#
+def write_tarball(members, tarball_path, arc_root, tar_compression, source_date_epoch=None):
+
+    added_dirs = set()
+    hardlinks = {}
+
+    tarinfo_filter = None
+    if source_date_epoch is not None:
+        members = sorted(members, key=lambda entry: entry.path)
+        tarinfo_filter = reproducible.normalizer(source_date_epoch)
+
+    with compression.open_compressed(tarball_path, tar_compression) as tar_stream, \
+         tarfile.open(fileobj=tar_stream, mode='w|') as tarball:
+        for entry in members:
+            arcname = os.path.join(arc_root, entry.path)
+            add_parent_dirs(tarball, arc_root, os.path.dirname(arcname), added_dirs, tarinfo_filter)
+
+            tarinfo = entry_tarinfo(entry, arcname, hardlinks)
+            if tarinfo_filter is not None:
+                tarinfo = tarinfo_filter(tarinfo)
+            if tarinfo.isreg():
+                with open(entry.src_path, 'rb') as src_file:
+                    tarball.addfile(tarinfo, src_file)
+            else:
+                tarball.addfile(tarinfo)
+
+
+######################################################################
+# TarInfo for a payload manifest entry stored as `arcname`, from what
+# the manifest scan already knows rather than stat'ing it again.
+#
+# Like `TarFile.add()`, further names of an inode (including the
+# byte-identical files `manifest.deduplicate()` linked) become hardlink
+# members, `hardlinks` maps inodes to the name they were stored as.
+#
+def entry_tarinfo(entry, arcname, hardlinks):
+
+    tarinfo = tarfile.TarInfo(arcname)
+    tarinfo.mode = stat.S_IMODE(entry.mode)
+    tarinfo.mtime = entry.mtime
+    tarinfo.uid = entry.uid
+    tarinfo.gid = entry.gid
+    tarinfo.uname = _user_name(entry.uid)
+    tarinfo.gname = _group_name(entry.gid)
+
+    inode = (entry.device, entry.inode)
+    if entry.is_symlink():
+        tarinfo.type = tarfile.SYMTYPE
+        tarinfo.linkname = entry.link_target
+    elif entry.is_hardlinked() and inode in hardlinks:
+        tarinfo.type = tarfile.LNKTYPE
+        tarinfo.linkname = hardlinks[inode]
+    else:
+        tarinfo.type = tarfile.REGTYPE
+        tarinfo.size = entry.size
+        if entry.is_hardlinked():
+            hardlinks[inode] = arcname
+
+    return tarinfo
+
+
+# Owner names as `TarFile.gettarinfo()` would record them, looked up
+# once per id
+_user_names = {}
+_group_names = {}
+
+def _user_name(uid):
+    if uid not in _user_names:
+        try:
+            _user_names[uid] = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            _user_names[uid] = ''
+    return _user_names[uid]
+
+
+def _group_name(gid):
+    if gid not in _group_names:
+        try:
+            _group_names[gid] = grp.getgrgid(gid).gr_name
+        except KeyError:
+            _group_names[gid] = ''
+    return _group_names[gid]
+
+
+# Folders don't exist anywhere as such (the install prefix, relocated
+# license folders), so their entries are synthesized. `tarinfo_filter`
+# works like the `filter` argument of `TarFile.add()`.
+def add_parent_dirs(tarball, arc_root, dir_name, added_dirs, tarinfo_filter=None):
+    if dir_name in added_dirs:
+        return
+    if dir_name != arc_root:
+        add_parent_dirs(tarball, arc_root, os.path.dirname(dir_name), added_dirs, tarinfo_filter)
+
+    dir_info = tarfile.TarInfo(dir_name)
+    dir_info.type = tarfile.DIRTYPE
+    dir_info.mode = 0o755
+    dir_info.mtime = int(time.time())
+    dir_info.uid = os.getuid()
+    dir_info.gid = os.getgid()
+    if tarinfo_filter is not None:
+        dir_info = tarinfo_filter(dir_info)
+    tarball.addfile(dir_info)
+    added_dirs.add(dir_name)
+
+
+######################################################################
+# Materialize payload manifest entries as a tree under `prefix_root`, keeping
+# symlinks as symlinks. Returns the staged paths relative to the
+# install prefix, in the order they were staged.
+#
+# `linking` selects how file content gets there:
+#
+# - None      - plain byte copy
+# - 'reflink' - copy-on-write clone (FICLONE) where the filesystem
+#               supports it, otherwise an in-kernel `copy_file_range()`
+#               copy, otherwise a byte copy
+# - 'link'    - like 'reflink', but try a hardlink before copying
+#
+# Hardlinks share their inode with the Conan cache, so only use them
+# when everything downstream merely reads the staged tree. Whatever
+# rewrites file content in place (strip, debugedit) must get clones or
+# copies. Directory entries (rename/rm) are always safe to change.
+#
+# Further names of a hardlinked entry are always hardlinks of its first
+# staged name, whatever `linking` is. `prefix_root` exists afterwards
+# even for an empty payload.
+#
+def stage_payload(members, prefix_root, linking=None):
+
+    os.makedirs(prefix_root, exist_ok=True)
+    staged = []
+    failed_methods = set()
+    created_dirs = set()
+    dst_device = None
+    first_names = {}
+
+    for entry in members:
+        dst_path = os.path.join(prefix_root, entry.path)
+        dst_dir = os.path.dirname(dst_path)
+        if dst_dir not in created_dirs:
+            os.makedirs(dst_dir, exist_ok=True)
+            created_dirs.add(dst_dir)
+            if dst_device is None:
+                dst_device = os.stat(dst_dir).st_dev
+
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+
+        inode = (entry.device, entry.inode)
+        if entry.is_symlink():
+            os.symlink(entry.link_target, dst_path)
+        elif entry.is_hardlinked() and inode in first_names:
+            os.link(first_names[inode], dst_path)
+        elif linking is None:
+            shutil.copy2(entry.src_path, dst_path)
+        else:
+            _clone_file(entry.src_path, dst_path, linking == 'link', failed_methods,
+                        (entry.device, dst_device))
+
+        if entry.is_hardlinked():
+            first_names.setdefault(inode, dst_path)
+
+        staged.append(entry.path)
+
+    return staged
+
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Errors meaning "this method doesn't work here", as opposed to real
+# I/O errors
+_UNSUPPORTED_ERRNOS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS,
+                       errno.EPERM, errno.EMLINK,
+                      }
+
+
+# Methods that failed once are not retried for the same pair of
+# filesystems (`devices`), so a plain ext4 box doesn't pay for a failing
+# ioctl on every file.
+def _clone_file(src_path, dst_path, allow_hardlink, failed_methods, devices):
+
+    if ('reflink', devices) not in failed_methods:
+        try:
+            with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            shutil.copystat(src_path, dst_path)
+            return 'reflink'
+        except OSError as error:
+            if error.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            failed_methods.add(('reflink', devices))
+            os.remove(dst_path)
+
+    if allow_hardlink and ('hardlink', devices) not in failed_methods:
+        try:
+            os.link(src_path, dst_path)
+            return 'hardlink'
+        except OSError as error:
+            if error.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            failed_methods.add(('hardlink', devices))
+
+    if ('copy_file_range', devices) not in failed_methods:
+        try:
+            with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+                remaining = os.fstat(src_file.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src_file.fileno(), dst_file.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            shutil.copystat(src_path, dst_path)
+            return 'copy_file_range'
+        except (OSError, AttributeError) as error:
+            if isinstance(error, OSError) and error.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            failed_methods.add(('copy_file_range', devices))
+
+    shutil.copy2(src_path, dst_path)
+    return 'copy'
@@ -0,0 +1,61 @@
+######################################################################
+# system_packaging/plan.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Plan-only deploys, see `user.system_packaging:plan`: describe every
+# package a deploy would produce, from the dependency graph and the
+# payload manifests alone. Nothing is copied, staged or built, so a
+# graph change can be reviewed in seconds:
+#
+#   {"deployer": "rpm_deployer",
+#    "install_prefix": "/opt/toolchain",
+#    "packages": [{"name": "opt-toolchain-gmp", "version": "6.3.0", ...}, ...],
+#    "totals": {"packages": 12, "files": 5210, "bytes": 734003200}}
+#
+
+import json
+import os
+
+
+# One package of the plan. `fields` are the deployer's own, e.g. the
+# architecture and `requires` or `depends`.
+def package_entry(dependency_item, component_metadata, component_manifest, **fields):
+    entry = {'name': component_metadata['name'],
+             'version': component_metadata['version'],
+             'release': '1',
+             'component': component_metadata.get('component', 'runtime'),
+             'reference': str(dependency_item.ref),
+             'revision': dependency_item.ref.revision,
+             'package_id': dependency_item.pref.package_id,
+             'package_revision': dependency_item.pref.revision,
+             'maintainer': component_metadata['maintainer'],
+             'files': len(component_manifest),
+             'bytes': component_manifest.total_size(),
+            }
+    entry.update(fields)
+    return entry
+
+
+# Write `<deployer>-plan.json` to the output folder, returns its path
+def write_plan(output_folder, deployer_name, install_prefix, entries):
+    plan_path = os.path.join(output_folder, f'{ deployer_name }-plan.json')
+    with open(plan_path, 'w') as plan_file:
+        json.dump({'deployer': deployer_name,
+                   'install_prefix': install_prefix,
+                   'packages': entries,
+                   'totals': {'packages': len(entries),
+                              'files': sum(entry['files'] for entry in entries),
+                              'bytes': sum(entry['bytes'] for entry in entries),
+                             },
+                  }, plan_file, indent=2)
+        plan_file.write('\n')
+    return plan_path
+
+
+# One line per package for the deploy log
+def log_plan(conanfile, entries, relationships_key):
+    for entry in entries:
+        conanfile.output.info(f"{ entry['name'] } { entry['version'] }-{ entry['release'] } { entry['architecture'] }: "
+                              f"{ entry['files'] } file(s), { entry['bytes'] } bytes, "
+                              f"{ relationships_key } { ', '.join(entry[relationships_key]) or '-' }")
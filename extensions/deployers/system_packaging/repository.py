@@ -0,0 +1,569 @@
+######################################################################
+# system_packaging/repository.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Package repository indexes for the deployer output, so it can be
+# served as a local yum/dnf or apt repository without running
+# `createrepo` or `dpkg-scanpackages` over it:
+#
+# RPM_HOME/rpmbuild/RPMS           <deb_deployer output folder>
+#     ├── repodata                     ├── Packages
+#     │   ├── repomd.xml               ├── Packages.gz
+#     │   ├── <sha256>-primary.xml.gz  ├── Release
+#     │   ├── <sha256>-filelists.xml.gz└── *.deb
+#     │   └── <sha256>-other.xml.gz
+#     └── <arch>/*.rpm
+#
+# Everything the indexes need from a package (header fields, file
+# list, checksums) is kept in a cache file next to the deployer state,
+# keyed by the package's path and stat. A package that hasn't changed
+# since the last deploy is never opened again, only new or rebuilt
+# packages are read and hashed.
+#
+
+from . import scheduler
+from conan.errors import ConanException
+from xml.sax.saxutils import escape, quoteattr
+import email.utils
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import re
+import shutil
+import stat
+import struct
+import subprocess
+import tarfile
+import time
+
+CACHE_VERSION = 1
+
+
+class MetadataCache:
+
+    def __init__(self, output_folder, deployer_name):
+        self.path = os.path.join(output_folder, f'{ deployer_name }-repository.json')
+        self._packages = {}
+
+        # A missing, unreadable or outdated cache just means every
+        # package gets read again
+        try:
+            with open(self.path, 'r', encoding='utf-8') as cache_file:
+                cache = json.load(cache_file)
+            if cache.get('version') == CACHE_VERSION:
+                self._packages = cache['packages']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    # Metadata of every package in `package_paths` (relative to
+    # `repo_root`), reading only those not cached with the same stat.
+    # Packages no longer indexed are dropped from the cache.
+    def collect(self, repo_root, package_paths, read_metadata, max_workers=1):
+        packages = {}
+        jobs = []
+        for package_path in sorted(set(package_paths)):
+            stat_key = _stat_key(os.path.join(repo_root, package_path))
+            cached = self._packages.get(package_path)
+            if cached is not None and cached['stat'] == stat_key:
+                packages[package_path] = cached
+            else:
+                jobs.append((package_path,
+                             lambda package_path=package_path, stat_key=stat_key:
+                                 {'stat': stat_key,
+                                  'metadata': read_metadata(os.path.join(repo_root, package_path)),
+                                 },
+                            ))
+
+        for (package_path, job), entry in zip(jobs, scheduler.run_jobs(jobs, max_workers=max_workers)):
+            packages[package_path] = entry
+
+        self._packages = packages
+        self._save()
+
+        return [(package_path, packages[package_path]['metadata']) for package_path in sorted(packages)], len(jobs)
+
+    def _save(self):
+        cache = {'version': CACHE_VERSION,
+                 'packages': self._packages,
+                }
+
+        tmp_path = f'{ self.path }.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(cache, cache_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _stat_key(path):
+    path_stat = os.stat(path)
+    return [path_stat.st_size, path_stat.st_mtime_ns, path_stat.st_ino]
+
+
+# Digests of a whole file, read in one pass
+def _file_digests(path, algorithms):
+    digests = [hashlib.new(algorithm) for algorithm in algorithms]
+    with open(path, 'rb') as content:
+        for chunk in iter(lambda: content.read(1024 * 1024), b''):
+            for digest in digests:
+                digest.update(chunk)
+    return [digest.hexdigest() for digest in digests]
+
+
+# Write `content` gzipped and return (compressed, uncompressed) sha256
+# and sizes. mtime 0 keeps the compressed checksum stable.
+def _write_gzip(path, content):
+    data = content.encode('utf-8')
+    compressed = gzip.compress(data, mtime=0)
+    with open(path, 'wb') as gz_file:
+        gz_file.write(compressed)
+    return {'checksum': hashlib.sha256(compressed).hexdigest(),
+            'size': len(compressed),
+            'open_checksum': hashlib.sha256(data).hexdigest(),
+            'open_size': len(data),
+           }
+
+
+######################################################################
+# RPM header parsing, see the rpm file format documentation:
+#
+#   lead (96 bytes)
+#   signature header, padded to a multiple of 8 bytes
+#   main header
+#   payload
+#
+# A header is an 8 byte magic, index entry count and data size, then
+# `(tag, type, offset, count)` index entries and the data store.
+#
+
+RPM_LEAD_SIZE = 96
+RPM_LEAD_MAGIC = b'\xed\xab\xee\xdb'
+RPM_HEADER_MAGIC = b'\x8e\xad\xe8\x01'
+
+# Data types
+RPM_INT8, RPM_INT16, RPM_INT32, RPM_INT64 = 2, 3, 4, 5
+RPM_STRING, RPM_BIN, RPM_STRING_ARRAY, RPM_I18NSTRING = 6, 7, 8, 9
+
+# Signature header tags
+RPMSIGTAG_PAYLOADSIZE = 1007
+RPMSIGTAG_LONGARCHIVESIZE = 271
+
+# Main header tags
+RPMTAG = {'name': 1000, 'version': 1001, 'release': 1002, 'epoch': 1003,
+          'summary': 1004, 'description': 1005, 'buildtime': 1006, 'buildhost': 1007,
+          'size': 1009, 'vendor': 1011, 'license': 1014, 'packager': 1015,
+          'group': 1016, 'url': 1020, 'arch': 1022, 'oldfilenames': 1027,
+          'filemodes': 1030, 'fileflags': 1037, 'sourcerpm': 1044, 'archivesize': 1046,
+          'providename': 1047, 'requireflags': 1048, 'requirename': 1049, 'requireversion': 1050,
+          'conflictflags': 1053, 'conflictname': 1054, 'conflictversion': 1055,
+          'changelogtime': 1080, 'changelogname': 1081, 'changelogtext': 1082,
+          'obsoletename': 1090, 'provideflags': 1112, 'provideversion': 1113,
+          'obsoleteflags': 1114, 'obsoleteversion': 1115,
+          'dirindexes': 1116, 'basenames': 1117, 'dirnames': 1118,
+          'longsize': 5009,
+         }
+
+RPMSENSE_COMPARISONS = {2: 'LT', 4: 'GT', 8: 'EQ', 10: 'LE', 12: 'GE'}
+# PREREQ, SCRIPT_PRE, SCRIPT_POST
+RPMSENSE_PRE = (1 << 6) | (1 << 9) | (1 << 10)
+RPMFILE_GHOST = 1 << 6
+
+# Files listed in primary.xml as well as filelists.xml, like createrepo
+PRIMARY_FILES = re.compile(r'^(/etc/|.*bin/|/usr/lib/sendmail$)')
+
+
+def _read_rpm_header(rpm_file, path):
+    intro = rpm_file.read(16)
+    if len(intro) != 16 or intro[:4] != RPM_HEADER_MAGIC:
+        raise ConanException(f'{ path } is not an RPM package, bad header magic')
+    index_count, store_size = struct.unpack('>II', intro[8:])
+    index = rpm_file.read(16 * index_count)
+    store = rpm_file.read(store_size)
+
+    header = {}
+    for position in range(index_count):
+        tag, data_type, offset, count = struct.unpack_from('>iIiI', index, 16 * position)
+        header[tag] = _header_value(store, data_type, offset, count)
+
+    return header, 16 + len(index) + len(store)
+
+
+def _header_value(store, data_type, offset, count):
+    if data_type == RPM_STRING:
+        return store[offset:store.index(b'\0', offset)].decode('utf-8', 'replace')
+    if data_type in (RPM_STRING_ARRAY, RPM_I18NSTRING):
+        values = []
+        for _ in range(count):
+            end = store.index(b'\0', offset)
+            values.append(store[offset:end].decode('utf-8', 'replace'))
+            offset = end + 1
+        # Only the untranslated I18N string is of interest
+        return values[0] if data_type == RPM_I18NSTRING else values
+    if data_type in (RPM_INT8, RPM_INT16, RPM_INT32, RPM_INT64):
+        code = {RPM_INT8: 'B', RPM_INT16: 'H', RPM_INT32: 'I', RPM_INT64: 'Q'}[data_type]
+        return list(struct.unpack_from(f'>{ count }{ code }', store, offset))
+    if data_type == RPM_BIN:
+        return store[offset:offset + count]
+    return None
+
+
+# `epoch:version-release` into its parts, epoch defaulting to 0
+def _split_evr(evr):
+    epoch, separator, version_release = evr.partition(':')
+    if not separator:
+        epoch, version_release = '0', evr
+    version, separator, release = version_release.rpartition('-')
+    if not separator:
+        version, release = release, None
+    return epoch or '0', version, release
+
+
+def _dependencies(header, kind):
+    names = header.get(RPMTAG[f'{ kind }name'], [])
+    flags = header.get(RPMTAG[f'{ kind }flags'], [0] * len(names))
+    versions = header.get(RPMTAG[f'{ kind }version'], [''] * len(names))
+
+    dependencies = []
+    for name, flag, version in zip(names, flags, versions):
+        # Satisfied by rpm itself
+        if name.startswith('rpmlib('):
+            continue
+        dependency = {'name': name}
+        comparison = RPMSENSE_COMPARISONS.get(flag & 0xe)
+        if comparison and version:
+            dependency['flags'] = comparison
+            dependency['epoch'], dependency['ver'], dependency['rel'] = _split_evr(version)
+        if kind == 'require' and flag & RPMSENSE_PRE:
+            dependency['pre'] = True
+        if dependency not in dependencies:
+            dependencies.append(dependency)
+    return dependencies
+
+
+def _first(header, name, default=''):
+    value = header.get(RPMTAG[name])
+    if value is None:
+        return default
+    if isinstance(value, list):
+        return value[0] if value else default
+    return value
+
+
+######################################################################
+# Everything repodata needs to know about the RPM at `path`
+#
+def read_rpm_metadata(path):
+
+    with open(path, 'rb') as rpm_file:
+        if rpm_file.read(RPM_LEAD_SIZE)[:4] != RPM_LEAD_MAGIC:
+            raise ConanException(f'{ path } is not an RPM package, bad lead magic')
+        signature, signature_size = _read_rpm_header(rpm_file, path)
+        rpm_file.read((8 - signature_size % 8) % 8)
+        header_start = rpm_file.tell()
+        header, header_size = _read_rpm_header(rpm_file, path)
+
+    if RPMTAG['basenames'] in header:
+        dirnames = header.get(RPMTAG['dirnames'], [])
+        files = [dirnames[dirindex] + basename
+                 for dirindex, basename in zip(header[RPMTAG['dirindexes']], header[RPMTAG['basenames']])]
+    else:
+        files = header.get(RPMTAG['oldfilenames'], [])
+    modes = header.get(RPMTAG['filemodes'], [0] * len(files))
+    file_flags = header.get(RPMTAG['fileflags'], [0] * len(files))
+
+    file_list = []
+    for file_path, mode, file_flag in zip(files, modes, file_flags):
+        if file_flag & RPMFILE_GHOST:
+            file_list.append([file_path, 'ghost'])
+        elif stat.S_ISDIR(mode):
+            file_list.append([file_path, 'dir'])
+        else:
+            file_list.append([file_path, None])
+
+    archive_size = (signature.get(RPMSIGTAG_LONGARCHIVESIZE) or signature.get(RPMSIGTAG_PAYLOADSIZE)
+                    or header.get(RPMTAG['archivesize']) or [0])[0]
+
+    changelogs = [{'author': author, 'date': date, 'text': text}
+                  for date, author, text in zip(header.get(RPMTAG['changelogtime'], []),
+                                                header.get(RPMTAG['changelogname'], []),
+                                                header.get(RPMTAG['changelogtext'], []))]
+
+    checksum, = _file_digests(path, ['sha256'])
+
+    return {'name': _first(header, 'name'),
+            'arch': _first(header, 'arch'),
+            'epoch': str(_first(header, 'epoch', 0)),
+            'version': _first(header, 'version'),
+            'release': _first(header, 'release'),
+            'checksum': checksum,
+            'summary': _first(header, 'summary'),
+            'description': _first(header, 'description'),
+            'packager': _first(header, 'packager'),
+            'url': _first(header, 'url'),
+            'file_time': int(os.stat(path).st_mtime),
+            'build_time': _first(header, 'buildtime', 0),
+            'package_size': os.path.getsize(path),
+            'installed_size': _first(header, 'longsize', None) or _first(header, 'size', 0),
+            'archive_size': archive_size,
+            'license': _first(header, 'license'),
+            'vendor': _first(header, 'vendor'),
+            'group': _first(header, 'group'),
+            'buildhost': _first(header, 'buildhost'),
+            'sourcerpm': _first(header, 'sourcerpm'),
+            'header_range': [header_start, header_start + header_size],
+            'provides': _dependencies(header, 'provide'),
+            'requires': _dependencies(header, 'require'),
+            'conflicts': _dependencies(header, 'conflict'),
+            'obsoletes': _dependencies(header, 'obsolete'),
+            'files': file_list,
+            'changelogs': changelogs,
+           }
+
+
+def _xml_version(package):
+    return (f'<version epoch={ quoteattr(package["epoch"]) } ver={ quoteattr(package["version"]) } '
+            f'rel={ quoteattr(package["release"]) }/>')
+
+
+def _xml_files(files, primary=False):
+    lines = []
+    for file_path, file_type in files:
+        if primary and not PRIMARY_FILES.match(file_path):
+            continue
+        type_attribute = f' type="{ file_type }"' if file_type else ''
+        lines.append(f'    <file{ type_attribute }>{ escape(file_path) }</file>')
+    return lines
+
+
+def _xml_primary(package, location):
+    lines = ['<package type="rpm">',
+             f'  <name>{ escape(package["name"]) }</name>',
+             f'  <arch>{ escape(package["arch"]) }</arch>',
+             f'  { _xml_version(package) }',
+             f'  <checksum type="sha256" pkgid="YES">{ package["checksum"] }</checksum>',
+             f'  <summary>{ escape(package["summary"]) }</summary>',
+             f'  <description>{ escape(package["description"]) }</description>',
+             f'  <packager>{ escape(package["packager"]) }</packager>',
+             f'  <url>{ escape(package["url"]) }</url>',
+             f'  <time file="{ package["file_time"] }" build="{ package["build_time"] }"/>',
+             f'  <size package="{ package["package_size"] }" installed="{ package["installed_size"] }" '
+             f'archive="{ package["archive_size"] }"/>',
+             f'  <location href={ quoteattr(location) }/>',
+             '  <format>',
+             f'    <rpm:license>{ escape(package["license"]) }</rpm:license>',
+             f'    <rpm:vendor>{ escape(package["vendor"]) }</rpm:vendor>',
+             f'    <rpm:group>{ escape(package["group"]) }</rpm:group>',
+             f'    <rpm:buildhost>{ escape(package["buildhost"]) }</rpm:buildhost>',
+             f'    <rpm:sourcerpm>{ escape(package["sourcerpm"]) }</rpm:sourcerpm>',
+             f'    <rpm:header-range start="{ package["header_range"][0] }" end="{ package["header_range"][1] }"/>',
+            ]
+
+    for kind in ['provides', 'requires', 'conflicts', 'obsoletes']:
+        if not package[kind]:
+            continue
+        lines.append(f'    <rpm:{ kind }>')
+        for dependency in package[kind]:
+            attributes = f'name={ quoteattr(dependency["name"]) }'
+            if 'flags' in dependency:
+                attributes += f' flags="{ dependency["flags"] }" epoch={ quoteattr(dependency["epoch"]) }' \
+                              f' ver={ quoteattr(dependency["ver"]) }'
+                if dependency['rel'] is not None:
+                    attributes += f' rel={ quoteattr(dependency["rel"]) }'
+            if dependency.get('pre'):
+                attributes += ' pre="1"'
+            lines.append(f'      <rpm:entry { attributes }/>')
+        lines.append(f'    </rpm:{ kind }>')
+
+    lines.extend(_xml_files(package['files'], primary=True))
+    lines.extend(['  </format>', '</package>'])
+    return lines
+
+
+def _xml_package(package):
+    return (f'<package pkgid="{ package["checksum"] }" name={ quoteattr(package["name"]) } '
+            f'arch={ quoteattr(package["arch"]) }>')
+
+
+######################################################################
+# Write `repodata/` for the RPMs at `package_paths` (relative to
+# `repo_root`), reading only packages missing from `cache`. Returns the
+# number of packages that had to be read.
+#
+def write_yum_repodata(repo_root, package_paths, cache, max_workers=1):
+
+    packages, read_count = cache.collect(repo_root, package_paths, read_rpm_metadata, max_workers=max_workers)
+
+    primary = ['<?xml version="1.0" encoding="UTF-8"?>',
+               f'<metadata xmlns="http://linux.duke.edu/metadata/common" '
+               f'xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="{ len(packages) }">']
+    filelists = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 f'<filelists xmlns="http://linux.duke.edu/metadata/filelists" packages="{ len(packages) }">']
+    other = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<otherdata xmlns="http://linux.duke.edu/metadata/other" packages="{ len(packages) }">']
+
+    for package_path, package in packages:
+        primary.extend(_xml_primary(package, package_path))
+
+        filelists.extend([_xml_package(package), f'  { _xml_version(package) }'])
+        filelists.extend(line[2:] for line in _xml_files(package['files']))
+        filelists.append('</package>')
+
+        other.extend([_xml_package(package), f'  { _xml_version(package) }'])
+        for changelog in package['changelogs']:
+            other.append(f'  <changelog author={ quoteattr(changelog["author"]) } date="{ changelog["date"] }">'
+                         f'{ escape(changelog["text"]) }</changelog>')
+        other.append('</package>')
+
+    primary.append('</metadata>')
+    filelists.append('</filelists>')
+    other.append('</otherdata>')
+
+    # Build the new repodata next to the old one and swap it in, so the
+    # repository is never seen half written
+    repodata_path = os.path.join(repo_root, 'repodata')
+    new_repodata_path = os.path.join(repo_root, '.repodata.new')
+    shutil.rmtree(new_repodata_path, ignore_errors=True)
+    os.makedirs(new_repodata_path)
+
+    timestamp = int(time.time())
+    repomd = ['<?xml version="1.0" encoding="UTF-8"?>',
+              '<repomd xmlns="http://linux.duke.edu/metadata/repo" xmlns:rpm="http://linux.duke.edu/metadata/rpm">',
+              f'  <revision>{ timestamp }</revision>']
+
+    for data_type, lines in [('primary', primary), ('filelists', filelists), ('other', other)]:
+        tmp_path = os.path.join(new_repodata_path, f'{ data_type }.xml.gz')
+        written = _write_gzip(tmp_path, '\n'.join(lines) + '\n')
+        file_name = f'{ written["checksum"] }-{ data_type }.xml.gz'
+        os.replace(tmp_path, os.path.join(new_repodata_path, file_name))
+        repomd.extend([f'  <data type="{ data_type }">',
+                       f'    <checksum type="sha256">{ written["checksum"] }</checksum>',
+                       f'    <open-checksum type="sha256">{ written["open_checksum"] }</open-checksum>',
+                       f'    <location href="repodata/{ file_name }"/>',
+                       f'    <timestamp>{ timestamp }</timestamp>',
+                       f'    <size>{ written["size"] }</size>',
+                       f'    <open-size>{ written["open_size"] }</open-size>',
+                       '  </data>'])
+    repomd.append('</repomd>')
+
+    with open(os.path.join(new_repodata_path, 'repomd.xml'), 'w', encoding='utf-8') as repomd_file:
+        repomd_file.write('\n'.join(repomd) + '\n')
+
+    old_repodata_path = os.path.join(repo_root, '.repodata.old')
+    shutil.rmtree(old_repodata_path, ignore_errors=True)
+    if os.path.isdir(repodata_path):
+        os.rename(repodata_path, old_repodata_path)
+    os.rename(new_repodata_path, repodata_path)
+    shutil.rmtree(old_repodata_path, ignore_errors=True)
+
+    return read_count
+
+
+######################################################################
+# .deb parsing, see deb(5): an ar archive whose `control.tar.*` member
+# holds the `./control` file
+#
+
+def _read_deb_control(path):
+    with open(path, 'rb') as deb_file:
+        if deb_file.read(8) != b'!<arch>\n':
+            raise ConanException(f'{ path } is not a .deb package, bad ar magic')
+
+        while True:
+            member_header = deb_file.read(60)
+            if len(member_header) < 60:
+                break
+            member_name = member_header[:16].decode('ascii').strip().rstrip('/')
+            member_size = int(member_header[48:58].decode('ascii').strip())
+
+            if not member_name.startswith('control.tar'):
+                deb_file.seek(member_size + member_size % 2, os.SEEK_CUR)
+                continue
+
+            control_tar = _decompress(member_name, deb_file.read(member_size))
+            with tarfile.open(fileobj=io.BytesIO(control_tar), mode='r:') as control_tarball:
+                for tarinfo in control_tarball:
+                    if tarinfo.isreg() and os.path.normpath(tarinfo.name) == 'control':
+                        return control_tarball.extractfile(tarinfo).read().decode('utf-8')
+            break
+
+    raise ConanException(f'{ path } has no control file')
+
+
+def _decompress(member_name, data):
+    if member_name.endswith('.gz'):
+        return gzip.decompress(data)
+    if member_name.endswith('.xz'):
+        return lzma.decompress(data)
+    if member_name.endswith('.zst'):
+        return subprocess.run(['zstd', '-d', '-c'], input=data, capture_output=True, check=True).stdout
+    return data
+
+
+# Everything the apt indexes need to know about the .deb at `path`
+def read_deb_metadata(path):
+    control = _read_deb_control(path).strip('\n')
+    md5sum, sha1, sha256 = _file_digests(path, ['md5', 'sha1', 'sha256'])
+
+    fields = {}
+    for line in control.split('\n'):
+        field, separator, value = line.partition(':')
+        if separator and not line[0].isspace():
+            fields[field] = value.strip()
+
+    return {'control': control,
+            'package': fields.get('Package', ''),
+            'version': fields.get('Version', ''),
+            'architecture': fields.get('Architecture', ''),
+            'size': os.path.getsize(path),
+            'md5sum': md5sum,
+            'sha1': sha1,
+            'sha256': sha256,
+           }
+
+
+######################################################################
+# Write a flat apt repository index, `Packages`, `Packages.gz` and
+# `Release`, for the .deb files at `package_paths` (relative to
+# `repo_root`), reading only packages missing from `cache`. Returns the
+# number of packages that had to be read.
+#
+def write_apt_index(repo_root, package_paths, cache, origin, max_workers=1):
+
+    packages, read_count = cache.collect(repo_root, package_paths, read_deb_metadata, max_workers=max_workers)
+    packages.sort(key=lambda package: (package[1]['package'], package[1]['version'], package[0]))
+
+    stanzas = []
+    for package_path, package in packages:
+        stanzas.append(f'{ package["control"] }\n'
+                       f'Filename: ./{ package_path }\n'
+                       f'Size: { package["size"] }\n'
+                       f'MD5sum: { package["md5sum"] }\n'
+                       f'SHA1: { package["sha1"] }\n'
+                       f'SHA256: { package["sha256"] }\n')
+    packages_content = '\n'.join(stanzas).encode('utf-8')
+
+    index_files = {'Packages': packages_content,
+                   'Packages.gz': gzip.compress(packages_content, mtime=0),
+                  }
+
+    architectures = sorted({package['architecture'] for package_path, package in packages})
+    release = [f'Origin: { origin }',
+               f'Label: { origin }',
+               f'Date: { email.utils.formatdate(usegmt=True) }',
+               f'Architectures: { " ".join(architectures) }']
+    for field, algorithm in [('MD5Sum', 'md5'), ('SHA1', 'sha1'), ('SHA256', 'sha256')]:
+        release.append(f'{ field }:')
+        for file_name, content in index_files.items():
+            release.append(f' { hashlib.new(algorithm, content).hexdigest() } { len(content):>16} { file_name }')
+    index_files['Release'] = ('\n'.join(release) + '\n').encode('utf-8')
+
+    # Release last, it vouches for the others
+    for file_name, content in index_files.items():
+        tmp_path = os.path.join(repo_root, f'.{ file_name }.new')
+        with open(tmp_path, 'wb') as index_file:
+            index_file.write(content)
+        os.replace(tmp_path, os.path.join(repo_root, file_name))
+
+    return read_count
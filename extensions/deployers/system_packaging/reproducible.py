@@ -0,0 +1,95 @@
+######################################################################
+# system_packaging/reproducible.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Settings for byte-stable packages, see
+# `user.system_packaging:reproducible` and
+# https://reproducible-builds.org/docs/source-date-epoch/
+#
+# Every timestamp that ends up in a package is the dependency's
+# SOURCE_DATE_EPOCH:
+#
+# - `SOURCE_DATE_EPOCH` from the environment, when set
+# - otherwise the time its Conan recipe revision was created, so it only
+#   moves when the recipe does
+# - otherwise 1980-01-01, for references without a revision timestamp
+#
+# Tarball members are sorted and owned by root, `rpmbuild` and
+# `dpkg-buildpackage` get the same epoch, and the Debian changelog is
+# written with it rather than by `dch`.
+#
+
+import datetime
+import email.utils
+import os
+
+DEFAULT_EPOCH = 315532800
+
+
+def source_date_epoch(dependency_items):
+    if os.environ.get('SOURCE_DATE_EPOCH'):
+        return int(os.environ['SOURCE_DATE_EPOCH'])
+
+    # A package built from several recipes is as new as the newest one
+    timestamps = [int(dependency_item.ref.timestamp) for dependency_item in dependency_items
+                  if getattr(dependency_item.ref, 'timestamp', None) is not None]
+    return max(timestamps, default=DEFAULT_EPOCH)
+
+
+# `tarinfo_filter` for `TarFile.addfile()`, like GNU tar's `--mtime`,
+# `--owner=0 --group=0 --numeric-owner`
+def normalizer(epoch):
+    def normalize(tarinfo):
+        tarinfo.mtime = epoch
+        tarinfo.uid = tarinfo.gid = 0
+        tarinfo.uname = tarinfo.gname = ''
+        return tarinfo
+    return normalize
+
+
+# GNU tar arguments creating the same archive from the same tree, none
+# without an epoch
+def tar_arguments(epoch):
+    if epoch is None:
+        return []
+    return ['--sort=name',
+            f'--mtime=@{ epoch }',
+            '--owner=0',
+            '--group=0',
+            '--numeric-owner',
+            '--format=gnu',
+           ]
+
+
+# `rpmbuild` defines to go with `SOURCE_DATE_EPOCH` in its environment,
+# none without an epoch. rpm ignores the epoch for build times and file
+# mtimes unless told, and records the build host otherwise.
+# `tool_reproducible` has the spec templates normalize every mtime.
+def rpmbuild_arguments(epoch):
+    if epoch is None:
+        return []
+    return ['--define', 'use_source_date_epoch_as_buildtime 1',
+            '--define', 'clamp_mtime_to_source_date_epoch 1',
+            '--define', '_buildhost reproducible',
+            '--define', 'tool_reproducible 1',
+           ]
+
+
+######################################################################
+# debian/changelog dated `epoch`, what `dch --create` would write.
+# `dpkg-buildpackage` takes its SOURCE_DATE_EPOCH from this date.
+# `maintainer` may be a bare name or `Name <address>`, `package_email`
+# is the address when it has none.
+#
+def debian_changelog(package_name, version, maintainer, package_email, epoch, message):
+    name, address = email.utils.parseaddr(maintainer)
+    if '@' not in address:
+        name, address = name or maintainer, package_email
+
+    date = email.utils.format_datetime(datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc))
+    return f'{ package_name } ({ version }) UNRELEASED; urgency=medium\n' \
+         + f'\n' \
+         + f'  * { message }\n' \
+         + f'\n' \
+         + f' -- { name or address } <{ address }>  { date }\n'
@@ -0,0 +1,130 @@
+######################################################################
+# system_packaging/rpmspec.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Helpers generating content for the rpm_deployer spec template.
+#
+
+from . import payload
+import os
+
+# Paths (relative to the install prefix) that are never owned by one of
+# our packages, same as the `%exclude` in the spec template.
+FILES_EXCLUDES = payload.UNOWNED_PATHS
+
+
+# Escape a path for use in a `%files` list: no macro expansion, no
+# globbing, and quoted in case of whitespace.
+def _files_entry(path):
+    path = path.replace('%', '%%')
+    for glob_char in '\\*?[]{}':
+        path = path.replace(glob_char, f'\\{ glob_char }')
+    return f'"{ path }"'
+
+
+######################################################################
+# Generate an explicit `%files -f` manifest for payload paths relative
+# to `install_prefix`. Every directory from the install prefix down is
+# owned with `%dir`, just like the `%{toolchain_prefix}` glob it
+# replaces. `root_owned` packages everything as root rather than as
+# whoever ran the build.
+#
+def files_manifest(install_prefix, rel_paths, root_owned=False):
+
+    install_prefix = '/' + str(install_prefix).strip('/')
+
+    dirs = {install_prefix}
+    entries = []
+    for rel_path in rel_paths:
+        parent = os.path.dirname(rel_path)
+        while parent and os.path.join(install_prefix, parent) not in dirs:
+            dirs.add(os.path.join(install_prefix, parent))
+            parent = os.path.dirname(parent)
+
+        if rel_path in FILES_EXCLUDES:
+            entries.append(f'%exclude { _files_entry(os.path.join(install_prefix, rel_path)) }')
+        else:
+            entries.append(_files_entry(os.path.join(install_prefix, rel_path)))
+
+    manifest = ['%defattr(-,root,root,-)'] if root_owned else []
+    manifest.extend(f'%dir { _files_entry(dir_path) }' for dir_path in sorted(dirs))
+    manifest.extend(entries)
+
+    return '\n'.join(manifest) + '\n'
+
+
+# Escape text for use in spec tags and descriptions, no macro expansion
+def _spec_text(text):
+    return str(text).replace('%', '%%')
+
+
+######################################################################
+# Generate the `%package`, `%description` and `%files` sections of the
+# single-spec toolchain build, one subpackage per dependency, and of
+# split -devel/-doc/-debuginfo packages. Each entry of `packages` is
+# the package metadata plus the path of its `files_manifest`.
+#
+def subpackages(packages):
+
+    sections = []
+    for package in packages:
+        name = package['name']
+
+        section = [f'%package -n { name }',
+                   f"Version:        { _spec_text(package['version']) }",
+                   f"Summary:        { _spec_text(package['summary']) }",
+                   f"License:        { _spec_text(package['license']) }",
+                   'AutoReqProv:    no',
+                  ]
+        if package.get('noarch'):
+            section.append('BuildArch:      noarch')
+        section.extend(_spec_text(require_line) for require_line in package['requires'])
+        section.extend(_spec_text(provide_line) for provide_line in package.get('provides', []))
+        section.extend(['',
+                        f'%description -n { name }',
+                        _spec_text(package['summary']),
+                        '',
+                        f"%files -n { name } -f { package['files_manifest'] }",
+                        '',
+                       ])
+        sections.append('\n'.join(section))
+
+    return '\n'.join(sections)
+
+
+######################################################################
+# rpmbuild arguments for a post-install `profile`, see
+# `user.system_packaging:rpm_postprocess`. `own_debuginfo` is set when
+# the split packages include our own -debuginfo, which takes the name
+# rpm's would get.
+#
+# With `debuginfo`, every (prefixed) package gets its own
+# `<package>-debuginfo` and find-debuginfo runs `debuginfo_jobs` jobs.
+# The spec templates add `%debug_package` themselves when there is no
+# `%setup` to do it.
+#
+def postprocess_arguments(profile, own_debuginfo=False, debuginfo_jobs=1, dwz=True):
+
+    if profile == 'skip':
+        return ['--define', '__os_install_post %{nil}',
+                '--define', '__arch_install_post %{nil}',
+                '--define', 'debug_package %{nil}',
+               ]
+    if profile == 'strip' or own_debuginfo:
+        return ['--define', 'debug_package %{nil}']
+    if profile != 'debuginfo':
+        return []
+
+    arguments = ['--define', 'tool_debuginfo 1',
+                 '--define', '_debuginfo_subpackages 1',
+                 # There are no sources to go into a -debugsource package,
+                 # and binaries without a build-id just get no debuginfo
+                 '--undefine', '_debugsource_packages',
+                 '--undefine', '_missing_build_ids_terminate_build',
+                 '--define', f'_smp_build_ncpus { debuginfo_jobs }',
+                 '--define', f'_smp_mflags -j{ debuginfo_jobs }',
+                ]
+    if not dwz:
+        arguments.extend(['--define', '_find_debuginfo_dwz_opts %{nil}'])
+    return arguments
@@ -0,0 +1,72 @@
+######################################################################
+# system_packaging/scheduler.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Runs per-dependency packaging jobs through a thread pool.
+#
+# Jobs are submitted in Conan graph order and results are returned in
+# that same order. Packaging one dependency never needs another
+# dependency's package to exist (`Requires:`/`Depends:` are metadata
+# only), so every graph node is an independent job and wall time
+# approaches that of the single biggest package.
+#
+# Threads are used rather than processes: the Conan graph objects are
+# not picklable, and the heavy lifting happens in child processes
+# (tar, rpmbuild, debuild) or in I/O that releases the GIL.
+#
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+# `jobs` is a list of `(label, callable)` tuples, in graph order.
+def run_jobs(jobs, max_workers=1):
+
+    if max_workers <= 1 or len(jobs) <= 1:
+        return [job() for label, job in jobs]
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)),
+                            thread_name_prefix='system_packaging',
+                           ) as pool:
+        futures = [pool.submit(job) for label, job in jobs]
+        try:
+            for future in futures:
+                results.append(future.result())
+        except BaseException:
+            # Don't start anything new once one package has failed
+            for future in futures:
+                future.cancel()
+            raise
+
+    return results
+
+
+######################################################################
+# Caps the estimated disk footprint of the jobs in flight, see
+# `user.system_packaging:disk_budget`. A job blocks in `acquire()`
+# until its footprint fits next to the jobs already running. A job
+# bigger than the whole budget runs once nothing else does, `None`
+# means no budget at all.
+#
+class DiskBudget:
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self._in_use = 0
+        self._running = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, footprint):
+        with self._condition:
+            if self.budget is not None:
+                self._condition.wait_for(lambda: self._running == 0 or self._in_use + footprint <= self.budget)
+            self._in_use += footprint
+            self._running += 1
+
+    def release(self, footprint):
+        with self._condition:
+            self._in_use -= footprint
+            self._running -= 1
+            self._condition.notify_all()
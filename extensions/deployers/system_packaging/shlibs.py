@@ -0,0 +1,246 @@
+######################################################################
+# system_packaging/shlibs.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Shared library relationships between packages, see
+# `user.system_packaging:shlib_deps`. Every `DT_NEEDED` soname of a
+# package's ELF files (see `elf.py`) is resolved
+#
+# 1. against the sonames other packages of the same deploy provide,
+#    requiring that package at its exact version
+# 2. against the system libraries: for RPMs the soname capability, if
+#    a library of the same ELF class exists in the dynamic linker's
+#    search path, for .debs the dependency its dpkg `shlibs` or
+#    `symbols` file declares
+#
+# and anything else is reported as unresolved. RPMs also get `Provides:`
+# for the sonames of their own shared libraries.
+#
+
+from . import elf, scheduler, split
+import glob
+import os
+import re
+
+DEFAULT_LIBRARY_DIRS = ['/lib', '/usr/lib', '/lib64', '/usr/lib64']
+DPKG_INFO_DIR = '/var/lib/dpkg/info'
+
+
+# rpm's soname capability, as rpm's own elfdeps would generate it
+def rpm_capability(soname, elf_class):
+    return f'{ soname }()(64bit)' if elf_class == 64 else soname
+
+
+# `(library name, version)` as dpkg `shlibs` files key a soname:
+# libfoo.so.1 is ('libfoo', '1'), libfoo-1.2.so is ('libfoo', '1.2')
+def shlibs_key(soname):
+    match = re.fullmatch(r'(.+)\.so\.(.+)', soname)
+    if match is None:
+        match = re.fullmatch(r'(.+)-([0-9][^-]*)\.so', soname)
+    if match is None:
+        return re.sub(r'\.so$', '', soname), ''
+    return match.group(1), match.group(2)
+
+
+######################################################################
+# What the build host's system libraries offer, read without running
+# any tool: the ELF class of the libraries in the dynamic linker's
+# search path, each read once on first use, and for .debs the
+# `shlibs`/`symbols` files of the installed packages.
+#
+class SystemLibraries:
+
+    def __init__(self, package_format):
+        self.package_format = package_format
+        self.library_dirs = library_dirs()
+        self._elf_classes = {}
+
+        self.deb_dependencies = {}
+        if package_format == 'deb':
+            self._read_dpkg_info(elf.host_architecture('deb'))
+
+    # Relationship on the system package providing `soname`, None if
+    # the system doesn't have it
+    def resolve(self, soname, elf_class):
+        if self.package_format == 'deb':
+            return self.deb_dependencies.get(shlibs_key(soname))
+        if elf_class in self.elf_classes(soname):
+            return rpm_capability(soname, elf_class)
+        return None
+
+    # ELF classes of the system libraries named `soname`: a 64-bit
+    # payload can't use a 32-bit `/usr/lib/libfoo.so.1`
+    def elf_classes(self, soname):
+        if soname not in self._elf_classes:
+            elf_classes = set()
+            for library_dir in self.library_dirs:
+                elf_file = elf.read_file(os.path.join(library_dir, soname))
+                if elf_file is not None:
+                    elf_classes.add(elf_file.elf_class)
+            self._elf_classes[soname] = elf_classes
+        return self._elf_classes[soname]
+
+    def _read_dpkg_info(self, host_architecture):
+        info_files = [info_file for info_file in sorted(glob.glob(os.path.join(DPKG_INFO_DIR, '*.shlibs'))
+                                                        + glob.glob(os.path.join(DPKG_INFO_DIR, '*.symbols')))
+                      if ':' not in os.path.basename(info_file)
+                      or os.path.basename(info_file).rsplit('.', 1)[0].endswith(f':{ host_architecture }')]
+
+        symbols_dependencies = {}
+        for info_file in info_files:
+            try:
+                with open(info_file, encoding='utf-8', errors='replace') as info:
+                    if info_file.endswith('.shlibs'):
+                        # `[type: ]library version dependency`, udebs don't count
+                        for line in info:
+                            fields = line.split(None, 2)
+                            if len(fields) == 3 and not fields[0].endswith(':') and not line.startswith('#'):
+                                self.deb_dependencies.setdefault((fields[0], fields[1]), fields[2].strip())
+                    else:
+                        # Only the unindented `soname dependency #MINVER#` lines
+                        for line in info:
+                            if line[:1] not in ('', ' ', '\t', '|', '*', '#', '\n'):
+                                fields = line.split(None, 1)
+                                if len(fields) == 2:
+                                    symbols_dependencies.setdefault(shlibs_key(fields[0]),
+                                                                    fields[1].replace('#MINVER#', '').strip())
+            except OSError:
+                pass
+
+        # shlibs files carry a minimum version, prefer them
+        for key, dependency in symbols_dependencies.items():
+            self.deb_dependencies.setdefault(key, dependency)
+
+
+# The dynamic linker's search path, from `/etc/ld.so.conf` and its
+# includes plus the default directories. Each file is read once, even
+# when includes loop back to it.
+def library_dirs(conf_path='/etc/ld.so.conf', seen=None):
+    seen = {os.path.realpath(conf_path)} if seen is None else seen
+    dirs = []
+    try:
+        with open(conf_path) as conf:
+            for line in conf:
+                line = line.split('#', 1)[0].strip()
+                if line.startswith('include '):
+                    for include_path in sorted(glob.glob(os.path.join(os.path.dirname(conf_path),
+                                                                      line.split(None, 1)[1]))):
+                        if os.path.realpath(include_path) not in seen:
+                            seen.add(os.path.realpath(include_path))
+                            dirs.extend(library_dirs(include_path, seen))
+                elif line.startswith('/'):
+                    dirs.append(line)
+    except OSError:
+        pass
+
+    if conf_path == '/etc/ld.so.conf':
+        dirs.extend(DEFAULT_LIBRARY_DIRS)
+    return dirs
+
+
+######################################################################
+# Scan every dependency's payload for ELF files, concurrently. Returns
+# one `{path: ElfFile}` per dependency, see `elf.scan_manifest()`.
+#
+def scan_dependencies(dependency_items, payload_manifests, tracer, max_workers=1):
+
+    def scan(dependency_item, payload_manifest):
+        with tracer.span('elf', package=str(dependency_item)) as span:
+            elf_files = elf.scan_manifest(payload_manifest)
+            span.files = len(elf_files)
+        return elf_files
+
+    return scheduler.run_jobs([(str(dependency_item),
+                                lambda dependency_item=dependency_item, payload_manifest=payload_manifest:
+                                    scan(dependency_item, payload_manifest),
+                               ) for dependency_item, payload_manifest in zip(dependency_items, payload_manifests)],
+                              max_workers=max_workers,
+                             )
+
+
+######################################################################
+# The ELF files of every package of a deploy and the sonames they
+# provide, `(soname, elf class)` to `(dependency_item, component)`.
+# `split_rules` has each dependency's rules when packages are split,
+# see `split.py`. `system_libraries` is None when only architectures
+# are wanted.
+#
+class LibraryIndex:
+
+    def __init__(self, dependency_items, payload_manifests, elf_scans, split_rules=None, system_libraries=None):
+        self.system_libraries = system_libraries
+        self.providers = {}
+        self._elf_files = {}
+        for index, (dependency_item, payload_manifest, elf_files) in enumerate(zip(dependency_items,
+                                                                                   payload_manifests,
+                                                                                   elf_scans)):
+            self._elf_files[str(dependency_item.ref)] = elf_files
+            for entry in payload_manifest:
+                elf_file = elf_files.get(entry.path)
+                if elf_file is None or elf_file.type != elf.ET_DYN or not elf_file.soname:
+                    continue
+
+                # Separate debug files carry the soname of their library too
+                component = split.classify(entry, split_rules[index]) if split_rules is not None else 'runtime'
+                if component != 'debuginfo':
+                    self.providers.setdefault((elf_file.soname, elf_file.elf_class), (dependency_item, component))
+
+    def elf_files(self, dependency_item):
+        return self._elf_files.get(str(dependency_item.ref), {})
+
+    # Whether any of `paths` is machine code, i.e. the package can't be
+    # noarch
+    def has_elf_files(self, dependency_item, paths):
+        elf_files = self.elf_files(dependency_item)
+        return any(path in elf_files for path in paths)
+
+    ######################################################################
+    # Shared library relationships of one package built from the payload
+    # paths `paths` of `dependency_item`. Returns `(provides, graph,
+    # system, unresolved)`:
+    #
+    # - provides   - `(soname, elf class)` of the package's own libraries
+    # - graph      - `(dependency_item, component)` of other packages
+    # - system     - system relationships, see `SystemLibraries.resolve()`
+    # - unresolved - sonames nothing provides
+    #
+    # Sonames the same dependency provides in any of its packages are
+    # left out, its split packages already require each other.
+    #
+    def relationships(self, dependency_item, paths):
+
+        elf_files = self.elf_files(dependency_item)
+        provides = set()
+        needed = set()
+        for path in paths:
+            elf_file = elf_files.get(path)
+            if elf_file is None:
+                continue
+            if elf_file.type == elf.ET_DYN and elf_file.soname:
+                provides.add((elf_file.soname, elf_file.elf_class))
+            needed.update((soname, elf_file.elf_class) for soname in elf_file.needed)
+
+        own_sonames = {(elf_file.soname, elf_file.elf_class) for elf_file in elf_files.values()
+                       if elf_file.type == elf.ET_DYN and elf_file.soname}
+
+        graph = []
+        system = []
+        unresolved = []
+        for soname, elf_class in sorted(needed - own_sonames):
+            provider = self.providers.get((soname, elf_class))
+            if provider is not None:
+                if provider not in graph:
+                    graph.append(provider)
+                continue
+
+            system_relationship = None
+            if self.system_libraries is not None:
+                system_relationship = self.system_libraries.resolve(soname, elf_class)
+            if system_relationship is not None:
+                if system_relationship not in system:
+                    system.append(system_relationship)
+            else:
+                unresolved.append(soname)
+
+        return sorted(provides), graph, system, unresolved
@@ -0,0 +1,114 @@
+######################################################################
+# system_packaging/split.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Split a dependency's payload into runtime, development,
+# documentation and debug information components, each built as its
+# own package:
+#
+#   rpm_deployer  opt-toolchain-gmp, -devel, -doc, -debuginfo
+#   deb_deployer  opt+toolchain-gmp, -dev, -doc, -dbg
+#
+# Files are classified by glob rules on their path relative to the
+# install prefix (`*` matches across `/`), first match wins. A recipe
+# can put its own rules ahead of the defaults from `package_info()`:
+#
+#   self.conf_info.define('user.system_packaging:split_rules',
+#                         {'runtime': ['lib/gcc/*'],
+#                          'doc': ['share/examples/*'],
+#                         })
+#
+# `{'runtime': ['*']}` keeps a recipe in a single package. Everything
+# no rule claims is runtime, and the runtime package is always built:
+# it owns the licenses and the other components require it.
+#
+
+from .manifest import Manifest
+from conan.errors import ConanException
+import fnmatch
+
+COMPONENTS = ['runtime', 'devel', 'doc', 'debuginfo']
+
+# `(component, pattern, symlinks only)`, in match order
+DEFAULT_RULES = [('debuginfo', 'lib/debug/*', False),
+                 ('debuginfo', '*.debug', False),
+                 ('debuginfo', '*/.debug/*', False),
+                 ('devel', 'include/*', False),
+                 ('devel', 'lib*/*.a', False),
+                 ('devel', 'lib*/*.la', False),
+                 ('devel', 'lib*/pkgconfig/*', False),
+                 ('devel', 'lib*/cmake/*', False),
+                 ('devel', 'share/pkgconfig/*', False),
+                 ('devel', 'share/cmake/*', False),
+                 ('devel', 'share/aclocal/*', False),
+                 # The unversioned name of a shared library is only
+                 # needed to link against it
+                 ('devel', 'lib*/lib*.so', True),
+                 ('doc', 'share/doc/*', False),
+                 ('doc', 'share/man/*', False),
+                 ('doc', 'share/info/*', False),
+                 ('doc', 'share/gtk-doc/*', False),
+                ]
+
+PACKAGE_SUFFIXES = {'rpm': {'runtime': '', 'devel': '-devel', 'doc': '-doc', 'debuginfo': '-debuginfo'},
+                    'deb': {'runtime': '', 'devel': '-dev', 'doc': '-doc', 'debuginfo': '-dbg'},
+                   }
+
+SUMMARY_SUFFIXES = {'runtime': '',
+                    'devel': ' - development files',
+                    'doc': ' - documentation',
+                    'debuginfo': ' - debug information',
+                   }
+
+
+# Rules in match order for a recipe's `split_rules`, see above
+def make_rules(recipe_rules=None):
+    rules = []
+    for component, patterns in (recipe_rules or {}).items():
+        if component not in COMPONENTS:
+            raise ConanException(f'Unknown split_rules component "{ component }", must be one of { COMPONENTS }')
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        rules.extend((component, pattern, False) for pattern in patterns)
+    return rules + DEFAULT_RULES
+
+
+def classify(entry, rules):
+    for component, pattern, symlinks_only in rules:
+        if symlinks_only and not entry.is_symlink():
+            continue
+        if fnmatch.fnmatchcase(entry.path, pattern):
+            return component
+    return 'runtime'
+
+
+######################################################################
+# Split `payload_manifest` by `rules`. Returns `(component, manifest)`
+# pairs in `COMPONENTS` order, runtime always first, then only the
+# components that got any files.
+#
+def split_manifest(payload_manifest, rules):
+
+    entries = {component: [] for component in COMPONENTS}
+    for entry in payload_manifest:
+        entries[classify(entry, rules)].append(entry)
+
+    return [(component, Manifest(payload_manifest.src_root,
+                                 entries[component],
+                                 install_prefix=payload_manifest.install_prefix,
+                                ))
+            for component in COMPONENTS
+            if component == 'runtime' or entries[component]]
+
+
+# Metadata of a component package, the dependency's package metadata
+# with `name`, `namever` and `summary` suffixed
+def component_metadata(metadata, component, package_format):
+    name = f"{ metadata['name'] }{ PACKAGE_SUFFIXES[package_format][component] }"
+    return dict(metadata,
+                component=component,
+                name=name,
+                namever=f"{ name }-{ metadata['version'] }",
+                summary=f"{ metadata['summary'] }{ SUMMARY_SUFFIXES[component] }",
+               )
@@ -0,0 +1,130 @@
+######################################################################
+# system_packaging/state.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Persisted deployer state used for incremental deploys.
+#
+# For every dependency we record a "fingerprint" of everything that
+# ends up in its system package (Conan package reference and
+# revisions, the rendered package metadata and a hash of the packaging
+# templates) together with the package files that were produced from
+# it. On the next run a dependency whose fingerprint is unchanged and
+# whose package files still exist doesn't need to be rebuilt.
+#
+# The state file lives in the deployer output folder:
+#
+# <output_folder>
+#     ├── rpm_deployer-state.json
+#     └── ...
+#
+
+import glob
+import hashlib
+import json
+import os
+import threading
+
+STATE_VERSION = 1
+
+
+class DeployState:
+
+    def __init__(self, output_folder, deployer_name, incremental=False):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, f'{ deployer_name }-state.json')
+        self.incremental = incremental
+        self._lock = threading.Lock()
+        self._packages = {}
+
+        # A missing, unreadable or outdated state file just means
+        # everything gets rebuilt
+        try:
+            with open(self.path, 'r', encoding='utf-8') as state_file:
+                state = json.load(state_file)
+            if state.get('version') == STATE_VERSION:
+                self._packages = state['packages']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    # Return the absolute paths of the package files previously built
+    # for `key` if they can be reused as-is, otherwise `None`.
+    def reusable_artifacts(self, key, fingerprint):
+        if not self.incremental:
+            return None
+
+        with self._lock:
+            entry = self._packages.get(key)
+
+        # Compare the way it was persisted, tuples come back as lists
+        if entry is None or entry['fingerprint'] != json.loads(json.dumps(fingerprint)):
+            return None
+
+        artifacts = [os.path.join(self.output_folder, artifact) for artifact in entry['artifacts']]
+        if not artifacts or not all(os.path.isfile(artifact) for artifact in artifacts):
+            return None
+
+        return artifacts
+
+    # Record the package files built for `key` and persist the state
+    # immediately, so an interrupted deploy keeps what it finished.
+    def record(self, key, fingerprint, artifacts):
+        relative_artifacts = [os.path.relpath(artifact, self.output_folder) for artifact in artifacts]
+
+        with self._lock:
+            self._packages[key] = {'fingerprint': fingerprint,
+                                   'artifacts': sorted(relative_artifacts),
+                                  }
+            self._save()
+
+    def _save(self):
+        state = {'version': STATE_VERSION,
+                 'packages': self._packages,
+                }
+
+        tmp_path = f'{ self.path }.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+# Identify exactly which Conan package binary a dependency came from
+def package_reference(dependency_item):
+    pref = dependency_item.pref
+    return {'ref': str(pref.ref),
+            'recipe_revision': pref.ref.revision,
+            'package_id': pref.package_id,
+            'package_revision': pref.revision,
+           }
+
+
+# The modules deciding what goes into a package besides the deployer
+# and its templates, for `hash_files()`. Only the sources: byte code
+# caches change without the code changing.
+def module_files():
+    return sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py')))
+
+
+# sha256 over the content of the given files and directory trees,
+# including relative file names so renames are noticed too.
+def hash_files(*paths):
+    digest = hashlib.sha256()
+
+    for path in paths:
+        if os.path.isdir(path):
+            file_list = []
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                file_list.extend(os.path.join(root, name) for name in sorted(files))
+            base = path
+        else:
+            file_list = [path]
+            base = os.path.dirname(path)
+
+        for file_path in file_list:
+            digest.update(os.path.relpath(file_path, base).encode('utf-8') + b'\0')
+            with open(file_path, 'rb') as content:
+                for chunk in iter(lambda: content.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+    return digest.hexdigest()
@@ -0,0 +1,211 @@
+######################################################################
+# system_packaging/trace.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Timing spans around every deployer stage (copy, license relocation,
+# staging, tar, rpmbuild, dch, debuild, ...), recording wall and CPU
+# time, files and bytes processed and subprocess exit codes.
+#
+# Spans are written to the deployer output folder, either as JSON lines
+# or in Chrome trace-event format (load it in chrome://tracing or
+# https://ui.perfetto.dev), see `user.system_packaging:trace`:
+#
+# <output_folder>
+#     ├── rpm_deployer-trace.jsonl
+#     └── ...
+#
+# and summarized per stage at the end of the deploy.
+#
+
+from conan.errors import ConanException
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+
+TRACE_EXTENSIONS = {'jsonl': 'jsonl',
+                    'chrome': 'json',
+                   }
+
+
+class Span:
+
+    def __init__(self, name, package=None):
+        self.name = name
+        self.package = package
+        self.files = 0
+        self.bytes = 0
+        self.output_bytes = 0
+        self.returncode = None
+
+
+class Tracer:
+
+    # `trace_format` is `jsonl`, `chrome` or `None` for no trace file
+    def __init__(self, output_folder, deployer_name, trace_format='jsonl'):
+        self.trace_format = trace_format
+        self.path = None
+        if trace_format is not None:
+            self.path = os.path.join(output_folder,
+                                     f'{ deployer_name }-trace.{ TRACE_EXTENSIONS[trace_format] }')
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._records = []
+
+        if self.trace_format == 'jsonl':
+            open(self.path, 'w').close()
+
+    ######################################################################
+    # Time the enclosed stage, e.g.
+    #
+    #   with tracer.span('copy', package=str(dependency_item)) as span:
+    #       ...
+    #       span.files += 1
+    #
+    # CPU time is that of the calling thread, plus the CPU time of child
+    # processes that finished in the meantime. With concurrent jobs the
+    # latter includes other jobs' children too.
+    #
+    @contextlib.contextmanager
+    def span(self, name, package=None):
+        span = Span(name, package)
+        error = None
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        children_start = _children_cpu()
+        try:
+            yield span
+        except BaseException as exception:
+            error = type(exception).__name__
+            raise
+        finally:
+            record = {'name': name,
+                      'package': package,
+                      'start': wall_start - self._start,
+                      'wall': time.perf_counter() - wall_start,
+                      'cpu': time.thread_time() - cpu_start,
+                      'child_cpu': _children_cpu() - children_start,
+                      'files': span.files,
+                      'bytes': span.bytes,
+                      'output_bytes': span.output_bytes,
+                      'returncode': span.returncode,
+                      'error': error,
+                      'thread': threading.get_native_id(),
+                     }
+            self._add(record)
+
+    # `subprocess.run()` in a span recording the exit code and the size
+    # of `output_path` if the command produced it. A failing command
+    # fails the package, see `check_returncode()`.
+    def run(self, name, command, package=None, output_path=None, **kwargs):
+        with self.span(name, package=package) as span:
+            process = subprocess.run(command, **kwargs)
+            span.returncode = process.returncode
+            if output_path is not None and os.path.exists(output_path):
+                span.output_bytes = os.path.getsize(output_path)
+        check_returncode(name, process.returncode, package)
+        return process
+
+    # `function` as a callable that runs in a span of its own
+    def wrap(self, name, function, package=None):
+        def traced():
+            with self.span(name, package=package):
+                return function()
+        return traced
+
+    def _add(self, record):
+        with self._lock:
+            self._records.append(record)
+            if self.trace_format == 'jsonl':
+                with open(self.path, 'a') as trace_file:
+                    trace_file.write(json.dumps(record) + '\n')
+
+    # Write out a Chrome trace, JSON lines are written as spans finish
+    def close(self):
+        if self.trace_format != 'chrome':
+            return
+
+        pid = os.getpid()
+        with self._lock:
+            events = [{'name': record['name'],
+                       'cat': record['package'] or 'deploy',
+                       'ph': 'X',
+                       'ts': round(record['start'] * 1e6),
+                       'dur': round(record['wall'] * 1e6),
+                       'pid': pid,
+                       'tid': record['thread'],
+                       'args': {key: value for key, value in record.items()
+                                if key not in ('name', 'start', 'wall', 'thread')},
+                      } for record in self._records]
+
+        with open(self.path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+
+    # Write the trace file and log the per-stage summary
+    def finish(self, conanfile):
+        self.close()
+        conanfile.output.info('Deployer stage summary:')
+        for line in self.summary():
+            conanfile.output.info(line)
+        if self.path is not None:
+            conanfile.output.info(f'Deployer trace written to { self.path }')
+
+    ######################################################################
+    # Per-stage totals as table lines, stages in the order they first
+    # started.
+    #
+    def summary(self):
+        stages = {}
+        with self._lock:
+            records = sorted(self._records, key=lambda record: record['start'])
+
+        for record in records:
+            stage = stages.setdefault(record['name'], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'child_cpu': 0.0,
+                                                       'files': 0, 'bytes': 0, 'output_bytes': 0, 'failed': 0})
+            stage['count'] += 1
+            for key in ('wall', 'cpu', 'child_cpu', 'files', 'bytes', 'output_bytes'):
+                stage[key] += record[key]
+            if record['error'] or record['returncode']:
+                stage['failed'] += 1
+
+        lines = [f"{'stage':<20} {'count':>6} {'wall s':>9} {'cpu s':>9} {'child s':>9}"
+                 f" {'files':>8} {'in MiB':>9} {'out MiB':>9} {'failed':>6}"]
+        for name, stage in stages.items():
+            lines.append(f"{ name:<20} { stage['count']:>6} { stage['wall']:>9.3f} { stage['cpu']:>9.3f}"
+                         f" { stage['child_cpu']:>9.3f} { stage['files']:>8}"
+                         f" { stage['bytes'] / 2**20:>9.1f} { stage['output_bytes'] / 2**20:>9.1f}"
+                         f" { stage['failed']:>6}")
+        return lines
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Packaging tools run concurrently, so a failing one has to fail its
+# package rather than leave a partial package set behind
+def check_returncode(name, returncode, package=None):
+    if returncode != 0:
+        raise ConanException(f'{ name } failed with exit code { returncode }'
+                             + (f' packaging { package }' if package else ''))
+
+
+# Pass payload manifest entries through, counting them into `span`
+def counted(members, span):
+    for entry in members:
+        span.files += 1
+        span.bytes += entry.size
+        yield entry
+
+
+# Count already written files into `span`
+def count_files(span, paths):
+    for path in paths:
+        span.files += 1
+        span.bytes += os.lstat(path).st_size
@@ -0,0 +1,122 @@
+######################################################################
+# tests/conftest.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# The deployers import `system_packaging` from their own folder, the
+# way Conan loads them from ~/.conan2/extensions/deployers, so the
+# tests do the same.
+#
+
+from types import SimpleNamespace
+import os
+import pytest
+import struct
+import sys
+
+DEPLOYERS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'extensions', 'deployers'))
+if DEPLOYERS_DIR not in sys.path:
+    sys.path.insert(0, DEPLOYERS_DIR)
+
+from system_packaging import elf
+
+
+# Write `files`, `{relative path: bytes, or str for a symlink target}`,
+# under `root`. Returns `root`.
+def write_tree(root, files):
+    for rel_path, content in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(content, str):
+            os.symlink(content, path)
+        else:
+            with open(path, 'wb') as tree_file:
+                tree_file.write(content)
+    return root
+
+
+@pytest.fixture
+def tree(tmp_path):
+    return lambda files, name='package': write_tree(str(tmp_path / name), files)
+
+
+# Just enough of a Conan consumer conanfile for the deployers' helpers:
+# `user.system_packaging:<name>` settings from `conf` and the output
+# messages, kept by level
+class Conf:
+
+    def __init__(self, values):
+        self._values = {f'user.system_packaging:{ name }': value for name, value in values.items()}
+
+    def get(self, name, default=None, check_type=None):
+        return self._values.get(name, default)
+
+
+class Output:
+
+    def __init__(self):
+        self.messages = {'info': [], 'warning': []}
+
+    def info(self, message):
+        self.messages['info'].append(message)
+
+    def warning(self, message):
+        self.messages['warning'].append(message)
+
+
+@pytest.fixture
+def conanfile():
+    return lambda **conf: SimpleNamespace(conf=Conf(conf), output=Output())
+
+
+######################################################################
+# A minimal ELF image: header, one PT_LOAD segment mapping the whole
+# file, and for `soname` or `needed` a PT_DYNAMIC segment with its
+# string table
+#
+def elf_image(machine=elf.EM_X86_64, elf_class=64, little_endian=True, flags=0, e_type=elf.ET_DYN,
+              soname=None, needed=()):
+
+    endian = '<' if little_endian else '>'
+    header_format, phdr_format, dyn_format = (endian + 'HHIQQQIHHH', endian + 'IIQQQQQQ', endian + 'qQ') \
+                                             if elf_class == 64 else \
+                                             (endian + 'HHIIIIIHHH', endian + 'IIIIIIII', endian + 'iI')
+    base = 0x400000
+    ehdr_size = 64 if elf_class == 64 else 52
+    phentsize = struct.calcsize(phdr_format)
+    strtab_offset = ehdr_size + 2 * phentsize
+
+    strtab = b'\0'
+    dynamic = []
+    for d_tag, name in [(elf.DT_NEEDED, name) for name in needed] + ([(elf.DT_SONAME, soname)] if soname else []):
+        dynamic.append((d_tag, len(strtab)))
+        strtab += name.encode('utf-8') + b'\0'
+    dynamic += [(elf.DT_STRTAB, base + strtab_offset), (elf.DT_STRSZ, len(strtab)), (elf.DT_NULL, 0)]
+
+    dyn_offset = strtab_offset + len(strtab)
+    dyn_offset += -dyn_offset % 8
+    dyn = b''.join(struct.pack(dyn_format, d_tag, d_val) for d_tag, d_val in dynamic)
+    size = dyn_offset + len(dyn)
+
+    def phdr(p_type, p_offset, p_filesz):
+        if elf_class == 64:
+            return struct.pack(phdr_format, p_type, 5, p_offset, base + p_offset, base + p_offset,
+                               p_filesz, p_filesz, 8)
+        return struct.pack(phdr_format, p_type, p_offset, base + p_offset, base + p_offset, p_filesz, p_filesz,
+                           5, 8)
+
+    image = bytearray(size)
+    image[:16] = elf.ELF_MAGIC + bytes([2 if elf_class == 64 else 1, 1 if little_endian else 2, 1]) + bytes(9)
+    struct.pack_into(header_format, image, 16, e_type, machine, 1, 0, ehdr_size, 0, flags, ehdr_size, phentsize,
+                     2 if soname or needed else 1)
+    image[ehdr_size:ehdr_size + phentsize] = phdr(elf.PT_LOAD, 0, size)
+    if soname or needed:
+        image[ehdr_size + phentsize:strtab_offset] = phdr(elf.PT_DYNAMIC, dyn_offset, len(dyn))
+    image[strtab_offset:strtab_offset + len(strtab)] = strtab
+    image[dyn_offset:] = dyn
+    return bytes(image)
+
+
+@pytest.fixture
+def make_elf():
+    return elf_image
@@ -0,0 +1,101 @@
+######################################################################
+# tests/test_compression.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from conan.errors import ConanException
+from system_packaging import compression
+import gzip
+import io
+import pytest
+import shutil
+import tarfile
+
+
+def which(*installed):
+    return lambda name: f'/usr/bin/{ name }' if name in installed else None
+
+
+def test_make_compression_defaults():
+    assert compression.make_compression('zstd') == ('zstd', 3, 0)
+    assert compression.make_compression('gzip', level=9, threads=4) == ('gzip', 9, 4)
+
+
+def test_make_compression_rejects_unknown_methods():
+    with pytest.raises(ConanException, match='bzip2'):
+        compression.make_compression('bzip2')
+
+
+def test_compressor_command_pigz_threads(monkeypatch):
+    monkeypatch.setattr(shutil, 'which', which('pigz'))
+    assert compression.compressor_command(compression.make_compression('gzip', threads=4)) \
+        == ['pigz', '-6', '-n', '-p', '4', '-c']
+    assert compression.compressor_command(compression.make_compression('gzip')) == ['pigz', '-6', '-n', '-c']
+
+
+def test_compressor_command_gzip_without_pigz(monkeypatch):
+    monkeypatch.setattr(shutil, 'which', which())
+    assert compression.compressor_command(compression.make_compression('gzip', threads=4)) \
+        == ['gzip', '-6', '-n', '-c']
+
+
+def test_compressor_command_threaded():
+    assert compression.compressor_command(compression.make_compression('zstd', threads=2)) \
+        == ['zstd', '-q', '-3', '-T2', '-c']
+    assert compression.compressor_command(compression.make_compression('xz', level=9)) \
+        == ['xz', '-9', '-T0', '-c']
+    assert compression.compressor_command(compression.make_compression('none')) is None
+
+
+def test_tar_arguments(monkeypatch):
+    monkeypatch.setattr(shutil, 'which', which('pigz'))
+    assert compression.tar_arguments(compression.make_compression('gzip', level=1, threads=2)) \
+        == ['--use-compress-program', 'pigz -1 -n -p 2']
+    assert compression.tar_arguments(compression.make_compression('none')) == []
+
+
+@pytest.mark.parametrize('method', ['gzip', 'none'])
+def test_open_compressed_round_trip(tmp_path, method):
+    tarball_path = str(tmp_path / f'payload.{ compression.TAR_EXTENSIONS[method] }')
+    with compression.open_compressed(tarball_path, compression.make_compression(method)) as stream, \
+         tarfile.open(fileobj=stream, mode='w|') as tarball:
+        tarinfo = tarfile.TarInfo('payload/file')
+        tarinfo.size = 5
+        tarball.addfile(tarinfo, io.BytesIO(b'hello'))
+
+    with open(tarball_path, 'rb') as tarball_file:
+        data = tarball_file.read()
+    if method == 'gzip':
+        data = gzip.decompress(data)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tarball:
+        assert tarball.extractfile('payload/file').read() == b'hello'
+
+
+def test_open_compressed_reports_compressor_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, 'compressor_command', lambda method: ['sh', '-c', 'exit 3'])
+    with pytest.raises(ConanException, match='exited with 3'):
+        with compression.open_compressed(str(tmp_path / 'payload.tar.gz'), compression.make_compression('gzip')):
+            pass
+
+
+def test_rpm_binary_payload():
+    assert compression.rpm_binary_payload(compression.make_compression('gzip', level=9)) == 'w9.gzdio'
+    assert compression.rpm_binary_payload(compression.make_compression('zstd', level=19, threads=8)) \
+        == 'w19T8.zstdio'
+    assert compression.rpm_binary_payload(compression.make_compression('none')) == 'w0.ufdio'
+
+
+def test_dpkg_deb_arguments():
+    assert compression.dpkg_deb_arguments(compression.make_compression('xz', threads=4)) \
+        == ['-Zxz', '-z6', '--threads-max=4']
+    assert compression.dpkg_deb_arguments(compression.make_compression('none')) == ['-Znone']
+
+
+@pytest.mark.skipif(shutil.which('pigz') is None, reason='pigz is not installed')
+def test_pigz_accepts_thread_count(tmp_path):
+    tarball_path = str(tmp_path / 'payload.gz')
+    with compression.open_compressed(tarball_path, compression.make_compression('gzip', threads=2)) as stream:
+        stream.write(b'hello')
+    with open(tarball_path, 'rb') as tarball_file:
+        assert gzip.decompress(tarball_file.read()) == b'hello'
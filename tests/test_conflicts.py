@@ -0,0 +1,122 @@
+######################################################################
+# tests/test_conflicts.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from conan.errors import ConanException
+from system_packaging import config, conflicts, manifest
+from types import SimpleNamespace
+import pytest
+
+
+class Dependency:
+
+    def __init__(self, name):
+        self.ref = SimpleNamespace(name=name)
+
+    def __str__(self):
+        return f'{ self.ref.name }/1.0'
+
+
+@pytest.fixture
+def graph(tree, conanfile):
+    payloads = {'gmp': {'include/gmp.h': b'gmp',
+                        'share/info/dir': b'gmp',
+                        'share/doc/README': b'same',
+                       },
+                'mpfr': {'include/mpfr.h': b'mpfr',
+                         'share/info/dir': b'mpfr',
+                         'share/doc/README': b'same',
+                        },
+                'mpc': {'include/mpc.h': b'mpc',
+                        'share/doc/README': b'other',
+                       },
+               }
+    dependency_items = [Dependency(name) for name in payloads]
+    manifests = [manifest.scan_payload(tree(files, name), '', name, install_prefix='opt/toolchain')
+                 for name, files in payloads.items()]
+    return conanfile(), dependency_items, manifests
+
+
+def test_find_conflicts(graph):
+    conanfile, dependency_items, manifests = graph
+
+    found = conflicts.find_conflicts(manifests, ignored_paths=['share/info/dir'])
+
+    assert list(found) == ['/opt/toolchain/share/doc/README']
+    assert [index for index, entry in found['/opt/toolchain/share/doc/README']] == [0, 1, 2]
+
+
+def test_error_lists_every_conflict(graph):
+    conanfile, dependency_items, manifests = graph
+
+    with pytest.raises(ConanException) as error:
+        conflicts.resolve_conflicts(conanfile, dependency_items, manifests, policy='error')
+
+    assert '2 file(s) are shipped by more than one package' in str(error.value)
+    assert '/opt/toolchain/share/doc/README: gmp/1.0, mpfr/1.0, mpc/1.0' in str(error.value)
+    assert '/opt/toolchain/share/info/dir: gmp/1.0, mpfr/1.0' in str(error.value)
+
+
+def test_warn_is_the_default(graph):
+    conanfile, dependency_items, manifests = graph
+
+    policy = config.get_conflict_policy(conanfile)
+
+    assert conflicts.resolve_conflicts(conanfile, dependency_items, manifests, policy=policy) is manifests
+    assert conanfile.output.messages['warning'][0].endswith('user.system_packaging:conflicts=warn')
+
+
+def test_unknown_policy(conanfile):
+    with pytest.raises(ConanException, match='must be one of'):
+        config.get_conflict_policy(conanfile(conflicts='last'))
+
+
+def test_identical_copies_are_reported(graph):
+    conanfile, dependency_items, manifests = graph
+
+    conflicts.resolve_conflicts(conanfile, dependency_items, manifests[:2], policy='warn')
+
+    assert '\t/opt/toolchain/share/doc/README (identical): gmp/1.0, mpfr/1.0' in conanfile.output.messages['warning']
+
+
+def test_owner(graph):
+    conanfile, dependency_items, manifests = graph
+
+    resolved = conflicts.resolve_conflicts(conanfile, dependency_items, manifests, policy='owner')
+
+    assert resolved[0].paths() == manifests[0].paths()
+    assert resolved[1].paths() == ['include/mpfr.h']
+    assert resolved[2].paths() == ['include/mpc.h']
+    assert resolved[2].resolution()['excluded'] == ['share/doc/README']
+
+
+def test_exclude(graph):
+    conanfile, dependency_items, manifests = graph
+
+    resolved = conflicts.resolve_conflicts(conanfile, dependency_items, manifests, policy='exclude')
+
+    assert [payload_manifest.paths() for payload_manifest in resolved] \
+        == [['include/gmp.h'], ['include/mpfr.h'], ['include/mpc.h']]
+
+
+def test_relocate(graph):
+    conanfile, dependency_items, manifests = graph
+
+    resolved = conflicts.resolve_conflicts(conanfile, dependency_items, manifests, policy='relocate')
+
+    assert resolved[0].paths() == ['include/gmp.h', 'share/doc/gmp/README', 'share/info/gmp/dir']
+    assert resolved[2].paths() == ['include/mpc.h', 'share/doc/mpc/README']
+    assert conflicts.find_conflicts(resolved) == {}
+
+
+def test_relocate_refuses_to_overwrite(tree, conanfile):
+    dependency_items = [Dependency('gmp'), Dependency('mpfr')]
+    manifests = [manifest.scan_payload(tree({'share/doc/README': b'', 'share/doc/gmp/README': b''}, 'gmp'),
+                                       '', 'gmp'),
+                 manifest.scan_payload(tree({'share/doc/README': b''}, 'mpfr'), '', 'mpfr'),
+                ]
+
+    with pytest.raises(ConanException, match='share/doc/gmp/README is in its payload already'):
+        conflicts.resolve_conflicts(conanfile(), dependency_items, manifests, policy='relocate')
@@ -0,0 +1,100 @@
+######################################################################
+# tests/test_debwriter.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from system_packaging import compression, debwriter, manifest
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+
+EPOCH = 1700000000
+
+CONTROL_FIELDS = {'Package': 'opt+toolchain-tool',
+                  'Version': '1.0-1',
+                  'Architecture': 'all',
+                  'Maintainer': 'conan',
+                  'Description': 'A tool\nDoes things.\n\nAnd more.',
+                 }
+
+
+# `[(name, content)]` of an ar archive
+def read_ar(path):
+    with open(path, 'rb') as ar_file:
+        assert ar_file.read(8) == b'!<arch>\n'
+        members = []
+        while True:
+            header = ar_file.read(60)
+            if len(header) < 60:
+                return members
+            size = int(header[48:58])
+            members.append((header[:16].decode('ascii').strip(), ar_file.read(size)))
+            ar_file.read(size % 2)
+
+
+def payload_members(tree):
+    package_folder = tree({'bin/tool': b'\x00tool\n' * 100,
+                           'bin/alias': 'tool',
+                           'share/doc/tool/README': b'read me\n',
+                          })
+    os.link(os.path.join(package_folder, 'bin', 'tool'), os.path.join(package_folder, 'bin', 'tool-1.0'))
+    return list(manifest.scan_payload(package_folder, '', 'tool'))
+
+
+def write_deb(tmp_path, members, name='tool.deb', **kwargs):
+    return debwriter.write_deb(str(tmp_path / name), CONTROL_FIELDS, members, 'opt/toolchain', **kwargs)
+
+
+def test_format_control_folds_multi_line_values():
+    assert debwriter.format_control({'Package': 'tool', 'Description': 'A tool\nDoes things.\n\nAnd more.'}) \
+        == 'Package: tool\nDescription: A tool\n Does things.\n .\n And more.\n'
+
+
+def test_write_deb_layout(tmp_path, tree):
+    members = read_ar(write_deb(tmp_path, payload_members(tree), source_date_epoch=EPOCH))
+
+    assert [name for name, content in members] == ['debian-binary', 'control.tar.gz', 'data.tar.gz']
+    assert members[0][1] == b'2.0\n'
+
+    with tarfile.open(fileobj=io.BytesIO(gzip.decompress(members[1][1]))) as control_tar:
+        control = control_tar.extractfile('./control').read().decode('utf-8')
+        md5sums = control_tar.extractfile('./md5sums').read().decode('utf-8')
+    assert control.startswith('Package: opt+toolchain-tool\n')
+    assert 'Installed-Size: ' in control
+
+    with tarfile.open(fileobj=io.BytesIO(gzip.decompress(members[2][1]))) as data_tar:
+        data_members = {tarinfo.name: tarinfo for tarinfo in data_tar}
+        tool_content = data_tar.extractfile('./opt/toolchain/bin/tool').read()
+
+    assert data_members['./opt/toolchain/bin/alias'].issym()
+    assert data_members['./opt/toolchain/bin/tool'].isreg()
+    assert data_members['./opt/toolchain/bin/tool-1.0'].islnk()
+    assert data_members['./opt/toolchain/bin/tool-1.0'].linkname == './opt/toolchain/bin/tool'
+    assert data_members['./opt/toolchain'].isdir()
+    assert all(tarinfo.uid == 0 and tarinfo.uname == 'root' for tarinfo in data_members.values())
+    assert all(tarinfo.mtime == EPOCH for tarinfo in data_members.values())
+
+    # Hardlinks repeat their target's checksum, symlinks have none
+    tool_md5 = hashlib.md5(tool_content).hexdigest()
+    readme_md5 = hashlib.md5(b'read me\n').hexdigest()
+    assert md5sums.splitlines() == [f'{ tool_md5 }  opt/toolchain/bin/tool',
+                                    f'{ tool_md5 }  opt/toolchain/bin/tool-1.0',
+                                    f'{ readme_md5 }  opt/toolchain/share/doc/tool/README',
+                                   ]
+
+
+def test_write_deb_is_reproducible(tmp_path, tree):
+    members = payload_members(tree)
+    first = write_deb(tmp_path, members, 'first.deb', source_date_epoch=EPOCH)
+    second = write_deb(tmp_path, list(reversed(members)), 'second.deb', source_date_epoch=EPOCH)
+    with open(first, 'rb') as first_deb, open(second, 'rb') as second_deb:
+        assert first_deb.read() == second_deb.read()
+
+
+def test_write_deb_data_compression(tmp_path, tree):
+    members = read_ar(write_deb(tmp_path, payload_members(tree),
+                                data_compression=compression.make_compression('none')))
+    assert [name for name, content in members] == ['debian-binary', 'control.tar.gz', 'data.tar']
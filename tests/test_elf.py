@@ -0,0 +1,101 @@
+######################################################################
+# tests/test_elf.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from system_packaging import elf, manifest
+import os
+import pytest
+import sys
+
+
+@pytest.mark.parametrize('elf_class, little_endian', [(64, True), (32, True), (64, False), (32, False)])
+def test_read_elf_dynamic_section(make_elf, elf_class, little_endian):
+    elf_file = elf.read_elf(make_elf(elf_class=elf_class, little_endian=little_endian,
+                                     soname='libgmp.so.10', needed=['libc.so.6', 'libm.so.6']))
+
+    assert elf_file.elf_class == elf_class
+    assert elf_file.little_endian == little_endian
+    assert elf_file.type == elf.ET_DYN
+    assert elf_file.soname == 'libgmp.so.10'
+    assert elf_file.needed == ['libc.so.6', 'libm.so.6']
+
+
+def test_read_elf_without_dynamic_section(make_elf):
+    elf_file = elf.read_elf(make_elf(e_type=elf.ET_EXEC))
+
+    assert (elf_file.type, elf_file.soname, elf_file.needed) == (elf.ET_EXEC, None, [])
+
+
+def test_read_elf_rejects_other_data(make_elf):
+    assert elf.read_elf(b'#!/bin/sh\n' + bytes(100)) is None
+    assert elf.read_elf(make_elf()[:40]) is None
+
+
+# Truncated or inconsistent dynamic sections leave soname and needed
+# empty instead of failing
+def test_read_elf_truncated_dynamic_section(make_elf):
+    image = make_elf(soname='libgmp.so.10', needed=['libc.so.6'])
+
+    elf_file = elf.read_elf(image[:len(image) - 40])
+
+    assert elf_file.machine == elf.EM_X86_64
+    assert elf_file.soname is None and elf_file.needed == []
+
+
+@pytest.mark.parametrize('machine, elf_class, little_endian, flags, architecture',
+                         [(elf.EM_X86_64, 64, True, 0, ('x86_64', 'amd64')),
+                          (elf.EM_386, 32, True, 0, ('i686', 'i386')),
+                          (elf.EM_AARCH64, 64, True, 0, ('aarch64', 'arm64')),
+                          (elf.EM_ARM, 32, True, elf.EF_ARM_ABI_FLOAT_HARD, ('armv7hl', 'armhf')),
+                          (elf.EM_ARM, 32, True, 0, ('armv7l', 'armel')),
+                          (elf.EM_PPC64, 64, True, 0, ('ppc64le', 'ppc64el')),
+                          (elf.EM_PPC64, 64, False, 0, ('ppc64', 'ppc64')),
+                          (elf.EM_S390, 64, False, 0, ('s390x', 's390x')),
+                          (elf.EM_RISCV, 64, True, 0, ('riscv64', 'riscv64')),
+                          # x32 is no architecture of its own
+                          (elf.EM_X86_64, 32, True, 0, None),
+                         ])
+def test_architecture(make_elf, machine, elf_class, little_endian, flags, architecture):
+    elf_file = elf.read_elf(make_elf(machine=machine, elf_class=elf_class, little_endian=little_endian,
+                                     flags=flags))
+    assert elf.architecture(elf_file) == architecture
+
+
+# Static libraries are judged by their first ELF member
+def test_read_file(tmp_path, make_elf):
+    gmp_o = make_elf(machine=elf.EM_AARCH64, e_type=elf.ET_REL)
+    (tmp_path / 'libgmp.so.10').write_bytes(make_elf(soname='libgmp.so.10'))
+    (tmp_path / 'libgmp.a').write_bytes(b'!<arch>\n'
+                                        + b'/               0           0     0     644     5         `\n'
+                                        + b'index\n'
+                                        + f'gmp.o/          0           0     0     644     { len(gmp_o):<10}`\n'
+                                          .encode('ascii')
+                                        + gmp_o)
+    (tmp_path / 'gmp.sh').write_bytes(b'#!/bin/sh\n')
+
+    assert elf.read_file(str(tmp_path / 'libgmp.so.10')).soname == 'libgmp.so.10'
+    assert elf.read_file(str(tmp_path / 'libgmp.a')).machine == elf.EM_AARCH64
+    assert elf.read_file(str(tmp_path / 'gmp.sh')) is None
+    assert elf.read_file(str(tmp_path / 'missing')) is None
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='the interpreter is an ELF binary on Linux')
+def test_host_architecture():
+    assert elf.host_architecture('rpm') is not None
+    assert elf.host_architecture('deb') is not None
+
+
+def test_scan_manifest(tree, make_elf):
+    package_folder = tree({'lib/libgmp.so.10': make_elf(soname='libgmp.so.10'),
+                           'lib/libgmp.so': 'libgmp.so.10',
+                           'bin/gmp-config': b'#!/bin/sh\n' + bytes(100),
+                           'share/tiny': b'\x7fELF',
+                          })
+    os.link(os.path.join(package_folder, 'lib', 'libgmp.so.10'), os.path.join(package_folder, 'lib', 'libgmp.so.10.5'))
+
+    elf_files = elf.scan_manifest(manifest.scan_payload(package_folder, '', 'gmp'))
+
+    assert sorted(elf_files) == ['lib/libgmp.so.10', 'lib/libgmp.so.10.5']
+    assert elf_files['lib/libgmp.so.10.5'] is elf_files['lib/libgmp.so.10']
@@ -0,0 +1,160 @@
+######################################################################
+# tests/test_manifest.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from system_packaging import manifest, split, trace
+import json
+import os
+import pytest
+
+
+def test_scan_payload_selection(tree):
+    package_folder = tree({'conaninfo.txt': b'',
+                           'conanmanifest.txt': b'',
+                           'bin/tool': b'tool',
+                           'bin/alias': 'tool',
+                           'conanrun.sh': b'',
+                           'lib/libz.so.1': b'lib',
+                           'licenses/LICENSE': b'license',
+                          })
+    os.symlink('lib', os.path.join(package_folder, 'lib64'))
+
+    payload_manifest = manifest.scan_payload(package_folder, '', 'zlib', install_prefix='opt/toolchain')
+
+    # Sorted like a depth first walk, Conan files left out, symlinked
+    # folders kept as symlinks
+    assert [entry.src_rel_path for entry in payload_manifest] == ['bin/alias',
+                                                                   'bin/tool',
+                                                                   'lib/libz.so.1',
+                                                                   'lib64',
+                                                                   'licenses/LICENSE',
+                                                                  ]
+    entries = {entry.src_rel_path: entry for entry in payload_manifest}
+    assert entries['bin/alias'].is_symlink() and entries['bin/alias'].link_target == 'tool'
+    assert entries['lib64'].is_symlink()
+    assert entries['bin/tool'].is_file() and entries['bin/tool'].size == 4
+    assert entries['bin/tool'].src_path == os.path.join(package_folder, 'bin', 'tool')
+
+    # License files move to licenses/<package name>/
+    assert [(entry.src_rel_path, entry.path) for entry in payload_manifest.relocated()] \
+        == [('licenses/LICENSE', 'licenses/zlib/LICENSE')]
+    assert payload_manifest.installed_path(entries['bin/tool']) == '/opt/toolchain/bin/tool'
+
+
+def test_scan_payload_subdir(tree):
+    package_folder = tree({'conaninfo.txt': b'',
+                           'opt/gcc/bin/gcc': b'gcc',
+                           'other/file': b'',
+                          })
+
+    payload_manifest = manifest.scan_payload(package_folder, 'opt/gcc', 'gcc')
+
+    assert payload_manifest.src_root == os.path.join(package_folder, 'opt/gcc')
+    assert payload_manifest.paths() == ['bin/gcc']
+
+
+def test_scan_payload_missing_folder(tmp_path):
+    package_folder = str(tmp_path / 'package')
+    os.makedirs(package_folder)
+
+    assert len(manifest.scan_payload(package_folder, 'opt/gcc', 'gcc')) == 0
+    assert len(manifest.scan_payload(str(tmp_path / 'missing'), '', 'gcc')) == 0
+
+
+def test_stored_size_counts_hardlinks_once(tree):
+    package_folder = tree({'bin/gcc': b'x' * 100,
+                           'bin/cc': 'gcc',
+                           'share/doc': b'y' * 10,
+                          })
+    os.link(os.path.join(package_folder, 'bin', 'gcc'), os.path.join(package_folder, 'bin', 'x86_64-gcc'))
+
+    payload_manifest = manifest.scan_payload(package_folder, '', 'gcc')
+
+    assert payload_manifest.total_size() == 200 + 10 + len('gcc')
+    assert payload_manifest.stored_size() == 100 + 10 + len('gcc')
+
+
+def test_resolved(tree):
+    package_folder = tree({'bin/tool': b'tool',
+                           'share/info/dir': b'',
+                           'share/man/tool.1': b'',
+                          })
+    payload_manifest = manifest.scan_payload(package_folder, '', 'tool')
+
+    resolved = payload_manifest.resolved(exclude=['share/info/dir'],
+                                         relocate={'share/man/tool.1': 'share/man/tool/tool.1'})
+
+    assert resolved.paths() == ['bin/tool', 'share/man/tool/tool.1']
+    assert resolved.resolution() == {'excluded': ['share/info/dir'],
+                                     'relocated': [['share/man/tool.1', 'share/man/tool/tool.1']],
+                                    }
+    # The original is left alone
+    assert payload_manifest.resolution() == {'excluded': [], 'relocated': []}
+
+
+@pytest.fixture
+def duplicates(tree):
+    package_folder = tree({'bin/gcc': b'x' * 100,
+                           'bin/x86_64-gcc': b'x' * 100,
+                           'share/gcc/gcc': b'x' * 100,
+                           'share/doc/NEWS': b'y' * 100,
+                           'share/doc/empty': b'',
+                           'share/doc/empty2': b'',
+                          })
+    os.chmod(os.path.join(package_folder, 'bin', 'gcc'), 0o755)
+    os.chmod(os.path.join(package_folder, 'bin', 'x86_64-gcc'), 0o755)
+    os.chmod(os.path.join(package_folder, 'share', 'gcc', 'gcc'), 0o644)
+    return manifest.scan_payload(package_folder, '', 'gcc')
+
+
+def dedupe_spans(tmp_path):
+    with open(tmp_path / 'test-trace.jsonl') as trace_file:
+        return [record for record in map(json.loads, trace_file) if record['name'] == 'dedupe']
+
+
+# Identical files of the same mode become hardlinks of the first one,
+# once per manifest
+def test_deduplicate(tmp_path, duplicates):
+    tracer = trace.Tracer(str(tmp_path), 'test')
+
+    deduplicated = manifest.deduplicate(duplicates, tracer, package='gcc/13.2')
+
+    assert deduplicated.linked == {'bin/x86_64-gcc': 'bin/gcc'}
+    entries = {entry.path: entry for entry in deduplicated}
+    assert (entries['bin/x86_64-gcc'].device, entries['bin/x86_64-gcc'].inode) \
+        == (entries['bin/gcc'].device, entries['bin/gcc'].inode)
+    assert entries['bin/gcc'].nlink == 2
+    assert entries['share/gcc/gcc'].inode != entries['bin/gcc'].inode
+    assert entries['share/doc/empty'].inode != entries['share/doc/empty2'].inode
+    assert deduplicated.stored_size() == duplicates.stored_size() - 100
+
+    assert manifest.deduplicate(duplicates, tracer, package='gcc/13.2') is deduplicated
+    assert [(record['package'], record['files']) for record in dedupe_spans(tmp_path)] == [('gcc/13.2', 1)]
+
+
+def test_deduplicate_nothing_to_link(tmp_path, tree):
+    payload_manifest = manifest.scan_payload(tree({'bin/gcc': b'x', 'bin/cc': 'gcc'}), '', 'gcc')
+
+    assert manifest.deduplicate(payload_manifest, trace.Tracer(str(tmp_path), 'test', trace_format=None)) \
+        is payload_manifest
+
+
+# Components only link to files they ship themselves
+def test_deduplicate_components(tmp_path, duplicates):
+    tracer = trace.Tracer(str(tmp_path), 'test', trace_format=None)
+    components = [(split.component_metadata({'name': 'gcc', 'version': '13.2', 'summary': 'GCC'}, component, 'rpm'),
+                   component_manifest)
+                  for component, component_manifest in split.split_manifest(duplicates,
+                                                                            split.make_rules({'doc': 'bin/x86_64-*'}))]
+
+    deduplicated, linked_components = manifest.deduplicate_components(duplicates, components, tracer)
+
+    assert deduplicated.linked == {'bin/x86_64-gcc': 'bin/gcc'}
+    assert [(component_metadata['component'], component_manifest.linked)
+            for component_metadata, component_manifest in linked_components] \
+        == [('runtime', {}), ('doc', {'bin/x86_64-gcc': 'bin/gcc'})]
+    runtime_manifest = linked_components[0][1]
+    assert runtime_manifest.paths() == components[0][1].paths()
+    assert [entry.nlink for entry in runtime_manifest if entry.path == 'bin/gcc'] == [2]
@@ -0,0 +1,64 @@
+######################################################################
+# tests/test_multi_deployer.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+# Deploys a synthetic graph (see `benchmarks/fake_graph.py`) with the
+# benchmark's stub packaging tools first on PATH.
+#
+
+import glob
+import json
+import os
+import pytest
+import shutil
+import sys
+
+BENCHMARK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'benchmarks'))
+if BENCHMARK_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARK_DIR)
+
+fake_graph = pytest.importorskip('fake_graph')
+import multi_deployer
+
+
+def artifacts(output_folder):
+    deployed = {}
+    for state_path in sorted(glob.glob(os.path.join(output_folder, '*-state.json'))):
+        with open(state_path) as state_file:
+            packages = json.load(state_file)['packages']
+        deployed[os.path.basename(state_path)] = [artifact for package in packages.values()
+                                                  for artifact in package['artifacts']]
+    return deployed
+
+
+# RPMs and .debs an earlier deploy built for another architecture are
+# neither kept nor recorded by the next one
+def test_stale_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', os.pathsep.join([os.path.join(BENCHMARK_DIR, 'stubs'), os.environ['PATH']]))
+    conf = fake_graph.FakeConf({'user.system_packaging:split': True})
+    graph = fake_graph.make_graph(str(tmp_path / 'cache'), conf, chains=1, depth=2, files=8, file_size=1000)
+    output_folder = str(tmp_path / 'out')
+    os.makedirs(output_folder)
+
+    multi_deployer.deploy(graph=graph, output_folder=output_folder)
+    built = artifacts(output_folder)
+    stale_paths = []
+    for artifact_path in glob.glob(os.path.join(output_folder, '**', '*.rpm'), recursive=True):
+        rpms_dir, rpm_name = os.path.split(artifact_path)
+        stale_paths.append(os.path.join(os.path.dirname(rpms_dir), 'aarch64',
+                                        rpm_name.rsplit('.', 2)[0] + '.aarch64.rpm'))
+    for artifact_path in glob.glob(os.path.join(output_folder, '*.deb')):
+        stale_paths.append(artifact_path.rsplit('_', 1)[0] + '_arm64.deb')
+    for stale_path in stale_paths:
+        os.makedirs(os.path.dirname(stale_path), exist_ok=True)
+        shutil.copy(__file__, stale_path)
+
+    multi_deployer.deploy(graph=graph, output_folder=output_folder)
+
+    assert sorted(built) == ['deb_deployer-state.json', 'rpm_deployer-state.json']
+    assert all(built.values())
+    assert artifacts(output_folder) == built
+    for deployed in built.values():
+        assert len(set(deployed)) == len(deployed)
+    assert stale_paths and not any(os.path.exists(stale_path) for stale_path in stale_paths)
@@ -0,0 +1,43 @@
+######################################################################
+# tests/test_payload.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from system_packaging import manifest, payload
+import os
+import pytest
+
+
+def test_license_destination():
+    assert payload.license_destination('licenses/LICENSE', 'zlib') == 'licenses/zlib/LICENSE'
+    assert payload.license_destination('licenses/zlib/LICENSE', 'zlib') == 'licenses/zlib/LICENSE'
+    assert payload.license_destination('share/licenses/LICENSE', 'zlib') == 'share/licenses/LICENSE'
+
+
+@pytest.mark.parametrize('linking', [None, 'reflink', 'link'])
+def test_stage_payload(tree, tmp_path, linking):
+    package_folder = tree({'bin/gcc': b'gcc',
+                           'bin/cc': 'gcc',
+                           'licenses/COPYING': b'gpl',
+                          })
+    os.link(os.path.join(package_folder, 'bin', 'gcc'), os.path.join(package_folder, 'bin', 'x86_64-gcc'))
+    prefix_root = str(tmp_path / 'staged' / 'opt' / 'toolchain')
+
+    payload.stage_payload(manifest.scan_payload(package_folder, '', 'gcc'), prefix_root, linking=linking)
+
+    assert os.readlink(os.path.join(prefix_root, 'bin', 'cc')) == 'gcc'
+    assert os.path.samefile(os.path.join(prefix_root, 'bin', 'gcc'), os.path.join(prefix_root, 'bin', 'x86_64-gcc'))
+    with open(os.path.join(prefix_root, 'licenses', 'gcc', 'COPYING'), 'rb') as license_file:
+        assert license_file.read() == b'gpl'
+
+
+# Nothing to stage still leaves the tree tar packs up
+def test_empty_payload_tree(tmp_path):
+    empty_manifest = manifest.scan_payload(str(tmp_path / 'package'), 'opt/gcc', 'gcc')
+
+    payload.stage_payload(empty_manifest, str(tmp_path / 'staged' / 'opt' / 'gcc'))
+    payload.apply_manifest(str(tmp_path / 'copied' / 'opt' / 'gcc'), empty_manifest)
+
+    assert os.listdir(tmp_path / 'staged' / 'opt' / 'gcc') == []
+    assert os.listdir(tmp_path / 'copied' / 'opt' / 'gcc') == []
@@ -0,0 +1,176 @@
+######################################################################
+# tests/test_repository.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from conan.errors import ConanException
+from system_packaging import debwriter, manifest, repository
+import glob
+import gzip
+import hashlib
+import os
+import pytest
+import struct
+
+
+# An RPM header holding `tags`, `{tag: (data type, value)}`
+def rpm_header(tags):
+    index = b''
+    store = b''
+    for tag, (data_type, value) in tags.items():
+        if data_type == repository.RPM_INT32:
+            store += b'\0' * (-len(store) % 4)
+            data, count = struct.pack(f'>{ len(value) }I', *value), len(value)
+        elif data_type == repository.RPM_INT16:
+            store += b'\0' * (-len(store) % 2)
+            data, count = struct.pack(f'>{ len(value) }H', *value), len(value)
+        elif data_type == repository.RPM_STRING:
+            data, count = value.encode('utf-8') + b'\0', 1
+        else:
+            data, count = b''.join(item.encode('utf-8') + b'\0' for item in value), len(value)
+        index += struct.pack('>iIiI', tag, data_type, len(store), count)
+        store += data
+    return repository.RPM_HEADER_MAGIC + b'\0' * 4 + struct.pack('>II', len(tags), len(store)) + index + store
+
+
+# A payload-less RPM of `name` that requires libc and ships a tool
+# and its man page
+def write_rpm(path, name, version='1.0', release='1'):
+    tag = repository.RPMTAG
+    header = rpm_header({tag['name']: (repository.RPM_STRING, name),
+                         tag['version']: (repository.RPM_STRING, version),
+                         tag['release']: (repository.RPM_STRING, release),
+                         tag['summary']: (repository.RPM_I18NSTRING, [f'{ name } & co']),
+                         tag['arch']: (repository.RPM_STRING, 'x86_64'),
+                         tag['size']: (repository.RPM_INT32, [1234]),
+                         tag['requirename']: (repository.RPM_STRING_ARRAY, ['rpmlib(PayloadIsZstd)',
+                                                                            'libc.so.6()(64bit)',
+                                                                            'opt-toolchain-gmp']),
+                         tag['requireflags']: (repository.RPM_INT32, [8, 0, 12]),
+                         tag['requireversion']: (repository.RPM_STRING_ARRAY, ['5.4.18-1', '', '1:6.3.0-1']),
+                         tag['filemodes']: (repository.RPM_INT16, [0o40755, 0o100755, 0o100644]),
+                         tag['dirindexes']: (repository.RPM_INT32, [0, 1, 2]),
+                         tag['basenames']: (repository.RPM_STRING_ARRAY, ['bin', name, f'{ name }.1']),
+                         tag['dirnames']: (repository.RPM_STRING_ARRAY, ['/opt/toolchain/',
+                                                                         '/opt/toolchain/bin/',
+                                                                         '/opt/toolchain/share/man/man1/']),
+                        })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as rpm_file:
+        rpm_file.write(repository.RPM_LEAD_MAGIC + b'\0' * (repository.RPM_LEAD_SIZE - 4))
+        rpm_file.write(rpm_header({}))
+        rpm_file.write(header)
+    return path
+
+
+def read_primary(repo_root):
+    primary_path, = glob.glob(os.path.join(repo_root, 'repodata', '*-primary.xml.gz'))
+    with open(primary_path, 'rb') as primary_file:
+        primary_gz = primary_file.read()
+    return primary_gz, gzip.decompress(primary_gz).decode('utf-8')
+
+
+def test_split_evr():
+    assert repository._split_evr('1:6.3.0-1') == ('1', '6.3.0', '1')
+    assert repository._split_evr('6.3.0-1') == ('0', '6.3.0', '1')
+    assert repository._split_evr('6.3.0') == ('0', '6.3.0', None)
+
+
+def test_read_rpm_metadata(tmp_path):
+    rpm_metadata = repository.read_rpm_metadata(write_rpm(str(tmp_path / 'tool-1.0-1.x86_64.rpm'), 'tool'))
+
+    assert (rpm_metadata['name'], rpm_metadata['version'], rpm_metadata['release'], rpm_metadata['arch']) \
+        == ('tool', '1.0', '1', 'x86_64')
+    assert rpm_metadata['summary'] == 'tool & co'
+    assert rpm_metadata['installed_size'] == 1234
+    assert rpm_metadata['requires'] == [{'name': 'libc.so.6()(64bit)'},
+                                        {'name': 'opt-toolchain-gmp', 'flags': 'GE',
+                                         'epoch': '1', 'ver': '6.3.0', 'rel': '1'},
+                                       ]
+    assert rpm_metadata['files'] == [['/opt/toolchain/bin', 'dir'],
+                                     ['/opt/toolchain/bin/tool', None],
+                                     ['/opt/toolchain/share/man/man1/tool.1', None],
+                                    ]
+    with open(tmp_path / 'tool-1.0-1.x86_64.rpm', 'rb') as rpm_file:
+        assert rpm_metadata['checksum'] == hashlib.sha256(rpm_file.read()).hexdigest()
+
+
+def test_read_rpm_metadata_rejects_other_files(tmp_path):
+    not_rpm = tmp_path / 'tool.rpm'
+    not_rpm.write_bytes(b'\0' * 200)
+    with pytest.raises(ConanException, match='bad lead magic'):
+        repository.read_rpm_metadata(str(not_rpm))
+
+
+def test_write_yum_repodata(tmp_path):
+    repo_root = str(tmp_path / 'RPMS')
+    write_rpm(os.path.join(repo_root, 'x86_64', 'tool-1.0-1.x86_64.rpm'), 'tool')
+    write_rpm(os.path.join(repo_root, 'x86_64', 'gmp-6.3.0-1.x86_64.rpm'), 'gmp', version='6.3.0')
+    package_paths = ['x86_64/tool-1.0-1.x86_64.rpm', 'x86_64/gmp-6.3.0-1.x86_64.rpm']
+    cache = repository.MetadataCache(str(tmp_path), 'rpm_deployer')
+
+    assert repository.write_yum_repodata(repo_root, package_paths, cache) == 2
+
+    with open(os.path.join(repo_root, 'repodata', 'repomd.xml')) as repomd_file:
+        repomd = repomd_file.read()
+    primary_gz, primary = read_primary(repo_root)
+
+    assert f'<checksum type="sha256">{ hashlib.sha256(primary_gz).hexdigest() }</checksum>' in repomd
+    assert 'packages="2"' in primary
+    assert '<summary>tool &amp; co</summary>' in primary
+    assert '<location href="x86_64/tool-1.0-1.x86_64.rpm"/>' in primary
+    assert '<rpm:entry name="opt-toolchain-gmp" flags="GE" epoch="1" ver="6.3.0" rel="1"/>' in primary
+    assert 'rpmlib(' not in primary
+    # Only bin/ and /etc files make it into primary.xml
+    assert '<file>/opt/toolchain/bin/tool</file>' in primary
+    assert 'tool.1' not in primary
+
+    # Unchanged packages come from the cache
+    cache = repository.MetadataCache(str(tmp_path), 'rpm_deployer')
+    assert repository.write_yum_repodata(repo_root, package_paths, cache) == 0
+    assert repository.write_yum_repodata(repo_root, package_paths[:1], cache) == 0
+    assert 'packages="1"' in read_primary(repo_root)[1]
+
+
+def test_write_apt_index(tmp_path, tree):
+    members = list(manifest.scan_payload(tree({'bin/tool': b'tool'}), '', 'tool'))
+    for name in ['opt+toolchain-tool', 'opt+toolchain-tool-doc']:
+        debwriter.write_deb(str(tmp_path / f'{ name }_1.0-1_amd64.deb'),
+                            {'Package': name,
+                             'Version': '1.0-1',
+                             'Architecture': 'amd64',
+                             'Maintainer': 'conan',
+                             'Description': 'A tool',
+                            },
+                            members,
+                            'opt/toolchain',
+                           )
+    package_paths = ['opt+toolchain-tool-doc_1.0-1_amd64.deb', 'opt+toolchain-tool_1.0-1_amd64.deb']
+    cache = repository.MetadataCache(str(tmp_path), 'deb_deployer')
+
+    assert repository.write_apt_index(str(tmp_path), package_paths, cache, 'toolchain') == 2
+
+    packages = (tmp_path / 'Packages').read_bytes()
+    release = (tmp_path / 'Release').read_text()
+    stanzas = packages.decode('utf-8').split('\n\n')
+    with open(tmp_path / 'opt+toolchain-tool_1.0-1_amd64.deb', 'rb') as deb_file:
+        deb_sha256 = hashlib.sha256(deb_file.read()).hexdigest()
+
+    assert [stanza.split('\n')[0] for stanza in stanzas] == ['Package: opt+toolchain-tool',
+                                                             'Package: opt+toolchain-tool-doc']
+    assert 'Filename: ./opt+toolchain-tool_1.0-1_amd64.deb' in stanzas[0]
+    assert f'SHA256: { deb_sha256 }' in stanzas[0]
+    assert gzip.decompress((tmp_path / 'Packages.gz').read_bytes()) == packages
+    assert 'Architectures: amd64\n' in release
+    assert f' { hashlib.sha256(packages).hexdigest() } { len(packages):>16} Packages\n' in release
+
+    assert repository.write_apt_index(str(tmp_path), package_paths,
+                                      repository.MetadataCache(str(tmp_path), 'deb_deployer'), 'toolchain') == 0
+
+
+def test_read_deb_metadata_rejects_other_files(tmp_path):
+    not_deb = tmp_path / 'tool.deb'
+    not_deb.write_bytes(b'PK\x03\x04')
+    with pytest.raises(ConanException, match='bad ar magic'):
+        repository.read_deb_metadata(str(not_deb))
@@ -0,0 +1,83 @@
+######################################################################
+# tests/test_shlibs.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from system_packaging import elf, manifest, shlibs, split
+from types import SimpleNamespace
+import pytest
+
+
+class Dependency:
+
+    def __init__(self, name):
+        self.ref = f'{ name }/1.0'
+
+    def __str__(self):
+        return self.ref
+
+
+@pytest.mark.parametrize('soname, key', [('libfoo.so.1', ('libfoo', '1')),
+                                         ('libstdc++.so.6', ('libstdc++', '6')),
+                                         ('libfoo-1.2.so', ('libfoo', '1.2')),
+                                         ('libfoo.so', ('libfoo', '')),
+                                        ])
+def test_shlibs_key(soname, key):
+    assert shlibs.shlibs_key(soname) == key
+
+
+def test_rpm_capability():
+    assert shlibs.rpm_capability('libc.so.6', 64) == 'libc.so.6()(64bit)'
+    assert shlibs.rpm_capability('libc.so.6', 32) == 'libc.so.6'
+
+
+def test_library_dirs(tmp_path):
+    (tmp_path / 'ld.so.conf').write_text('include ld.so.conf.d/*.conf\n/opt/lib # local\n')
+    (tmp_path / 'ld.so.conf.d').mkdir()
+    (tmp_path / 'ld.so.conf.d' / 'b.conf').write_text('# nothing\n/usr/lib/b\n')
+    (tmp_path / 'ld.so.conf.d' / 'a.conf').write_text('/usr/lib/a\ninclude ../ld.so.conf.d/a.conf\n')
+
+    assert shlibs.library_dirs(str(tmp_path / 'ld.so.conf')) == ['/usr/lib/a', '/usr/lib/b', '/opt/lib']
+    assert shlibs.library_dirs(str(tmp_path / 'missing.conf')) == []
+
+
+# Only a system library of the payload's ELF class resolves a soname
+def test_system_libraries_rpm(tmp_path, make_elf):
+    (tmp_path / 'libfoo.so.1').write_bytes(make_elf(soname='libfoo.so.1'))
+    system_libraries = shlibs.SystemLibraries('rpm')
+    system_libraries.library_dirs = [str(tmp_path)]
+
+    assert system_libraries.resolve('libfoo.so.1', 64) == 'libfoo.so.1()(64bit)'
+    assert system_libraries.resolve('libfoo.so.1', 32) is None
+    assert system_libraries.resolve('libbar.so.1', 64) is None
+
+
+def test_relationships(tree, make_elf):
+    dependency_items = [Dependency('gmp'), Dependency('mpfr')]
+    manifests = [manifest.scan_payload(tree({'lib/libgmp.so.10': make_elf(soname='libgmp.so.10',
+                                                                          needed=['libc.so.6']),
+                                             'lib/debug/lib/libgmp.so.10.debug': make_elf(soname='libgmp.so.10'),
+                                            }, 'gmp'), '', 'gmp'),
+                 manifest.scan_payload(tree({'lib/libmpfr.so.6': make_elf(soname='libmpfr.so.6',
+                                                                          needed=['libgmp.so.10', 'libc.so.6',
+                                                                                  'libmissing.so.1']),
+                                             'bin/mpfr-tool': make_elf(e_type=elf.ET_EXEC,
+                                                                       needed=['libmpfr.so.6', 'libgmp.so.10']),
+                                            }, 'mpfr'), '', 'mpfr'),
+                ]
+    rules = [split.make_rules(), split.make_rules()]
+    system_libraries = SimpleNamespace(resolve=lambda soname, elf_class: 'glibc' if soname == 'libc.so.6' else None)
+    library_index = shlibs.LibraryIndex(dependency_items, manifests,
+                                        [elf.scan_manifest(payload_manifest) for payload_manifest in manifests],
+                                        split_rules=rules, system_libraries=system_libraries)
+
+    # The debug file's soname doesn't make the debuginfo package a provider
+    assert library_index.providers == {('libgmp.so.10', 64): (dependency_items[0], 'runtime'),
+                                       ('libmpfr.so.6', 64): (dependency_items[1], 'runtime'),
+                                      }
+    # The tool's own libmpfr.so.6 isn't a relationship
+    assert library_index.relationships(dependency_items[1], ['bin/mpfr-tool', 'lib/libmpfr.so.6']) \
+        == ([('libmpfr.so.6', 64)], [(dependency_items[0], 'runtime')], ['glibc'], ['libmissing.so.1'])
+    assert library_index.has_elf_files(dependency_items[1], ['bin/mpfr-tool'])
+    assert not library_index.has_elf_files(dependency_items[0], ['include/gmp.h'])
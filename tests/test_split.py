@@ -0,0 +1,141 @@
+######################################################################
+# tests/test_split.py
+#
+# Copyright © 2025 David L. Armstrong
+#
+
+from conan.errors import ConanException
+from system_packaging import manifest, split
+import os
+import pytest
+import deb_deployer
+import rpm_deployer
+
+
+@pytest.fixture
+def gmp_manifest(tree):
+    return manifest.scan_payload(tree({'lib/libgmp.so.10': b'gmp',
+                                       'lib/libgmp.so': 'libgmp.so.10',
+                                       'lib/libgmp.a': b'archive',
+                                       'lib/pkgconfig/gmp.pc': b'',
+                                       'lib/debug/lib/libgmp.so.10.debug': b'',
+                                       'include/gmp.h': b'',
+                                       'share/info/gmp.info': b'',
+                                       'licenses/COPYING': b'',
+                                      }), '', 'gmp')
+
+
+def test_default_split(gmp_manifest):
+    components = split.split_manifest(gmp_manifest, split.make_rules())
+
+    assert [(component, component_manifest.paths()) for component, component_manifest in components] \
+        == [('runtime', ['lib/libgmp.so.10', 'licenses/gmp/COPYING']),
+            ('devel', ['include/gmp.h', 'lib/libgmp.a', 'lib/libgmp.so', 'lib/pkgconfig/gmp.pc']),
+            ('doc', ['share/info/gmp.info']),
+            ('debuginfo', ['lib/debug/lib/libgmp.so.10.debug']),
+           ]
+
+
+def test_unversioned_library_symlinks_only(tree):
+    # A real file by that name is what programs load
+    payload_manifest = manifest.scan_payload(tree({'lib/libfoo.so': b'foo'}), '', 'foo')
+
+    assert [component for component, component_manifest in split.split_manifest(payload_manifest,
+                                                                                 split.make_rules())] \
+        == ['runtime']
+
+
+def test_recipe_rules_come_first(gmp_manifest):
+    rules = split.make_rules({'runtime': 'lib/*.a', 'doc': ['include/*']})
+
+    components = dict(split.split_manifest(gmp_manifest, rules))
+
+    assert 'lib/libgmp.a' in components['runtime'].paths()
+    assert components['doc'].paths() == ['include/gmp.h', 'share/info/gmp.info']
+
+
+def test_single_package(gmp_manifest):
+    components = split.split_manifest(gmp_manifest, split.make_rules({'runtime': ['*']}))
+
+    assert [component for component, component_manifest in components] == ['runtime']
+    assert components[0][1].paths() == gmp_manifest.paths()
+
+
+def test_runtime_is_always_built(tree):
+    payload_manifest = manifest.scan_payload(tree({'include/gmp.h': b''}), '', 'gmp')
+
+    assert [(component, len(component_manifest))
+            for component, component_manifest in split.split_manifest(payload_manifest, split.make_rules())] \
+        == [('runtime', 0), ('devel', 1)]
+
+
+def test_unknown_component():
+    with pytest.raises(ConanException, match='Unknown split_rules component "tests"'):
+        split.make_rules({'tests': ['test/*']})
+
+
+def test_component_metadata():
+    metadata = {'name': 'opt-toolchain-gmp', 'version': '6.3.0', 'summary': 'GMP'}
+
+    assert split.component_metadata(metadata, 'devel', 'rpm') == {'name': 'opt-toolchain-gmp-devel',
+                                                                  'version': '6.3.0',
+                                                                  'namever': 'opt-toolchain-gmp-devel-6.3.0',
+                                                                  'summary': 'GMP - development files',
+                                                                  'component': 'devel',
+                                                                 }
+    assert split.component_metadata(metadata, 'debuginfo', 'deb')['name'] == 'opt-toolchain-gmp-dbg'
+    assert split.component_metadata(metadata, 'runtime', 'deb')['namever'] == 'opt-toolchain-gmp-6.3.0'
+
+
+# Our own -debuginfo component RPM has the name rpm's debuginfo RPM of
+# the runtime component would get, it only counts once
+def test_built_rpms_debuginfo(tmp_path):
+    metadata = {'name': 'opt-toolchain-gcc', 'version': '13.2', 'summary': 'GCC'}
+    runtime = (split.component_metadata(metadata, 'runtime', 'rpm'), None)
+    debuginfo = (split.component_metadata(metadata, 'debuginfo', 'rpm'), None)
+    rpms_dir = tmp_path / 'rpmbuild' / 'RPMS' / 'x86_64'
+    os.makedirs(rpms_dir)
+    for rpm_name in ['opt-toolchain-gcc-13.2-1.x86_64.rpm', 'opt-toolchain-gcc-debuginfo-13.2-1.x86_64.rpm']:
+        (rpms_dir / rpm_name).write_bytes(b'')
+
+    rpm_files, debuginfo_files = rpm_deployer.built_rpms(str(tmp_path), [runtime, debuginfo])
+    assert sorted(os.path.basename(rpm_file) for rpm_file in rpm_files) \
+        == ['opt-toolchain-gcc-13.2-1.x86_64.rpm', 'opt-toolchain-gcc-debuginfo-13.2-1.x86_64.rpm']
+    assert debuginfo_files == []
+
+    # Without one, it's rpm's own
+    rpm_files, debuginfo_files = rpm_deployer.built_rpms(str(tmp_path), [runtime])
+    assert [os.path.basename(rpm_file) for rpm_file in rpm_files] == ['opt-toolchain-gcc-13.2-1.x86_64.rpm']
+    assert [os.path.basename(rpm_file) for rpm_file in debuginfo_files] \
+        == ['opt-toolchain-gcc-debuginfo-13.2-1.x86_64.rpm']
+
+
+# Artifacts an earlier deploy built for another architecture are gone
+# before the next build
+def test_remove_built_rpms(tmp_path):
+    metadata = {'name': 'opt-toolchain-gcc', 'version': '13.2', 'summary': 'GCC'}
+    components = [(split.component_metadata(metadata, component, 'rpm'), None) for component in ['runtime', 'devel']]
+    for arch in ['x86_64', 'aarch64']:
+        os.makedirs(tmp_path / 'rpmbuild' / 'RPMS' / arch)
+        for rpm_name in ['opt-toolchain-gcc', 'opt-toolchain-gcc-devel', 'opt-toolchain-gcc-debuginfo',
+                         'opt-toolchain-gmp']:
+            (tmp_path / 'rpmbuild' / 'RPMS' / arch / f'{ rpm_name }-13.2-1.{ arch }.rpm').write_bytes(b'')
+
+    rpm_deployer.remove_built_rpms(str(tmp_path), components)
+
+    assert sorted(os.listdir(tmp_path / 'rpmbuild' / 'RPMS' / 'aarch64')) == ['opt-toolchain-gmp-13.2-1.aarch64.rpm']
+    assert rpm_deployer.built_rpms(str(tmp_path), components) == ([], [])
+
+
+def test_built_debs(tmp_path):
+    metadata = {'name': 'opt+toolchain-gcc', 'version': '13.2', 'summary': 'GCC'}
+    components = [(split.component_metadata(metadata, component, 'deb'), None) for component in ['runtime', 'doc']]
+    for deb_name in ['opt+toolchain-gcc_13.2-1_amd64.deb', 'opt+toolchain-gcc_13.2-1_arm64.deb',
+                     'opt+toolchain-gcc-doc_13.2-1_all.deb', 'opt+toolchain-gcc-devel_13.2-1_amd64.deb',
+                     'opt+toolchain-gcc_13.1-1_amd64.deb']:
+        (tmp_path / deb_name).write_bytes(b'')
+
+    assert sorted(os.path.basename(deb_file) for deb_file in deb_deployer.built_debs(str(tmp_path), components,
+                                                                                        '13.2-1')) \
+        == ['opt+toolchain-gcc-doc_13.2-1_all.deb', 'opt+toolchain-gcc_13.2-1_amd64.deb',
+            'opt+toolchain-gcc_13.2-1_arm64.deb']